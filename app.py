@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask, render_template, session, jsonify, redirect, url_for, request
 import logging
 from dotenv import load_dotenv
@@ -8,7 +9,11 @@ load_dotenv()
 
 # Initialize Firebase
 from config.firebase_config import init_firebase_admin, init_pyrebase
-db, bucket = init_firebase_admin()
+from storage import init_storage
+# Firebase Auth is always used; the repositories' database is chosen by STORAGE_BACKEND,
+# and a Firestore client is only created when that backend is selected
+bucket = init_firebase_admin()
+db = init_storage()
 firebase_auth = init_pyrebase()
 
 # Set up logging
@@ -188,65 +193,30 @@ def leave_board(board_id):
     return redirect(url_for('board.leave_board', board_id=board_id), code=307)
 
 
+# Number of activities shown in the dashboard's recent activity list
+RECENT_ACTIVITY_COUNT = 5
+
+def chart_window_days():
+    """Activity chart window requested via ?days=, limited to the supported windows"""
+    from repositories.activity_repository import CHART_WINDOWS
+
+    days = request.args.get('days', CHART_WINDOWS[0], type=int)
+    return days if days in CHART_WINDOWS else CHART_WINDOWS[0]
+
 # Main routes
 @app.route('/')
 def index():
-    from repositories.board_repository import BoardRepository
-    from repositories.task_repository import TaskRepository
-    from repositories.activity_repository import ActivityRepository
+    from utils.stats_utils import get_dashboard_context
     
     try:
-        board_repo = BoardRepository(db)
-        task_repo = TaskRepository(db)
-        activity_repo = ActivityRepository(db)
-        
         if 'user' in session:
-            user = session['user']
-            user_id = user['uid']
-            user_email = user['email']
-
-            # Get user's boards
-            user_boards = board_repo.get_user_boards(user_id)
-
-            # Get shared boards
-            shared_boards = board_repo.get_shared_boards(user_id, user_email)
-            total_boards_count = len(user_boards) + len(shared_boards)
-
-            # Count total tasks and completed tasks
-            total_tasks = []
-            completed_tasks = []
-            
-            # Tasks of user boards
-            for board in user_boards:
-                tasks = task_repo.get_board_tasks(board['id'])
-                total_tasks.extend(tasks)
-                completed_tasks.extend([t for t in tasks if t.get('completed')])
-            
-            # Tasks of shared boards
-            for board in shared_boards:
-                tasks = task_repo.get_board_tasks(board['id'])
-                total_tasks.extend(tasks)
-                completed_tasks.extend([t for t in tasks if t.get('completed')])
-            
-            # Get recent activities and chart data
-            activities = activity_repo.get_user_activities(user_id, limit=50)
-            chart_labels, chart_data = activity_repo.get_activity_chart_data(user_id)
-            
-            # Only show the 5 most recent activities in the list
-            recent_activities = activities[:5]
-
-            return render_template(
-                'index.html',
-                user=user,
-                user_boards=user_boards,
-                shared_boards=shared_boards,
-                total_boards=total_boards_count,  
-                total_tasks=len(total_tasks),     
-                completed_tasks=len(completed_tasks),
-                activities=recent_activities,
-                chart_labels=chart_labels,
-                chart_data=chart_data
+            context = get_dashboard_context(
+                db,
+                session['user'],
+                activity_count=RECENT_ACTIVITY_COUNT,
+                chart_days=chart_window_days()
             )
+            return render_template('index.html', **context)
 
         return render_template('index.html')
     except Exception as e:
@@ -267,64 +237,49 @@ def about():
 @app.route('/dashboard')
 def dashboard():
     try:
-        from utils.auth_utils import login_required
-        from repositories.board_repository import BoardRepository
-        from repositories.task_repository import TaskRepository
-        from repositories.activity_repository import ActivityRepository
+        from utils.stats_utils import get_dashboard_context
         
         # Check if user is logged in
         if 'user' not in session:
             logger.warning("No user in session for dashboard route")
             return redirect(url_for('login'))
             
-        user_id = session['user']['uid']
-        user_email = session['user']['email']
-        
-        logger.info(f"Dashboard accessed by user: {user_id}")
-        
-        board_repo = BoardRepository(db)
-        activity_repo = ActivityRepository(db)
+        logger.info(f"Dashboard accessed by user: {session['user']['uid']}")
         
-        # Get user's boards and shared boards
-        user_boards = board_repo.get_user_boards(user_id)
-        shared_boards = board_repo.get_shared_boards(user_id, user_email)
-        total_boards_count = len(user_boards) + len(shared_boards)
-
-        # Count total tasks and completed tasks
-        total_tasks = 0
-        completed_tasks = 0
-        
-        # Count from user's own boards
-        for board in user_boards:
-            total_tasks += board.get('taskCount', 0)
-            completed_tasks += board.get('completedTaskCount', 0)
-        
-        # Count from shared boards
-        for board in shared_boards:
-            total_tasks += board.get('taskCount', 0)
-            completed_tasks += board.get('completedTaskCount', 0)
-        
-        # Get recent activities and chart data
-        activities = activity_repo.get_user_activities(user_id, limit=50)
-        chart_labels, chart_data = activity_repo.get_activity_chart_data(user_id)
-        
-        # Only show the 5 most recent activities
-        recent_activities = activities[:5]
-        
-        return render_template('dashboard.html', 
-                            user=session['user'], 
-                            user_boards=user_boards, 
-                            shared_boards=shared_boards,
-                            total_boards=total_boards_count,
-                            total_tasks=total_tasks,
-                            completed_tasks=completed_tasks,
-                            activities=recent_activities,
-                            chart_labels=chart_labels,
-                            chart_data=chart_data)
+        context = get_dashboard_context(
+            db,
+            session['user'],
+            activity_count=RECENT_ACTIVITY_COUNT,
+            chart_days=chart_window_days()
+        )
+        return render_template('dashboard.html', **context)
     except Exception as e:
         logger.error(f"Error in dashboard route: {str(e)}", exc_info=True)
         return render_template('error.html', error=str(e)), 500
 
+@app.route('/activity-feed')
+def activity_feed():
+    from repositories.activity_repository import ActivityRepository
+
+    if 'user' not in session:
+        return jsonify({'error': 'Please log in to access this page'}), 401
+
+    page_size = min(request.args.get('limit', 20, type=int) or 20, 100)
+    activities, next_cursor = ActivityRepository(db).get_user_activities_page(
+        session['user']['uid'], after=request.args.get('after'), page_size=page_size
+    )
+
+    return jsonify({
+        'activities': [{
+            'id': activity['id'],
+            'description': activity.get('description', ''),
+            'boardId': activity.get('boardId'),
+            'boardName': activity.get('boardName'),
+            'timestamp': activity['timestamp'].isoformat() if hasattr(activity.get('timestamp'), 'isoformat') else None
+        } for activity in activities],
+        'nextCursor': next_cursor
+    })
+
 @app.route('/debug-session')
 def debug_session():
     return jsonify({
@@ -332,6 +287,127 @@ def debug_session():
         'session_data': session.get('user', 'No user in session')
     })
 
+@app.cli.command('backfill-membership')
+def backfill_membership():
+    """Populate the board membership index used by shared-board lookups"""
+    from repositories.board_repository import BoardRepository
+
+    updated = BoardRepository(db).backfill_membership_index()
+    print(f"Updated membership index on {updated} boards")
+
+@app.cli.command('repair-task-counts')
+@click.argument('board_ids', nargs=-1)
+def repair_task_counts(board_ids):
+    """Recount board task counters and fix any that have drifted"""
+    from repositories.board_repository import BoardRepository
+    from repositories.task_repository import TaskRepository
+
+    board_repo = BoardRepository(db)
+    task_repo = TaskRepository(db)
+    boards = [board_repo.get_board(board_id) for board_id in board_ids] if board_ids \
+        else [dict(board.to_dict(), id=board.id) for board in db.collection('boards').stream()]
+
+    boards = [board for board in boards if board]
+    counts = task_repo.count_tasks_for_boards([board['id'] for board in boards], bulk=True)
+
+    repaired = 0
+    for board, (task_count, completed_count) in zip(boards, counts):
+        if board.get('taskCount') != task_count or board.get('completedTaskCount') != completed_count:
+            print(f"Board {board['id']}: {board.get('completedTaskCount')}/{board.get('taskCount')} -> {completed_count}/{task_count}")
+            # Write the counts just taken rather than aggregating the board a second time
+            if task_repo.set_task_counts(board['id'], task_count, completed_count):
+                repaired += 1
+
+    print(f"Repaired task counts on {repaired} boards")
+
+@app.cli.command('backfill-comment-counts')
+def backfill_comment_counts():
+    """Store commentCount on tasks created before comment counts were maintained"""
+    from repositories.task_repository import TaskRepository
+
+    task_repo = TaskRepository(db)
+    updated = 0
+    # One paged scan over every board's tasks instead of a query per board
+    for task in task_repo.iter_all_tasks():
+        if 'commentCount' not in task:
+            task_repo.update_comment_count(task['boardId'], task['id'])
+            updated += 1
+
+    print(f"Backfilled comment counts on {updated} tasks")
+
+@app.cli.command('backfill-activity-rollups')
+def backfill_activity_rollups():
+    """Rebuild past days' activity counters behind the dashboard chart from activity history"""
+    from repositories.activity_repository import ActivityRepository
+
+    rebuilt = ActivityRepository(db).backfill_daily_rollups()
+    print(f"Rebuilt {rebuilt} daily activity rollups")
+
+@app.cli.command('backfill-assignee-index')
+def backfill_assignee_index():
+    """Populate the task assignee index used by the profile page"""
+    from repositories.task_repository import TaskRepository
+
+    updated = TaskRepository(db).backfill_assignee_index()
+    print(f"Updated assignee index on {updated} tasks")
+
+@app.cli.command('backfill-user-task-counts')
+@click.argument('board_ids', nargs=-1)
+def backfill_user_task_counts(board_ids):
+    """Rebuild the per-user task counters behind the profile page totals"""
+    from repositories.task_repository import TaskRepository
+
+    updated = TaskRepository(db).backfill_user_task_counts(board_ids)
+    print(f"Rebuilt user task counts on {updated} boards")
+
+@app.cli.command('backfill-pending-memberships')
+def backfill_pending_memberships():
+    """Index boards and tasks that list users by email only, so registration can claim them"""
+    from repositories.pending_membership_repository import PendingMembershipRepository
+
+    recorded = PendingMembershipRepository(db).backfill()
+    print(f"Recorded {recorded} pending memberships")
+
+@app.cli.command('resume-account-deletions')
+def resume_account_deletions():
+    """Finish account deletions that failed or were interrupted"""
+    from utils.account_deletion_utils import resume_account_deletions as resume
+
+    resumed = resume(db)
+    print(f"Resumed {resumed} account deletions")
+
+@app.cli.command('resume-board-deletes')
+def resume_board_deletes():
+    """Finish background board deletes that failed or were interrupted"""
+    from repositories.board_repository import BoardRepository
+
+    resumed = BoardRepository(db).resume_board_deletes()
+    print(f"Resumed {resumed} board deletes")
+
+@app.cli.command('export-analytics')
+@click.option('--format', 'file_format', type=click.Choice(['parquet', 'arrow']), default='parquet')
+@click.option('--output', 'output_dir', default=None, help='Directory for the exported files')
+def export_analytics_command(file_format, output_dir):
+    """Write boards, tasks and activity as typed Parquet or Arrow files"""
+    from utils.analytics_export_utils import export_analytics, ANALYTICS_EXPORT_DIR
+
+    results = export_analytics(db, output_dir=output_dir or ANALYTICS_EXPORT_DIR, file_format=file_format)
+    for name, result in results.items():
+        print(f"{name}: {result['rows']} rows -> {result['path']}")
+
+@app.cli.command('backfill-creator-status')
+def backfill_creator_status():
+    """Mark boards whose creator's account no longer exists"""
+    from repositories.board_repository import BoardRepository
+    from repositories.user_repository import UserRepository
+
+    creator_ids = {board.to_dict().get('createdBy') for board in db.collection('boards').stream()} - {None}
+    users = UserRepository(db).get_users_by_ids(creator_ids)
+
+    board_repo = BoardRepository(db)
+    updated = sum(board_repo.mark_creator_deleted(uid) for uid, user in users.items() if user is None)
+    print(f"Marked {updated} boards as having a deleted creator")
+
 @app.context_processor
 def inject_current_year():
     return {'current_year': datetime.now().year}
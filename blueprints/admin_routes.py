@@ -1,6 +1,21 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, session
+import os
+import logging
+from flask import Blueprint, render_template, redirect, url_for, request, flash, session, jsonify
 from firebase_admin import auth as admin_auth
 from utils.auth_utils import login_required
+from storage import get_db
+from repositories.board_repository import BoardRepository, get_board_cache_stats
+from utils.concurrency_utils import fan_out
+from repositories.user_repository import UserRepository, invalidate_user_cache, refresh_user_index, get_user_cache_stats
+
+# Users listed per admin page unless ?page_size= asks for another size
+ADMIN_USERS_PAGE_SIZE = int(os.getenv('ADMIN_USERS_PAGE_SIZE', '50'))
+
+# Bulk actions offered on the users page, with the verb used in the report
+BULK_ACTIONS = {'disable': 'Disabled', 'enable': 'Enabled', 'delete': 'Deleted'}
+
+# Set up logging
+logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -11,25 +26,98 @@ def list_users():
         flash('Unauthorized access.', 'danger')
         return redirect(url_for('index'))
 
+    page_size = max(1, min(request.args.get('page_size', ADMIN_USERS_PAGE_SIZE, type=int) or ADMIN_USERS_PAGE_SIZE, 1000))
+    page_token = request.args.get('page_token', '')
+    page = max(request.args.get('page', 0, type=int), 0) if page_token else 0
+
     try:
-        users = []
-        page = admin_auth.list_users()
-        while page:
-            for user in page.users:
-                users.append({
-                    'uid': user.uid,
-                    'email': user.email,
-                    'display_name': user.display_name,
-                    'disabled': user.disabled,
-                    'custom_claims': user.custom_claims
-                })
-            page = page.get_next_page()
-        return render_template('users.html', users=users, user=session.get('user'))
+        user_repo = UserRepository(get_db())
+        users, next_token = user_repo.list_users_page(page_token, page_size=page_size)
+
+        # Pages already visited are served from the page cache, so going back costs no Auth call
+        previous_token = user_repo.get_previous_page_token(page_token, page_size=page_size)
+        if page_token and previous_token is None:
+            # The way back has expired; fall back to the first page
+            previous_token = ''
+
+        return render_template(
+            'users.html',
+            users=users,
+            user=session.get('user'),
+            page=page,
+            page_size=page_size,
+            previous_token=previous_token,
+            next_token=next_token,
+            total_users=user_repo.get_user_count()
+        )
 
     except Exception as e:
         flash(f'Error fetching users: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
+@admin_bp.route('/users/search')
+@login_required
+def search_users():
+    if not session.get('user', {}).get('is_admin', False):
+        return jsonify({'error': 'Unauthorized access.'}), 403
+
+    limit = max(1, min(request.args.get('limit', 20, type=int) or 20, 100))
+    users, ready = UserRepository(get_db()).search_users(request.args.get('q', ''), limit=limit)
+    return jsonify({'users': users, 'ready': ready})
+
+@admin_bp.route('/users/bulk', methods=['POST'])
+@login_required
+def bulk_users():
+    if not session.get('user', {}).get('is_admin', False):
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('index'))
+
+    action = request.form.get('action')
+    uids = [uid for uid in request.form.getlist('uids') if uid]
+    if action not in BULK_ACTIONS or not uids:
+        flash('Select at least one user and an action.', 'warning')
+        return redirect(url_for('admin.list_users'))
+
+    # Admins cannot lock themselves out
+    current_uid = session['user']['uid']
+    report = [{'uid': current_uid, 'success': False, 'error': 'You cannot change your own account here'}] \
+        if current_uid in uids else []
+    uids = [uid for uid in uids if uid != current_uid]
+
+    db = get_db()
+    user_repo = UserRepository(db)
+    try:
+        users = user_repo.get_users_by_ids(uids)
+    except Exception as e:
+        # Look the users up one by one so a bad uid only fails its own row
+        logger.warning(f"Batch user lookup failed, retrying per user: {str(e)}")
+        users = {}
+        for uid in uids:
+            try:
+                users[uid] = user_repo.get_user_by_id(uid)
+            except Exception as e:
+                report.append({'uid': uid, 'success': False, 'error': f"Could not look up user: {str(e)}"})
+        uids = [uid for uid in uids if uid in users]
+    emails = {uid: user.email for uid, user in users.items() if user}
+
+    if action == 'delete':
+        results = user_repo.delete_users(uids)
+        board_repo = BoardRepository(db)
+        deleted_uids = [result['uid'] for result in results if result['success']]
+        marked = fan_out(board_repo.mark_creator_deleted, deleted_uids, bulk=True, return_exceptions=True)
+        for uid, outcome in zip(deleted_uids, marked):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Could not mark boards of deleted user {uid}; run backfill-creator-status: {outcome}")
+    else:
+        results = user_repo.set_users_disabled(uids, disabled=action == 'disable')
+    report.extend(results)
+
+    for result in report:
+        result['email'] = emails.get(result['uid'])
+    succeeded = sum(1 for result in report if result['success'])
+    flash(f"{BULK_ACTIONS[action]} {succeeded} of {len(report)} users.", 'success' if succeeded == len(report) else 'warning')
+    return render_template('bulk_report.html', action=BULK_ACTIONS[action], report=report, user=session.get('user'))
+
 @admin_bp.route('/user/<uid>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_user(uid):
@@ -42,11 +130,13 @@ def edit_user(uid):
         disabled = request.form.get('disabled') == 'on'
 
         try:
-            admin_auth.update_user(
+            updated_user = admin_auth.update_user(
                 uid,
                 display_name=display_name,
                 disabled=disabled
             )
+            invalidate_user_cache(uid)
+            refresh_user_index(updated_user)
             flash('User updated successfully.', 'success')
         except Exception as e:
             flash(f'Error updating user: {str(e)}', 'danger')
@@ -76,8 +166,19 @@ def delete_user(uid):
 
     try:
         admin_auth.delete_user(uid)
+        invalidate_user_cache(uid)
+        refresh_user_index(removed_uid=uid)
+        BoardRepository(get_db()).mark_creator_deleted(uid)
         flash('User deleted successfully.', 'success')
     except Exception as e:
         flash(f'Error deleting user: {str(e)}', 'danger')
 
-    return redirect(url_for('admin.list_users'))
\ No newline at end of file
+    return redirect(url_for('admin.list_users'))
+
+@admin_bp.route('/cache-stats')
+@login_required
+def cache_stats():
+    if not session.get('user', {}).get('is_admin', False):
+        return jsonify({'error': 'Unauthorized access.'}), 403
+
+    return jsonify({'boards': get_board_cache_stats(), 'users': get_user_cache_stats()})
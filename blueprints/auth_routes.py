@@ -2,19 +2,31 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 import logging
 from repositories.user_repository import UserRepository
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.pending_membership_repository import PendingMembershipRepository
 from utils.auth_utils import login_required
 from firebase_admin import auth as admin_auth
 from validate_email_address import validate_email
-from utils.email_utils import send_email_with_attachment, send_email, build_email_body
-from utils.export_utils import export_user_data
+from utils.email_utils import send_email, build_email_body
+from utils.account_deletion_utils import start_account_deletion, get_account_deletion_status
+from utils.token_utils import FirebaseTokenVerifier, InvalidIdTokenError
+from config.firebase_config import FIREBASE_PROJECT_ID
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Number of tasks listed per profile page
+PROFILE_TASKS_PAGE_SIZE = 100
+
 auth_bp = Blueprint('auth', __name__)
 
-def init_auth_routes(db, firebase_auth):
+def init_auth_routes(db, firebase_auth, token_verifier=None):
     user_repo = UserRepository(db)
+    token_verifier = token_verifier or FirebaseTokenVerifier(FIREBASE_PROJECT_ID)
+    board_repo = BoardRepository(db)
+    task_repo = TaskRepository(db)
+    pending_repo = PendingMembershipRepository(db)
 
     @auth_bp.route('/login', methods=['GET', 'POST'])
     def login():
@@ -27,10 +39,9 @@ def init_auth_routes(db, firebase_auth):
                     flash("Login failed: User not found", "danger")
                     return render_template('login.html')
 
-                # Fetch Firebase user to get custom claims
-                admin_user = admin_auth.get_user(user.uid)
-                display_name = user.display_name or admin_user.display_name or user.email
-                is_admin = admin_user.custom_claims.get('is_admin') if admin_user.custom_claims else False
+                # The user record already carries the custom claims
+                display_name = user.display_name or user.email
+                is_admin = user.custom_claims.get('is_admin') if user.custom_claims else False
 
                 # Store user in session
                 session['user'] = {'uid': user.uid, 'email': user.email, 'displayName': user.display_name or user.email, 'is_admin': is_admin}
@@ -49,7 +60,7 @@ def init_auth_routes(db, firebase_auth):
                         users = board_data.get("users", [])
                         if not any(u.get("email") == email for u in users):
                             users.append({"email": email, "uid": user.uid, "displayName": display_name, "role": "member"})
-                            db.collection("boards").document(board_id).update({"users": users})
+                            board_repo.set_board_users(board_id, users)
 
                     # Mark invite as accepted
                     invite.reference.update({"accepted": True})
@@ -83,49 +94,11 @@ def init_auth_routes(db, firebase_auth):
                 user = user_repo.create_user(email=email, password=password)
                 user_repo.update_user(user.uid, display_name=display_name)
 
-                # Update any boards or tasks where this user was added by email before registering
-                from repositories.board_repository import BoardRepository
-                from repositories.task_repository import TaskRepository
-                board_repo = BoardRepository(db)
-                task_repo = TaskRepository(db)
-
-                # Go through all boards
-                all_boards = db.collection('boards').stream()
-                for board in all_boards:
-                    board_id = board.id
-                    board_data = board.to_dict()
-
-                    # Update board users list if email matches
-                    updated_users = []
-                    modified = False
-                    for user_entry in board_data.get('users', []):
-                        if user_entry.get('email') == email and not user_entry.get('uid'):
-                            user_entry['uid'] = user.uid
-                            user_entry['displayName'] = display_name
-                            modified = True
-                        updated_users.append(user_entry)
-                    if modified:
-                        db.collection('boards').document(board_id).update({'users': updated_users})
-
-                    # Update assignedTo in tasks if email matches
-                    task_docs = db.collection('boards').document(board_id).collection('tasks').stream()
-                    for task in task_docs:
-                        task_data = task.to_dict()
-                        assigned_to = task_data.get('assignedTo', [])
-                        updated_assigned = []
-                        task_modified = False
-
-                        for user_entry in assigned_to:
-                            if user_entry.get('email') == email and not user_entry.get('uid'):
-                                user_entry['uid'] = user.uid
-                                user_entry['displayName'] = display_name
-                                task_modified = True
-                            updated_assigned.append(user_entry)
-
-                        if task_modified:
-                            db.collection('boards').document(board_id).collection('tasks').document(task.id).update({
-                                'assignedTo': updated_assigned
-                            })
+                # Claim the boards and tasks this email was added to before registering
+                for pending in pending_repo.iter_pending(email):
+                    board_repo.claim_pending_boards(pending['boardIds'], email, user.uid, display_name)
+                    task_repo.claim_pending_tasks(pending['taskPaths'], email, user.uid, display_name)
+                    pending_repo.clear(pending['grantRefs'])
 
                 logger.info(f"User created with ID: {user.uid}")
                 session['user'] = {'uid': user.uid, 'email': email, 'displayName': display_name, 'is_admin': False}
@@ -133,9 +106,8 @@ def init_auth_routes(db, firebase_auth):
                 # Send welcome email
                 subject = "Welcome to Task Manager!"
                 body = build_email_body(email, "welcome")
-                send_email(email, subject, body)
-
-                logger.info(f"Welcome email sent to {email}")
+                if send_email(email, subject, body):
+                    logger.info(f"Welcome email queued for {email}")
                 return redirect(url_for('dashboard'))
 
             except Exception as e:
@@ -161,16 +133,28 @@ def init_auth_routes(db, firebase_auth):
 
         try:
             logger.info(f"Processing Google login with token: {id_token[:10]}...")
-            decoded_token = firebase_auth.verify_id_token(id_token)
-            uid = decoded_token['uid']
+            # Verified locally; custom claims such as is_admin travel inside the token
+            claims = token_verifier.verify(id_token)
+            uid = claims['uid']
+            email = claims.get('email')
+            display_name = claims.get('name')
 
+            # A valid signature does not mean the account still exists or is enabled; the record is cached
             user_record = user_repo.get_user_by_id(uid)
-            admin_user = admin_auth.get_user(uid)
-            is_admin = admin_user.custom_claims.get('is_admin') if admin_user.custom_claims else False
+            if user_record is None or user_record.disabled:
+                logger.warning(f"Rejected Google login for missing or disabled user {uid}")
+                return jsonify({'success': False, 'error': 'This account is disabled or no longer exists'})
 
-            session['user'] = {'uid': uid, 'email': user_record.email, 'displayName': user_record.display_name or user_record.email, 'is_admin': is_admin}
+            if not email:
+                email = user_record.email
+                display_name = display_name or user_record.display_name
+
+            session['user'] = {'uid': uid, 'email': email, 'displayName': display_name or email, 'is_admin': bool(claims.get('is_admin', False))}
             logger.debug(f"Session after login: {session}")
             return jsonify({'success': True, 'redirect': url_for('dashboard')})
+        except InvalidIdTokenError as e:
+            logger.warning(f"Rejected Google login token: {str(e)}")
+            return jsonify({'success': False, 'error': 'Invalid or expired sign-in token'})
         except Exception as e:
             logger.error(f"Google login error: {str(e)}", exc_info=True)
             return jsonify({'success': False, 'error': str(e)})
@@ -203,45 +187,27 @@ def init_auth_routes(db, firebase_auth):
         user_id = session['user']['uid']
         user_email = session['user']['email']
 
-        from repositories.board_repository import BoardRepository
-        board_repo = BoardRepository(db)
         user_boards = board_repo.get_user_boards(user_id)
         shared_boards = board_repo.get_shared_boards(user_id, user_email)
         all_boards = user_boards + shared_boards
 
-        from repositories.task_repository import TaskRepository
-        task_repo = TaskRepository(db)
-        all_tasks = []
-        for board in all_boards:
-            tasks = task_repo.get_board_tasks(board['id'])
-            for task in tasks:
-                is_creator = task.get('createdBy') == user_id
-                assigned = task.get('assignedTo', [])
-
-                is_assigned = False
-                if isinstance(assigned, list):
-                    is_assigned = any(
-                        user.get('uid') == user_id or user.get('email') == user_email
-                        for user in assigned
-                    )
-                elif isinstance(assigned, dict):
-                    is_assigned = (
-                        assigned.get('uid') == user_id or
-                        assigned.get('email') == user_email
-                    )
-
-                # Add task if user is assigned or is the creator
-                if is_assigned or is_creator:
-                    task['boardId'] = board['id']
-                    task['boardName'] = board['name']
-                    all_tasks.append(task)
-        all_tasks.sort(key=lambda x: x.get('createdAt', 0), reverse=True)
+        # Tasks created by or assigned to the user on boards they can still open, one page at a time
+        board_names = {board['id']: board.get('name', '') for board in all_boards}
+        tasks, next_cursor = task_repo.get_user_tasks_page(user_id, board_names, after=request.args.get('after'),
+                                                           page_size=PROFILE_TASKS_PAGE_SIZE)
+        total_tasks, completed_tasks = task_repo.count_user_tasks(user_id, all_boards)
+
+        for task in tasks:
+            task['boardName'] = board_names[task['boardId']]
 
         return render_template(
             'profile.html',
             user=session['user'],
             boards=all_boards,
-            tasks=all_tasks
+            tasks=tasks,
+            total_tasks=total_tasks,
+            completed_tasks=completed_tasks,
+            next_cursor=next_cursor
         )
 
     @auth_bp.route('/delete-account', methods=['POST'])
@@ -251,46 +217,29 @@ def init_auth_routes(db, firebase_auth):
         email = session['user']['email']
 
         try:
-            # Export user data as zip
-            export_zip_path = export_user_data(db, uid, email)
-
-            # Build styled email content
-            subject = "Your Account Has Been Deleted"
-            body = build_email_body(recipient_email=email, subject_type="account_deleted")
-
-            # Send email with exported data attached
-            send_email_with_attachment(recipient=email, subject=subject, message_body=body, attachment_path=export_zip_path)
-
-            logger.info(f"Sent account deletion email with export to {email}")
+            job_id, status_token = start_account_deletion(db, uid, email)
         except Exception as e:
-            logger.error(f"Failed to send export email to {email}: {e}", exc_info=True)
+            logger.error(f"Error starting account deletion for {email}: {e}", exc_info=True)
+            flash("We could not delete your account. Please try again.", "danger")
+            return redirect(url_for('auth.profile'))
 
-        try:
-            user_repo.delete_user(uid)
-            logger.info(f"Deleted user {email} from Firebase Auth")
-        except Exception as e:
-            logger.error(f"Error deleting user from Firebase Auth: {e}", exc_info=True)
-
-        from repositories.board_repository import BoardRepository
-        board_repo = BoardRepository(db)
-        boards = board_repo.get_user_boards(uid)
-        for board in boards:
-            board_repo.delete_board(board['id'])
-
-        all_boards = db.collection('boards').stream()
-        for board in all_boards:
-            board_data = board.to_dict()
-            users = board_data.get('users', [])
-            updated_users = [user for user in users if user.get('uid') != uid]
-            if len(users) != len(updated_users):
-                db.collection('boards').document(board.id).update({'users': updated_users})
-
-        activities = db.collection('activity').where('userId', '==', uid).stream()
-        for activity in activities:
-            activity.reference.delete()
         session.clear()
-        logger.info(f"User {email} deleted their account and data")
-        flash("Your account has been deleted and your data has been sent to your email.", "success")
+        logger.info(f"User {email} requested account deletion, job {job_id}")
+
+        # The session is gone, so the status URL carries the job's own token instead
+        status_url = url_for('auth.delete_account_status', job_id=job_id, token=status_token)
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'jobId': job_id, 'statusToken': status_token, 'statusUrl': status_url}), 202, {'Location': status_url}
+
+        flash("Your account is being deleted. Your data will be sent to your email.", "success")
         return redirect(url_for('index'))
+
+    @auth_bp.route('/delete-account/status/<job_id>')
+    def delete_account_status(job_id):
+        status = get_account_deletion_status(db, job_id, request.args.get('token'))
+        # A wrong token is reported as an unknown job so job IDs cannot be probed
+        if status is None:
+            return jsonify({'error': 'Unknown deletion job'}), 404
+        return jsonify(status)
     
     return auth_bp
\ No newline at end of file
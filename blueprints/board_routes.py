@@ -1,5 +1,6 @@
 # blueprints/board_routes.py
 import csv
+import itertools
 from io import StringIO
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, Response
 import logging
@@ -9,13 +10,33 @@ from repositories.board_repository import BoardRepository
 from repositories.task_repository import TaskRepository
 from utils.activity_utils import add_activity
 from firebase_admin import firestore
-from utils.email_utils import build_email_body, send_email
+from utils.notification_utils import notify_user
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Tasks read per query while streaming a board's CSV export
+CSV_EXPORT_PAGE_SIZE = 500
+
 board_bp = Blueprint('board', __name__)
 
+def csv_response(header, rows, filename):
+    """Stream a CSV attachment, encoding one row at a time as the client reads it"""
+    def generate():
+        output = StringIO()
+        writer = csv.writer(output)
+        for row in itertools.chain([header], rows):
+            writer.writerow(row)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    return Response(
+        generate(),
+        mimetype="text/csv",
+        headers={"Content-disposition": f"attachment; filename={filename}"}
+    )
+
 def init_board_routes(db):
     board_repo = BoardRepository(db)
     task_repo = TaskRepository(db)
@@ -49,15 +70,8 @@ def init_board_routes(db):
             flash("Board not found", "danger")
             return redirect(url_for('dashboard'))
         
-        creator_id = board_data.get('createdBy')
-        creator_name = board_data.get('creatorName', 'Unknown')
-        creator_status = "active"
-
-        from firebase_admin import auth as admin_auth
-        try:
-            admin_auth.get_user(creator_id)
-        except Exception:
-            creator_status = "deleted"
+        # Set on the board when the creator's account is deleted
+        creator_status = board_data.get('creatorStatus', 'active')
 
         # Check if user is part of this board
         current_user_id = session['user']['uid']
@@ -81,10 +95,6 @@ def init_board_routes(db):
         # Everyone sees all tasks (no filtering)
         visible_tasks = all_tasks
         
-        # Get comments for each task
-        for task in visible_tasks:
-            task['comments'] = task_repo.get_task_comments(board_id, task['id'])
-        
         # Calculate stats
         all_tasks_count = len(all_tasks)
         visible_tasks_count = len(visible_tasks)
@@ -136,10 +146,6 @@ def init_board_routes(db):
         all_tasks = task_repo.get_board_tasks(board_id)
         visible_tasks = all_tasks  # Everyone sees everything
 
-        # Add comments to each task
-        for task in visible_tasks:
-            task['comments'] = task_repo.get_task_comments(board_id, task['id'])
-
         all_tasks_count = len(all_tasks)
         visible_tasks_count = len(visible_tasks)
 
@@ -174,6 +180,7 @@ def init_board_routes(db):
             'createdAt': firestore.SERVER_TIMESTAMP,
             'taskCount': 0,
             'completedTaskCount': 0,
+            'userTaskCounts': {},
             'users': [{
                 'uid': session['user']['uid'],
                 'email': session['user']['email'],
@@ -206,13 +213,19 @@ def init_board_routes(db):
             flash("Only the board owner can delete the board", "warning")
             return redirect(url_for('board.board', board_id=board_id))
         
-        # Delete the board and its tasks
-        board_repo.delete_board(board_id)
+        # Delete the board with its tasks and comments, in the background for large boards
+        result = board_repo.delete_board(board_id, allow_async=True)
+        if not result:
+            flash(f"Board '{board_data['name']}' could not be deleted", "danger")
+            return redirect(url_for('board.board', board_id=board_id))
         
         # Add activity log
         add_activity(db, f"Deleted board: {board_data['name']}", session['user']['uid'], session['user']['email'])
         
-        flash(f"Board '{board_data['name']}' has been deleted", "warning")
+        if result['async']:
+            flash(f"Board '{board_data['name']}' and its {result['tasks']} tasks are being deleted", "warning")
+        else:
+            flash(f"Board '{board_data['name']}' has been deleted ({result['tasks']} tasks, {result['comments']} comments)", "warning")
         return redirect(url_for('board.boards'))
 
     @board_bp.route('/add-user/<board_id>', methods=['POST'])
@@ -268,9 +281,7 @@ def init_board_routes(db):
                 
                 flash(f"User {email} has been added to the board", "success")
                 board_link = url_for('board.shared_board', board_id=board_id, _external=True)
-                subject = "You have been added to a board"
-                body = build_email_body(email, "board", board_link)
-                send_email(email, subject, body)
+                notify_user(email, "board", board_link, board_data['name'])
             else:
                 flash(f"User with email {email} does not exist in the system", "danger")
 
@@ -325,9 +336,7 @@ def init_board_routes(db):
         )
 
         if user_found.get('email'):
-            subject = f"You have been removed from the board {board_data['name']}"
-            body = build_email_body(user_found['email'], "removed", link=None, context_name=board_data['name'])
-            send_email(user_found['email'], subject, body)
+            notify_user(user_found['email'], "removed", None, board_data['name'])
         
         flash(f"User {user_found.get('email')} has been removed from the board", "warning")
         return redirect(url_for('board.board', board_id=board_id))
@@ -335,10 +344,6 @@ def init_board_routes(db):
     @board_bp.route('/export/board/<board_id>/csv')
     @login_required
     def export_board_csv(board_id):
-        from flask import Response
-        from io import StringIO
-        import csv
-        
         # Get board details
         board_data = board_repo.get_board(board_id)
         
@@ -357,51 +362,37 @@ def init_board_routes(db):
             flash("You do not have access to this board", "danger")
             return redirect(url_for('dashboard'))
         
-        # Get tasks for this board
-        tasks = task_repo.get_board_tasks(board_id)
-        
-        # Create CSV file
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Task ID', 'Title', 'Description', 'Status', 'Priority', 'Due Date', 
-                        'Assigned To', 'Created By', 'Created At', 'Updated At'])
-        
-        # Write task data
-        for task in tasks:
-            # Handle assigned to field (might be single user or list)
-            if isinstance(task.get('assignedTo'), list):
-                assigned_to = ', '.join([u.get('email', '') for u in task.get('assignedTo', [])])
-            elif task.get('assignedTo'):
-                assigned_to = task.get('assignedTo', {}).get('email', '')
-            else:
-                assigned_to = 'Unassigned'
-            
-            # Format timestamps
-            created_at = format_datetime_exact(task.get('createdAt', ''))
-            updated_at = format_datetime_exact(task.get('updatedAt', ''))
-            
-            writer.writerow([
-                task.get('id', ''),
-                task.get('title', ''),
-                task.get('description', ''),
-                'Completed' if task.get('completed', False) else 'Active',
-                task.get('priority', ''),
-                task.get('dueDate', ''),
-                assigned_to,
-                task.get('creatorName', ''),
-                created_at,
-                updated_at
-            ])
-        
-        # Prepare response
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename=board_{board_id}.csv"}
-        )
+        def task_rows():
+            # Tasks are read page by page while the response is being sent
+            for task in task_repo.iter_board_tasks(board_id, page_size=CSV_EXPORT_PAGE_SIZE):
+                # Handle assigned to field (might be single user or list)
+                if isinstance(task.get('assignedTo'), list):
+                    assigned_to = ', '.join([u.get('email', '') for u in task.get('assignedTo', [])])
+                elif task.get('assignedTo'):
+                    assigned_to = task.get('assignedTo', {}).get('email', '')
+                else:
+                    assigned_to = 'Unassigned'
+
+                # Format timestamps
+                created_at = format_datetime_exact(task.get('createdAt', ''))
+                updated_at = format_datetime_exact(task.get('updatedAt', ''))
+
+                yield [
+                    task.get('id', ''),
+                    task.get('title', ''),
+                    task.get('description', ''),
+                    'Completed' if task.get('completed', False) else 'Active',
+                    task.get('priority', ''),
+                    task.get('dueDate', ''),
+                    assigned_to,
+                    task.get('creatorName', ''),
+                    created_at,
+                    updated_at
+                ]
+
+        header = ['Task ID', 'Title', 'Description', 'Status', 'Priority', 'Due Date',
+                  'Assigned To', 'Created By', 'Created At', 'Updated At']
+        return csv_response(header, task_rows(), filename=f"board_{board_id}.csv")
     
     @board_bp.route('/export/my-boards/csv')
     @login_required
@@ -435,7 +426,7 @@ def init_board_routes(db):
         
         is_owner = board_data.get('createdBy') == current_uid
         if is_owner:
-            board_repo.delete_board(board_id)
+            board_repo.delete_board(board_id, allow_async=True)
             flash("You were the owner. Board and all members were removed.", "warning")
             return redirect(url_for('dashboard'))
 
@@ -445,7 +436,7 @@ def init_board_routes(db):
 
         # Only update if there's a change
         if len(updated_users) != len(users):
-            db.collection('boards').document(board_id).update({'users': updated_users})
+            board_repo.set_board_users(board_id, updated_users)
             flash("You have left the board.", "warning")
         else:
             flash("You are not a member of this board.", "danger")
@@ -483,31 +474,20 @@ def init_board_routes(db):
             return redirect(url_for('board.shared_board', board_id=board_id))
 
     def generate_board_csv_response(boards, filename='boards.csv'):
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Write header
-        writer.writerow(['Board Name', 'Description', 'Created At', 'Total Tasks', 'Completed Tasks', 'Users'])
-
-        # Write each board's data
-        for board in boards:
-            created_at = format_datetime_exact(board.get('createdAt'))
-            users = ', '.join([user.get('email', '') for user in board.get('users', [])])
-            writer.writerow([
-                board.get('name', ''),
-                board.get('description', ''),
-                created_at,
-                board.get('taskCount', 0),
-                board.get('completedTaskCount', 0),
-                users
-            ])
-
-        # Send response
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-disposition": f"attachment; filename={filename}"}
-        )
+        def board_rows():
+            for board in boards:
+                created_at = format_datetime_exact(board.get('createdAt'))
+                users = ', '.join([user.get('email', '') for user in board.get('users', [])])
+                yield [
+                    board.get('name', ''),
+                    board.get('description', ''),
+                    created_at,
+                    board.get('taskCount', 0),
+                    board.get('completedTaskCount', 0),
+                    users
+                ]
+
+        header = ['Board Name', 'Description', 'Created At', 'Total Tasks', 'Completed Tasks', 'Users']
+        return csv_response(header, board_rows(), filename=filename)
         
     return board_bp
\ No newline at end of file
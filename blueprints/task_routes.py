@@ -1,12 +1,12 @@
 # blueprints/task_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 import logging
 from utils.auth_utils import login_required
 from repositories.board_repository import BoardRepository
 from repositories.task_repository import TaskRepository
 from utils.activity_utils import add_activity
 from firebase_admin import firestore
-from utils.email_utils import build_email_body, send_email
+from utils.notification_utils import notify_user
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -78,9 +78,7 @@ def init_task_routes(db):
         # Send notifications
         for user in assigned_users:
             if user['email'] != session['user']['email']:
-                subject = "You have been assigned a task"
-                body = build_email_body(user['email'], "task", task_link)
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "task", task_link, board_data['name'], title)
 
         return redirect(url_for('board.board', board_id=board_id))
 
@@ -118,14 +116,7 @@ def init_task_routes(db):
             if completed:
                 board_owner = next((u for u in board_data['users'] if u.get('uid') == board_data.get('createdBy')), None)
                 if board_owner and board_owner.get('email') != current_user_email:
-                    subject = "A Task Has Been Completed"
-                    body = build_email_body(
-                        recipient_email=board_owner['email'],
-                        subject_type="task_completed",
-                        link=task_link,
-                        extra_info=task_data.get('title', '')
-                    )
-                    send_email(board_owner['email'], subject, body)
+                    notify_user(board_owner['email'], "task-completed", task_link, board_data['name'], task_data.get('title', ''))
 
             update_data = {
                 'completed': completed,
@@ -193,21 +184,12 @@ def init_task_routes(db):
         # Notify new assignees
         for user in assigned_users:
             if user.get('uid') in new_assignees and user.get('email') != current_user_email:
-                subject = "You have been assigned a task"
-                body = build_email_body(user['email'], "task", task_link)
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "task", task_link, board_data['name'], title)
 
         # Notify removed assignees
         for user in previous_assigned:
             if user.get('uid') in removed_users and user.get('email') != current_user_email:
-                subject = "You have been unassigned from a task"
-                body = build_email_body(
-                    recipient_email=user['email'],
-                    subject_type="unassigned",
-                    link=None,
-                    context_name=board_data.get('name', '')
-                )
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "unassigned", None, board_data.get('name', ''), title)
 
         return redirect(url_for('board.board', board_id=board_id))
     
@@ -309,9 +291,7 @@ def init_task_routes(db):
             board_owner = next((u for u in board_data['users'] if u['uid'] == board_data['createdBy']), None)
             if board_owner and board_owner.get('email') != current_user_email:
                 task_link = url_for('board.board', board_id=board_id, _external=True)
-                subject = "A task was marked as completed"
-                body = build_email_body(board_owner['email'], "task-completed", task_link)
-                send_email(board_owner['email'], subject, body)
+                notify_user(board_owner['email'], "task-completed", task_link, board_data['name'], task_data['title'])
 
         # Log activity
         status_text = "Completed" if new_status else "Reopened"
@@ -376,6 +356,36 @@ def init_task_routes(db):
         return redirect(url_for('board.board', board_id=board_id))
     
 
+    @task_bp.route('/comments/<board_id>/<task_id>')
+    @login_required
+    def task_comments(board_id, task_id):
+        board_data = board_repo.get_board(board_id)
+        if not board_data:
+            return jsonify({'error': 'Board not found'}), 404
+
+        current_uid = session['user']['uid']
+        current_email = session['user']['email']
+
+        user_in_board = any(user.get('uid') == current_uid or user.get('email') == current_email for user in board_data.get('users', []))
+        if not user_in_board:
+            return jsonify({'error': 'You do not have access to this board'}), 403
+
+        page_size = min(request.args.get('limit', 20, type=int) or 20, 100)
+        comments, next_cursor = task_repo.get_task_comments_page(
+            board_id, task_id, after=request.args.get('after'), page_size=page_size
+        )
+
+        return jsonify({
+            'comments': [{
+                'id': comment['id'],
+                'text': comment.get('text', ''),
+                'creatorName': comment.get('creatorName', ''),
+                'createdAt': comment['createdAt'].isoformat() if hasattr(comment.get('createdAt'), 'isoformat') else None
+            } for comment in comments],
+            'nextCursor': next_cursor
+        })
+    
+
     @task_bp.route('/shared-add-task/<board_id>', methods=['POST'])
     @login_required
     def shared_add_task(board_id):
@@ -436,9 +446,7 @@ def init_task_routes(db):
         # Send notifications
         for user in assigned_users:
             if user['email'] != session['user']['email']:
-                subject = "You have been assigned a task"
-                body = build_email_body(user['email'], "task", task_link)
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "task", task_link, board_data['name'], title)
 
         return redirect(url_for('board.shared_board', board_id=board_id))
 
@@ -476,14 +484,7 @@ def init_task_routes(db):
             if completed:
                 board_owner = next((u for u in board_data['users'] if u.get('uid') == board_data.get('createdBy')), None)
                 if board_owner and board_owner.get('email') != current_user_email:
-                    subject = "A Task Has Been Completed"
-                    body = build_email_body(
-                        recipient_email=board_owner['email'],
-                        subject_type="task_completed",
-                        link=task_link,
-                        extra_info=task_data.get('title', '')
-                    )
-                    send_email(board_owner['email'], subject, body)
+                    notify_user(board_owner['email'], "task-completed", task_link, board_data['name'], task_data.get('title', ''))
 
             update_data = {
                 'completed': completed,
@@ -551,21 +552,12 @@ def init_task_routes(db):
         # Notify new assignees
         for user in assigned_users:
             if user.get('uid') in new_assignees and user.get('email') != current_user_email:
-                subject = "You have been assigned a task"
-                body = build_email_body(user['email'], "task", task_link)
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "task", task_link, board_data['name'], title)
 
         # Notify removed assignees
         for user in previous_assigned:
             if user.get('uid') in removed_users and user.get('email') != current_user_email:
-                subject = "You have been unassigned from a task"
-                body = build_email_body(
-                    recipient_email=user['email'],
-                    subject_type="unassigned",
-                    link=None,
-                    context_name=board_data.get('name', '')
-                )
-                send_email(user['email'], subject, body)
+                notify_user(user['email'], "unassigned", None, board_data.get('name', ''), title)
 
         return redirect(url_for('board.shared_board', board_id=board_id))
 
@@ -667,9 +659,7 @@ def init_task_routes(db):
             board_owner = next((u for u in board_data['users'] if u['uid'] == board_data['createdBy']), None)
             if board_owner and board_owner.get('email') != current_user_email:
                 task_link = url_for('board.shared_board', board_id=board_id, _external=True)
-                subject = "A task was marked as completed"
-                body = build_email_body(board_owner['email'], "task-completed", task_link)
-                send_email(board_owner['email'], subject, body)
+                notify_user(board_owner['email'], "task-completed", task_link, board_data['name'], task_data['title'])
 
         # Log activity
         status_text = "Completed" if new_status else "Reopened"
@@ -1,7 +1,7 @@
 import os
 import firebase_admin
 import pyrebase
-from firebase_admin import credentials, firestore, auth, storage
+from firebase_admin import credentials, auth, storage
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,19 +18,18 @@ FIREBASE_MESSAGING_SENDER_ID = os.getenv('FIREBASE_MESSAGING_SENDER_ID')
 FIREBASE_APP_ID = os.getenv('FIREBASE_APP_ID')
 
 # Initialize Firebase Admin SDK
+# Only the app is set up here; init_storage creates a Firestore client when that backend is chosen
 def init_firebase_admin():
     try:
         default_app = firebase_admin.get_app()
-        db = firestore.client()
         bucket = storage.bucket(app=default_app, name=FIREBASE_STORAGE_BUCKET)
     except ValueError:
         # The app doesn't exist yet, so initialize it
         cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
         firebase_admin.initialize_app(cred)
-        db = firestore.client()
         bucket = storage.bucket(app=firebase_admin.get_app(), name=FIREBASE_STORAGE_BUCKET)
     
-    return db, bucket
+    return bucket
 
 # Initialize Pyrebase
 def init_pyrebase():
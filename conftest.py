@@ -0,0 +1,2 @@
+# conftest.py
+# Lets pytest import the app packages (storage, repositories, utils) from the repository root
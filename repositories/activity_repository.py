@@ -1,11 +1,59 @@
 # repositories/activity_repository.py
 import logging
 from firebase_admin import firestore
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta, timezone
+from utils.query_utils import iter_query
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Per-user daily activity counters, one document per user per day
+ROLLUP_COLLECTION = 'activity_daily'
+CHART_WINDOWS = (7, 30, 90, 365)
+
+def rollup_doc_id(user_id, day):
+    return f"{user_id}_{day.strftime('%Y-%m-%d')}"
+
+def utc_today():
+    return datetime.now(timezone.utc).date()
+
+def add_rollup_increments(db, batch, activities):
+    """Add one counter increment per (user, UTC day) covered by activities to a write batch"""
+    counts = {}
+    for activity_data in activities:
+        user_id = activity_data.get('userId')
+        if not user_id:
+            continue
+        timestamp = activity_data.get('timestamp')
+        # A server timestamp is assigned when this batch commits, which is now
+        day = utc_today() if timestamp is None or timestamp is firestore.SERVER_TIMESTAMP else activity_date(timestamp)
+        counts[(user_id, day)] = counts.get((user_id, day), 0) + 1
+
+    for (user_id, day), count in counts.items():
+        batch.set(db.collection(ROLLUP_COLLECTION).document(rollup_doc_id(user_id, day)), {
+            'userId': user_id,
+            'date': day.strftime('%Y-%m-%d'),
+            'count': firestore.Increment(count)
+        }, merge=True)
+    return len(counts)
+
+def activity_date(timestamp):
+    """Return the UTC calendar date of an activity timestamp in any of its stored formats"""
+    if hasattr(timestamp, 'todate'):
+        # Firestore timestamp
+        timestamp = timestamp.todate()
+    elif isinstance(timestamp, (int, float)):
+        # Unix timestamp (seconds since epoch)
+        timestamp = datetime.fromtimestamp(timestamp, timezone.utc)
+    elif isinstance(timestamp, date) and not isinstance(timestamp, datetime):
+        return timestamp
+    elif not isinstance(timestamp, datetime):
+        # String or other format
+        timestamp = datetime.fromisoformat(str(timestamp))
+
+    # Naive values are stored in UTC
+    return timestamp.astimezone(timezone.utc).date() if timestamp.tzinfo else timestamp.date()
+
 class ActivityRepository:
     def __init__(self, db):
         self.db = db
@@ -13,8 +61,12 @@ class ActivityRepository:
     def add_activity(self, activity_data):
         """Add an activity log entry"""
         try:
-            activity_ref = self.db.collection('activity').add(activity_data)
-            activity_id = activity_ref[1].id
+            activity_ref = self.db.collection('activity').document()
+            batch = self.db.batch()
+            batch.set(activity_ref, activity_data)
+            add_rollup_increments(self.db, batch, [activity_data])
+            batch.commit()
+            activity_id = activity_ref.id
             
             logger.info(f"Added activity {activity_id} for user {activity_data.get('userId')}")
             return activity_id
@@ -23,72 +75,148 @@ class ActivityRepository:
             raise
             
     def get_user_activities(self, user_id, limit=50):
-        """Get recent activities for a user"""
+        """Get the most recent activities for a user, newest first"""
+        activities, _ = self.get_user_activities_page(user_id, page_size=limit)
+        return activities
+
+    def get_user_activities_page(self, user_id, after=None, page_size=20):
+        """Get one page of a user's activities newest first, returning (activities, next_cursor)"""
         try:
-            activities = []
-            activities_ref = self.db.collection('activity')\
+            activities_ref = self.db.collection('activity')
+            query = activities_ref\
                 .where('userId', '==', user_id)\
-                .limit(limit)\
-                .stream()
-                
-            for activity in activities_ref:
+                .order_by('timestamp', direction=firestore.Query.DESCENDING)\
+                .order_by('__name__', direction=firestore.Query.DESCENDING)
+
+            if after:
+                cursor = activities_ref.document(after).get()
+                if not cursor.exists or cursor.to_dict().get('userId') != user_id:
+                    logger.warning(f"Activity cursor {after} not found for user {user_id}")
+                    return [], None
+                query = query.start_after(cursor)
+
+            # Fetch one extra document to know whether another page exists
+            activities = []
+            for activity in query.limit(page_size + 1).stream():
                 activity_data = activity.to_dict()
                 activity_data['id'] = activity.id
                 activities.append(activity_data)
-                
-            # Sort activities by timestamp
-            activities.sort(key=lambda x: x.get('timestamp', 0) if x.get('timestamp') else 0, reverse=True)
+
+            next_cursor = None
+            if len(activities) > page_size:
+                activities = activities[:page_size]
+                next_cursor = activities[-1]['id']
             
             logger.info(f"Retrieved {len(activities)} activities for user {user_id}")
-            return activities
+            return activities, next_cursor
         except Exception as e:
             logger.error(f"Error retrieving activities for user {user_id}: {str(e)}", exc_info=True)
-            return []
+            return [], None
             
-    def get_activity_chart_data(self, user_id):
-        """Get activity data for chart (last 7 days)"""
+    def iter_user_activities(self, user_id, page_size=500):
+        """Yield every activity of a user, page by page in document order"""
+        query = self.db.collection('activity').where('userId', '==', user_id).order_by('__name__')
+        for activity in iter_query(query, page_size):
+            activity_data = activity.to_dict()
+            activity_data['id'] = activity.id
+            yield activity_data
+
+    def iter_all_activities(self, page_size=500):
+        """Yield every activity entry, page by page"""
+        for activity in iter_query(self.db.collection('activity').order_by('__name__'), page_size):
+            activity_data = activity.to_dict()
+            activity_data['id'] = activity.id
+            yield activity_data
+
+    def get_activity_chart_data(self, user_id, days=7):
+        """Get activity data for chart (last `days` days) from the daily rollups"""
         try:
-            activities = self.get_user_activities(user_id, limit=100)
-            
-            # Group activities by day
-            activity_dates = {}
-            today = datetime.now().date()
-            
-            # Initialize the last 7 days with 0 counts
-            for i in range(6, -1, -1):
-                date = today - timedelta(days=i)
-                activity_dates[date.strftime('%Y-%m-%d')] = 0
-                
-            # Count activities per day
-            for activity in activities:
-                if activity.get('timestamp'):
-                    try:
-                        # Handle different timestamp formats
-                        if hasattr(activity['timestamp'], 'todate'):
-                            # Firestore timestamp
-                            activity_date = activity['timestamp'].todate().date()
-                        elif isinstance(activity['timestamp'], (int, float)):
-                            # Unix timestamp (seconds since epoch)
-                            activity_date = datetime.fromtimestamp(activity['timestamp']).date()
-                        else:
-                            # String or other format
-                            activity_date = datetime.fromisoformat(str(activity['timestamp'])).date()
-                                
-                        date_str = activity_date.strftime('%Y-%m-%d')
-                            
-                        # Count even if not in our 7-day window (for debugging)
-                        if date_str in activity_dates:
-                            activity_dates[date_str] += 1
-                                
-                    except Exception as e:
-                        logger.error(f"Error processing timestamp: {e}, raw timestamp: {activity['timestamp']}")
-                
+            today = utc_today()
+            dates = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+            rollups_ref = self.db.collection(ROLLUP_COLLECTION)
+
+            # One batched read for the whole window
+            counts = {}
+            for snapshot in self.db.get_all([rollups_ref.document(rollup_doc_id(user_id, date)) for date in dates]):
+                if snapshot.exists:
+                    counts[snapshot.id] = snapshot.to_dict().get('count', 0)
+
             # Prepare chart data
-            chart_labels = list(activity_dates.keys())
-            chart_data = list(activity_dates.values())
+            chart_labels = [date.strftime('%Y-%m-%d') for date in dates]
+            chart_data = [counts.get(rollup_doc_id(user_id, date), 0) for date in dates]
             
             logger.info(f"Generated activity chart data for user {user_id}")
             return chart_labels, chart_data
         except Exception as e:
             logger.error(f"Error generating activity chart data: {str(e)}", exc_info=True)
-            return [], []
\ No newline at end of file
+            return [], []
+
+    def delete_user_activities(self, user_id, batch_size=400):
+        """Delete a user's activity entries and daily rollups, one write batch per page"""
+        try:
+            deleted = 0
+            for collection in ('activity', ROLLUP_COLLECTION):
+                while True:
+                    docs = list(self.db.collection(collection)
+                                .where('userId', '==', user_id)
+                                .limit(batch_size).stream())
+                    if not docs:
+                        break
+
+                    batch = self.db.batch()
+                    for doc in docs:
+                        batch.delete(doc.reference)
+                    batch.commit()
+                    deleted += len(docs)
+
+            logger.info(f"Deleted {deleted} activity documents for user {user_id}")
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting activities for user {user_id}: {str(e)}", exc_info=True)
+            raise
+
+    def backfill_daily_rollups(self, batch_size=400):
+        """
+        Rebuild the daily counters of every UTC day before today from the activity history.
+
+        Past days no longer receive live increments, so their counts are overwritten with
+        the recount; today's counters are left to the live path so no increment made
+        while the backfill runs is lost.
+        """
+        try:
+            today = utc_today()
+            counts = {}
+            for activity_data in self.iter_all_activities():
+                if not activity_data.get('userId') or not activity_data.get('timestamp'):
+                    continue
+                try:
+                    day = activity_date(activity_data['timestamp'])
+                except Exception as e:
+                    logger.error(f"Error processing timestamp: {e}, raw timestamp: {activity_data['timestamp']}")
+                    continue
+                if day >= today:
+                    continue
+                key = (activity_data['userId'], day)
+                counts[key] = counts.get(key, 0) + 1
+
+            batch = self.db.batch()
+            pending = 0
+            for (user_id, day), count in counts.items():
+                batch.set(self.db.collection(ROLLUP_COLLECTION).document(rollup_doc_id(user_id, day)), {
+                    'userId': user_id,
+                    'date': day.strftime('%Y-%m-%d'),
+                    'count': count
+                })
+                pending += 1
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+            if pending:
+                batch.commit()
+
+            logger.info(f"Backfilled {len(counts)} daily activity rollups")
+            return len(counts)
+        except Exception as e:
+            logger.error(f"Error backfilling activity rollups: {str(e)}", exc_info=True)
+            raise
@@ -1,13 +1,69 @@
 # repositories/board_repository.py
+import os
+import copy
+import threading
+from datetime import datetime, timedelta, timezone
 from firebase_admin import firestore
 import logging
+from utils.cache_utils import LRUCache
+from utils.concurrency_utils import fan_out
+from utils.query_utils import iter_query
+from repositories.pending_membership_repository import PendingMembershipRepository, normalize_email, unclaimed_emails
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Board document cache settings
+BOARD_CACHE_SIZE = int(os.getenv('BOARD_CACHE_SIZE', '100'))
+BOARD_CACHE_TTL = int(os.getenv('BOARD_CACHE_TTL', '300'))
+# Only boards with a live snapshot listener are cached, so this also caps the cached boards
+BOARD_CACHE_MAX_LISTENERS = int(os.getenv('BOARD_CACHE_MAX_LISTENERS', str(BOARD_CACHE_SIZE)))
+
+# Board deletion settings
+BOARD_DELETE_PAGE_SIZE = int(os.getenv('BOARD_DELETE_PAGE_SIZE', '200'))
+BOARD_DELETE_ASYNC_THRESHOLD = int(os.getenv('BOARD_DELETE_ASYNC_THRESHOLD', '500'))
+# A background delete whose checkpoint is older than this is considered abandoned and may be resumed
+BOARD_DELETE_STALE_AFTER = int(os.getenv('BOARD_DELETE_STALE_AFTER', '600'))
+
+# Firestore rejects write batches larger than this
+MAX_BATCH_WRITES = 500
+
+_board_listeners = {}
+_board_listeners_lock = threading.Lock()
+
+def _stop_board_listener(board_id):
+    """Detach the snapshot listener of a board that was evicted from the cache or expired"""
+    with _board_listeners_lock:
+        watch = _board_listeners.pop(board_id, None)
+    if watch:
+        # Unsubscribing joins the listener thread, so never do it inline from a snapshot callback
+        threading.Thread(target=watch.unsubscribe, daemon=True).start()
+
+# Process-wide cache shared by every BoardRepository instance
+board_cache = LRUCache(maxsize=BOARD_CACHE_SIZE, ttl=BOARD_CACHE_TTL, on_evict=_stop_board_listener)
+
+def invalidate_board_cache(board_id):
+    """Make the next read of a board we just wrote go to the database; its listener stays attached"""
+    board_cache.invalidate(board_id)
+
+def get_board_cache_stats():
+    """Return board cache counters along with the number of live snapshot listeners"""
+    stats = board_cache.stats()
+    with _board_listeners_lock:
+        stats['listeners'] = len(_board_listeners)
+    return stats
+
+def build_membership_index(users):
+    """Derive the memberUids/memberEmails index fields from a board's users list"""
+    return {
+        'memberUids': sorted({u['uid'] for u in users if u.get('uid')}),
+        'memberEmails': sorted({u['email'] for u in users if u.get('email')})
+    }
+
 class BoardRepository:
     def __init__(self, db):
         self.db = db
+        self.pending_repo = PendingMembershipRepository(db)
         
     def get_user_boards(self, user_id):
         """Get boards created by a specific user"""
@@ -17,6 +73,8 @@ class BoardRepository:
             
             for board in boards_ref:
                 board_data = board.to_dict()
+                if board_data.get('deleting'):
+                    continue
                 board_data['id'] = board.id
                 boards.append(board_data)
                 
@@ -26,37 +84,57 @@ class BoardRepository:
             logger.error(f"Error retrieving user boards: {str(e)}", exc_info=True)
             return []
             
+    def iter_user_boards(self, user_id, page_size=200):
+        """Yield every board created by a user, page by page, without holding them all in memory"""
+        query = self.db.collection('boards').where('createdBy', '==', user_id).order_by('__name__')
+        for board in iter_query(query, page_size):
+            board_data = board.to_dict()
+            board_data['id'] = board.id
+            yield board_data
+
+    def iter_all_boards(self, page_size=500):
+        """Yield every board in the database, page by page"""
+        for board in iter_query(self.db.collection('boards').order_by('__name__'), page_size):
+            board_data = board.to_dict()
+            board_data['id'] = board.id
+            yield board_data
+
     def get_shared_boards(self, user_id, user_email):
         """Get boards shared with a specific user"""
         try:
-            boards = []
-            shared_ref = self.db.collection('boards').stream()
+            boards = {}
+            lookups = [('memberUids', user_id)]
+            if user_email:
+                lookups.append(('memberEmails', user_email))
 
-            for board in shared_ref:
-                board_data = board.to_dict()
-                board_users = board_data.get('users', [])
+            for field, value in lookups:
+                shared_ref = self.db.collection('boards').where(field, 'array_contains', value).stream()
+                for board in shared_ref:
+                    if board.id in boards:
+                        continue
 
-                # Check if the current user is still in the board's user list
-                is_still_member = any(
-                    user.get('uid') == user_id or user.get('email') == user_email
-                    for user in board_users
-                )
+                    board_data = board.to_dict()
 
-                # Only include if the user is still a member and not the board's creator
-                if is_still_member and board_data.get('createdBy') != user_id:
-                    board_data['id'] = board.id
-                    boards.append(board_data)
+                    # Only include boards the user doesn't own
+                    if board_data.get('createdBy') != user_id and not board_data.get('deleting'):
+                        board_data['id'] = board.id
+                        boards[board.id] = board_data
 
             logger.info(f"Retrieved {len(boards)} shared boards for user {user_id}")
-            return boards
+            return list(boards.values())
 
         except Exception as e:
             logger.error(f"Error retrieving shared boards: {str(e)}", exc_info=True)
             return []
 
-            
     def get_board(self, board_id):
         """Get a specific board by ID"""
+        cached = board_cache.get(board_id)
+        if cached is not None:
+            if cached.get('deleting'):
+                return None
+            return copy.deepcopy(cached)
+
         try:
             board_ref = self.db.collection('boards').document(board_id).get()
             
@@ -66,18 +144,84 @@ class BoardRepository:
                 
             board_data = board_ref.to_dict()
             board_data['id'] = board_ref.id
+
+            if board_data.get('deleting'):
+                logger.info(f"Board {board_id} is being deleted")
+                return None
+
+            # Boards without a listener would miss other workers' writes, so they are not cached
+            if self._watch_board(board_id) and board_id not in board_cache:
+                board_cache.set(board_id, copy.deepcopy(board_data))
             
             logger.info(f"Retrieved board {board_id}")
             return board_data
         except Exception as e:
             logger.error(f"Error retrieving board {board_id}: {str(e)}", exc_info=True)
             return None
+
+    def _watch_board(self, board_id):
+        """
+        Keep a cached board fresh with changes made by other workers.
+
+        Returns:
+            True if the board has a snapshot listener, False if the listener cap is reached
+            or the backend's listeners miss other processes' writes
+        """
+        if not getattr(self.db, 'listeners_see_all_writes', True):
+            # Writes from other processes sharing a SQLite file would never reach the listener
+            return False
+
+        with _board_listeners_lock:
+            if board_id in _board_listeners:
+                return True
+            if len(_board_listeners) >= BOARD_CACHE_MAX_LISTENERS:
+                return False
+            # Reserve the slot so concurrent requests don't open a second listener
+            _board_listeners[board_id] = None
+
+        def on_snapshot(doc_snapshots, changes, read_time):
+            for doc in doc_snapshots:
+                with _board_listeners_lock:
+                    if doc.id not in _board_listeners:
+                        # The board was evicted and this listener is shutting down
+                        continue
+                if doc.exists:
+                    board_data = doc.to_dict()
+                    board_data['id'] = doc.id
+                    board_cache.set(doc.id, board_data)
+                else:
+                    board_cache.invalidate(doc.id)
+
+        try:
+            watch = self.db.collection('boards').document(board_id).on_snapshot(on_snapshot)
+        except Exception as e:
+            logger.error(f"Error attaching listener to board {board_id}: {str(e)}", exc_info=True)
+            with _board_listeners_lock:
+                _board_listeners.pop(board_id, None)
+            board_cache.invalidate(board_id)
+            return False
+
+        with _board_listeners_lock:
+            if board_id in _board_listeners:
+                _board_listeners[board_id] = watch
+                return True
+
+        # The board left the cache while the listener was starting
+        threading.Thread(target=watch.unsubscribe, daemon=True).start()
+        return False
             
     def create_board(self, board_data):
         """Create a new board"""
         try:
-            new_board = self.db.collection('boards').add(board_data)
-            board_id = new_board[1].id
+            board_data.update(build_membership_index(board_data.get('users', [])))
+            board_ref = self.db.collection('boards').document()
+
+            batch = self.db.batch()
+            batch.set(board_ref, board_data)
+            for email in unclaimed_emails(board_data.get('users', [])):
+                self.pending_repo.record_board(batch, email, board_ref.id)
+            batch.commit()
+            board_id = board_ref.id
             
             logger.info(f"Created board {board_id}")
             return board_id
@@ -89,29 +233,135 @@ class BoardRepository:
         """Update a board's data"""
         try:
             self.db.collection('boards').document(board_id).update(data)
+            invalidate_board_cache(board_id)
             logger.info(f"Updated board {board_id}")
             return True
         except Exception as e:
             logger.error(f"Error updating board {board_id}: {str(e)}", exc_info=True)
             return False
             
-    def delete_board(self, board_id):
-        """Delete a board and its tasks"""
+    def delete_board(self, board_id, allow_async=False):
+        """
+        Delete a board with its tasks and their comments.
+
+        Args:
+            board_id: Board to delete
+            allow_async: Delete boards with more than BOARD_DELETE_ASYNC_THRESHOLD tasks on a
+                background thread; the board is flagged as deleting until the thread finishes,
+                and resume_board_deletes finishes it if the thread fails or the process exits
+
+        Returns:
+            Dict with the 'tasks' and 'comments' deleted and whether it ran 'async', or False on error
+        """
         try:
-            # Delete all tasks in the board
-            tasks_ref = self.db.collection('boards').document(board_id).collection('tasks').stream()
-            for task in tasks_ref:
-                task.reference.delete()
-                
-            # Delete the board
-            self.db.collection('boards').document(board_id).delete()
-            
-            logger.info(f"Deleted board {board_id} with all its tasks")
-            return True
+            board_ref = self.db.collection('boards').document(board_id)
+
+            if allow_async:
+                board = board_ref.get()
+                task_count = board.to_dict().get('taskCount', 0) if board.exists else 0
+                if task_count > BOARD_DELETE_ASYNC_THRESHOLD:
+                    board_ref.update({
+                        'deleting': True,
+                        'deleteError': None,
+                        'deleteUpdatedAt': firestore.SERVER_TIMESTAMP
+                    })
+                    invalidate_board_cache(board_id)
+                    threading.Thread(target=self._delete_board_in_background, args=(board_id,),
+                                     name=f"delete-board-{board_id}", daemon=True).start()
+                    logger.info(f"Deleting board {board_id} with {task_count} tasks in the background")
+                    return {'tasks': task_count, 'comments': None, 'async': True}
+
+            counts = self._delete_board_tree(board_id)
+            if counts is None:
+                return False
+            return dict(counts, **{'async': False})
         except Exception as e:
             logger.error(f"Error deleting board {board_id}: {str(e)}", exc_info=True)
             return False
-            
+
+    def _delete_board_in_background(self, board_id):
+        if self._delete_board_tree(board_id) is None:
+            # The board stays flagged as deleting; record the failure so resume_board_deletes retries it
+            try:
+                self.db.collection('boards').document(board_id).update({
+                    'deleteError': 'Background delete failed',
+                    'deleteUpdatedAt': firestore.SERVER_TIMESTAMP
+                })
+            except Exception as e:
+                logger.error(f"Error recording failed delete of board {board_id}: {str(e)}", exc_info=True)
+
+    def resume_board_deletes(self, stale_after=BOARD_DELETE_STALE_AFTER):
+        """Finish, in the foreground, background board deletes that failed or whose checkpoint has gone stale"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+        resumed = 0
+        for board in iter_query(self.db.collection('boards').where('deleting', '==', True).order_by('__name__')):
+            board_data = board.to_dict()
+            updated_at = board_data.get('deleteUpdatedAt')
+            if not board_data.get('deleteError') and updated_at and updated_at > cutoff:
+                # Probably still being deleted by a live process
+                continue
+
+            logger.info(f"Resuming delete of board {board.id}")
+            if self._delete_board_tree(board.id) is not None:
+                resumed += 1
+        return resumed
+
+    def _delete_board_tree(self, board_id):
+        """Delete a board's tasks and comments page by page in write batches, then the board itself"""
+        try:
+            board_ref = self.db.collection('boards').document(board_id)
+            tasks_ref = board_ref.collection('tasks')
+            counts = {'tasks': 0, 'comments': 0}
+            # Background deletes checkpoint every page so a stalled one can be told apart from a live one
+            board = board_ref.get()
+            deleting = board.exists and board.to_dict().get('deleting')
+
+            def list_comments(task_ref):
+                return list(task_ref.collection('comments').list_documents(page_size=BOARD_DELETE_PAGE_SIZE))
+
+            batch = self.db.batch()
+            pending = 0
+
+            def delete(ref):
+                nonlocal batch, pending
+                batch.delete(ref)
+                pending += 1
+                if pending >= MAX_BATCH_WRITES:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            # Tasks are removed as we go, so each page is simply the first one still left
+            while True:
+                task_refs = [task.reference for task in tasks_ref.select([]).limit(BOARD_DELETE_PAGE_SIZE).stream()]
+                if not task_refs:
+                    break
+
+                # Fetch every task's comment page concurrently; any failure aborts the delete
+                for task_ref, comment_refs in zip(task_refs, fan_out(list_comments, task_refs, bulk=True)):
+                    for comment_ref in comment_refs:
+                        delete(comment_ref)
+                    counts['comments'] += len(comment_refs)
+                    delete(task_ref)
+                    counts['tasks'] += 1
+
+                if pending:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+                if deleting:
+                    board_ref.update({'deleteUpdatedAt': firestore.SERVER_TIMESTAMP})
+
+            # The board goes last so an interrupted delete can simply be run again
+            board_ref.delete()
+            invalidate_board_cache(board_id)
+
+            logger.info(f"Deleted board {board_id} with {counts['tasks']} tasks and {counts['comments']} comments")
+            return counts
+        except Exception as e:
+            logger.error(f"Error deleting tasks of board {board_id}: {str(e)}", exc_info=True)
+            return None
+
     def add_user_to_board(self, board_id, user_data):
         """Add a user to a board"""
         try:
@@ -123,9 +373,7 @@ class BoardRepository:
             board_data = board_ref.to_dict()
             board_data['users'].append(user_data)
             
-            self.db.collection('boards').document(board_id).update({
-                'users': board_data['users']
-            })
+            self.set_board_users(board_id, board_data['users'])
             
             logger.info(f"Added user {user_data.get('email')} to board {board_id}")
             return True
@@ -144,12 +392,161 @@ class BoardRepository:
             board_data = board_ref.to_dict()
             board_data['users'] = [u for u in board_data['users'] if u.get('uid') != user_id]
             
-            self.db.collection('boards').document(board_id).update({
-                'users': board_data['users']
-            })
+            self.set_board_users(board_id, board_data['users'])
             
             logger.info(f"Removed user {user_id} from board {board_id}")
             return True
         except Exception as e:
             logger.error(f"Error removing user from board {board_id}: {str(e)}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
+
+    def set_board_users(self, board_id, users):
+        """Replace a board's users list and keep the membership index in sync"""
+        update_data = {'users': users}
+        update_data.update(build_membership_index(users))
+
+        batch = self.db.batch()
+        batch.update(self.db.collection('boards').document(board_id), update_data)
+        for email in unclaimed_emails(users):
+            self.pending_repo.record_board(batch, email, board_id)
+        batch.commit()
+
+        invalidate_board_cache(board_id)
+        logger.info(f"Set {len(users)} users on board {board_id}")
+
+    def remove_user_from_all_boards(self, user_id, batch_size=400):
+        """Strip user_id from every board whose membership index lists it, one write batch per page"""
+        try:
+            removed = 0
+            while True:
+                boards = list(self.db.collection('boards')
+                              .where('memberUids', 'array_contains', user_id)
+                              .limit(batch_size).stream())
+                if not boards:
+                    break
+
+                batch = self.db.batch()
+                for board in boards:
+                    # Rewriting the index as well guarantees the board drops out of the next page
+                    users = [u for u in board.to_dict().get('users', []) if u.get('uid') != user_id]
+                    update_data = {'users': users}
+                    update_data.update(build_membership_index(users))
+                    batch.update(board.reference, update_data)
+                batch.commit()
+
+                for board in boards:
+                    invalidate_board_cache(board.id)
+                removed += len(boards)
+
+            logger.info(f"Removed user {user_id} from {removed} boards")
+            return removed
+        except Exception as e:
+            logger.error(f"Error removing user {user_id} from boards: {str(e)}", exc_info=True)
+            raise
+
+    def mark_creator_deleted(self, user_id, batch_size=400):
+        """Record on every board created by user_id that its creator's account is gone"""
+        try:
+            updated = []
+            pending = 0
+            batch = self.db.batch()
+            boards = self.db.collection('boards').where('createdBy', '==', user_id).stream()
+
+            for board in boards:
+                if board.to_dict().get('creatorStatus') == 'deleted':
+                    continue
+                batch.update(board.reference, {'creatorStatus': 'deleted'})
+                updated.append(board.id)
+                pending += 1
+
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+            for board_id in updated:
+                invalidate_board_cache(board_id)
+
+            logger.info(f"Marked the creator of {len(updated)} boards as deleted")
+            return len(updated)
+        except Exception as e:
+            logger.error(f"Error marking boards of deleted user {user_id}: {str(e)}", exc_info=True)
+            raise
+
+    def claim_pending_boards(self, board_ids, email, user_id, display_name, batch_size=400):
+        """Attach a newly registered uid to the email-only entries on the given boards"""
+        try:
+            claimed = []
+            pending = 0
+            batch = self.db.batch()
+            refs = [self.db.collection('boards').document(board_id) for board_id in board_ids]
+
+            for snapshot in self.db.get_all(refs) if refs else []:
+                if not snapshot.exists:
+                    continue
+
+                users = snapshot.to_dict().get('users', [])
+                modified = False
+                for user_entry in users:
+                    if normalize_email(user_entry.get('email')) == normalize_email(email) and not user_entry.get('uid'):
+                        user_entry['uid'] = user_id
+                        user_entry['displayName'] = display_name
+                        modified = True
+                if not modified:
+                    continue
+
+                update_data = {'users': users}
+                update_data.update(build_membership_index(users))
+                batch.update(snapshot.reference, update_data)
+                claimed.append(snapshot.id)
+                pending += 1
+
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+            for board_id in claimed:
+                invalidate_board_cache(board_id)
+
+            logger.info(f"Claimed {len(claimed)} pending boards for {email}")
+            return len(claimed)
+        except Exception as e:
+            logger.error(f"Error claiming pending boards for {email}: {str(e)}", exc_info=True)
+            raise
+
+    def backfill_membership_index(self, batch_size=400):
+        """Populate memberUids/memberEmails on boards created before the index existed"""
+        try:
+            updated = 0
+            pending = 0
+            batch = self.db.batch()
+
+            for board in self.db.collection('boards').stream():
+                board_data = board.to_dict()
+                index = build_membership_index(board_data.get('users', []))
+                if all(board_data.get(field) == value for field, value in index.items()):
+                    continue
+
+                batch.update(board.reference, index)
+                pending += 1
+                updated += 1
+
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+            board_cache.clear()
+
+            logger.info(f"Backfilled membership index on {updated} boards")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling membership index: {str(e)}", exc_info=True)
+            raise
@@ -0,0 +1,121 @@
+# repositories/pending_membership_repository.py
+from firebase_admin import firestore
+import logging
+from utils.query_utils import iter_query_pages
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# One document per pending grant under pending_memberships/{email}/grants, so an email that is
+# invited often never grows a single document and claiming removes exactly what it claimed
+PENDING_COLLECTION = 'pending_memberships'
+GRANTS_COLLECTION = 'grants'
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+def unclaimed_emails(users):
+    """Normalized emails of user entries that have an email but no uid yet"""
+    if isinstance(users, dict):
+        users = [users]
+    return {normalize_email(u['email']) for u in users or [] if u.get('email') and not u.get('uid')}
+
+class PendingMembershipRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def _grants(self, email):
+        return self.db.collection(PENDING_COLLECTION).document(normalize_email(email)).collection(GRANTS_COLLECTION)
+
+    def record_board(self, writer, email, board_id):
+        """Record, through a batch or transaction, that board_id lists email without a uid"""
+        writer.set(self._grants(email).document(f"board_{board_id}"), {
+            'email': normalize_email(email),
+            'boardId': board_id,
+            'createdAt': firestore.SERVER_TIMESTAMP
+        })
+
+    def record_task(self, writer, email, board_id, task_id):
+        """Record, through a batch or transaction, that a task is assigned to email without a uid"""
+        writer.set(self._grants(email).document(f"task_{board_id}_{task_id}"), {
+            'email': normalize_email(email),
+            'boardId': board_id,
+            'taskId': task_id,
+            'createdAt': firestore.SERVER_TIMESTAMP
+        })
+
+    def iter_pending(self, email, page_size=400):
+        """
+        Yield the boards and tasks waiting for email to register, one page of grants at a time.
+
+        Each page is {'boardIds', 'taskPaths', 'grantRefs'}; pass grantRefs to clear once
+        the page has been claimed.
+        """
+        query = self._grants(email).order_by('__name__')
+        for page in iter_query_pages(query, page_size):
+            pending = {'boardIds': [], 'taskPaths': [], 'grantRefs': []}
+            for grant in page:
+                grant_data = grant.to_dict()
+                if grant_data.get('taskId'):
+                    pending['taskPaths'].append(f"{grant_data['boardId']}/{grant_data['taskId']}")
+                else:
+                    pending['boardIds'].append(grant_data['boardId'])
+                pending['grantRefs'].append(grant.reference)
+            logger.info(f"Retrieved {len(page)} pending memberships for {email}")
+            yield pending
+
+    def clear(self, grant_refs):
+        """Remove the given grants once they have been claimed; grants recorded since are kept"""
+        try:
+            batch = self.db.batch()
+            for grant_ref in grant_refs:
+                batch.delete(grant_ref)
+            batch.commit()
+            logger.info(f"Cleared {len(grant_refs)} pending memberships")
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing pending memberships: {str(e)}", exc_info=True)
+            return False
+
+    def backfill(self, batch_size=400):
+        """Build the pending index from boards and tasks that already list email-only users"""
+        try:
+            recorded = 0
+            pending = 0
+            batch = self.db.batch()
+
+            def flush_if_full():
+                nonlocal batch, pending
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            # Drop the old one-document-per-email entries whose arrays the grants replace
+            for legacy in self.db.collection(PENDING_COLLECTION).list_documents():
+                batch.delete(legacy)
+                pending += 1
+                flush_if_full()
+
+            for board in self.db.collection('boards').stream():
+                for email in unclaimed_emails(board.to_dict().get('users', [])):
+                    self.record_board(batch, email, board.id)
+                    pending += 1
+                    recorded += 1
+                    flush_if_full()
+
+            for task in self.db.collection_group('tasks').stream():
+                for email in unclaimed_emails(task.to_dict().get('assignedTo', [])):
+                    self.record_task(batch, email, task.reference.parent.parent.id, task.id)
+                    pending += 1
+                    recorded += 1
+                    flush_if_full()
+
+            if pending:
+                batch.commit()
+
+            logger.info(f"Backfilled {recorded} pending memberships")
+            return recorded
+        except Exception as e:
+            logger.error(f"Error backfilling pending memberships: {str(e)}", exc_info=True)
+            raise
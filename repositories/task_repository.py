@@ -1,13 +1,72 @@
 # repositories/task_repository.py
+import copy
+import json
+import base64
+import heapq
 from firebase_admin import firestore
+from datetime import datetime, timezone
 import logging
+from repositories.board_repository import invalidate_board_cache
+from repositories.pending_membership_repository import PendingMembershipRepository, normalize_email, unclaimed_emails
+from utils.concurrency_utils import fan_out
+from utils.query_utils import iter_query
+from storage import transactional
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def build_assignee_index(assigned_to):
+    """Derive the assigneeUids index field from assignedTo, which may be a list or a single user dict"""
+    if isinstance(assigned_to, dict):
+        assigned_to = [assigned_to]
+    return {'assigneeUids': sorted({u['uid'] for u in assigned_to or [] if u.get('uid')})}
+
+def involved_uids(task_data):
+    """Users a task counts for on their profile: its creator and its assignees with a uid"""
+    uids = set(task_data.get('assigneeUids') or [])
+    if task_data.get('createdBy'):
+        uids.add(task_data['createdBy'])
+    return uids
+
+def user_count_increments(old_task, new_task):
+    """
+    Board field updates moving the per-user userTaskCounts from old_task to new_task.
+
+    Either side may be None for a task being created or deleted.
+    """
+    updates = {}
+    old_uids = involved_uids(old_task) if old_task else set()
+    new_uids = involved_uids(new_task) if new_task else set()
+    old_completed = bool(old_task and old_task.get('completed'))
+    new_completed = bool(new_task and new_task.get('completed'))
+
+    for uid in old_uids | new_uids:
+        tasks_delta = (uid in new_uids) - (uid in old_uids)
+        completed_delta = (uid in new_uids and new_completed) - (uid in old_uids and old_completed)
+        if tasks_delta:
+            updates[f"userTaskCounts.{uid}.tasks"] = firestore.Increment(tasks_delta)
+        if completed_delta:
+            updates[f"userTaskCounts.{uid}.completed"] = firestore.Increment(completed_delta)
+    return updates
+
+def encode_task_cursor(board_id, task_id):
+    """Opaque profile page cursor naming the last task shown"""
+    return base64.urlsafe_b64encode(json.dumps([board_id, task_id]).encode()).decode()
+
+def decode_task_cursor(cursor):
+    """Return (board_id, task_id) from encode_task_cursor, or None if the cursor is malformed"""
+    try:
+        board_id, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not all(isinstance(part, str) and part and '/' not in part for part in (board_id, task_id)):
+        return None
+    return board_id, task_id
+
 class TaskRepository:
     def __init__(self, db):
         self.db = db
+        self.pending_repo = PendingMembershipRepository(db)
         
     def get_board_tasks(self, board_id):
         """Get all tasks for a specific board"""
@@ -26,6 +85,269 @@ class TaskRepository:
             logger.error(f"Error retrieving tasks for board {board_id}: {str(e)}", exc_info=True)
             return []
             
+    def iter_board_tasks(self, board_id, page_size=500):
+        """Yield a board's tasks page by page with limit/start_after, so large boards are never held in memory"""
+        query = self.db.collection('boards').document(board_id).collection('tasks').order_by('__name__')
+        for task in iter_query(query, page_size):
+            task_data = task.to_dict()
+            task_data['id'] = task.id
+            yield task_data
+
+    def iter_all_tasks(self, page_size=500):
+        """Yield every task of every board, page by page; each task carries its boardId"""
+        for task in iter_query(self.db.collection_group('tasks').order_by('__name__'), page_size):
+            task_data = task.to_dict()
+            task_data['id'] = task.id
+            task_data['boardId'] = task.reference.parent.parent.id
+            yield task_data
+
+    def get_user_tasks_page(self, user_id, board_ids, after=None, page_size=50):
+        """
+        Get tasks created by or assigned to a user on the given boards, newest first.
+
+        Args:
+            user_id: User ID to look up
+            board_ids: Boards the user can open; tasks on other boards are skipped before paging
+            after: Cursor returned by the previous page
+            page_size: Number of tasks per page
+
+        Returns:
+            (tasks, next_cursor); each task carries its boardId
+        """
+        try:
+            board_ids = set(board_ids)
+            query_base = [
+                self.db.collection_group('tasks').where('assigneeUids', 'array_contains', user_id),
+                self.db.collection_group('tasks').where('createdBy', '==', user_id)
+            ]
+
+            cursor = None
+            if after:
+                # The cursor names the last task shown, so ties on createdAt resume exactly;
+                # only tasks on the user's own boards are ever read through it
+                position = decode_task_cursor(after)
+                if position is None or position[0] not in board_ids:
+                    logger.warning(f"Rejected task cursor {after!r} for user {user_id}")
+                    return [], None
+                board_id, task_id = position
+                cursor = self.db.collection('boards').document(board_id).collection('tasks').document(task_id).get()
+                if not cursor.exists:
+                    logger.warning(f"Task cursor {after!r} not found for user {user_id}")
+                    return [], None
+
+            def stream(query):
+                query = query.order_by('createdAt', direction=firestore.Query.DESCENDING)\
+                    .order_by('__name__', direction=firestore.Query.DESCENDING)
+                if cursor is not None:
+                    query = query.start_after(cursor)
+                for task in iter_query(query, page_size + 1):
+                    yield (task.get('createdAt'), task.reference.path), task
+
+            # Merge both newest-first streams, reading further pages until the page is full
+            tasks = []
+            seen = set()
+            merged = heapq.merge(*(stream(query) for query in query_base), key=lambda item: item[0], reverse=True)
+            for (_, path), task in merged:
+                if path in seen:
+                    continue
+                seen.add(path)
+                board_id = task.reference.parent.parent.id
+                if board_id not in board_ids:
+                    continue
+
+                task_data = task.to_dict()
+                task_data['id'] = task.id
+                task_data['boardId'] = board_id
+                tasks.append(task_data)
+                if len(tasks) > page_size:
+                    break
+
+            next_cursor = None
+            if len(tasks) > page_size:
+                tasks = tasks[:page_size]
+                next_cursor = encode_task_cursor(tasks[-1]['boardId'], tasks[-1]['id'])
+
+            logger.info(f"Retrieved {len(tasks)} tasks for user {user_id}")
+            return tasks, next_cursor
+        except Exception as e:
+            logger.error(f"Error retrieving tasks for user {user_id}: {str(e)}", exc_info=True)
+            return [], None
+
+    def iter_user_tasks(self, user_id, page_size=200):
+        """
+        Yield every task created by or assigned to a user, page by page in document order.
+
+        Each task carries its boardId. Tasks that are both created by and assigned to the
+        user come from the assignee query only, so nothing is yielded twice and no set of
+        seen tasks has to be kept.
+        """
+        queries = [
+            (self.db.collection_group('tasks').where('assigneeUids', 'array_contains', user_id), False),
+            (self.db.collection_group('tasks').where('createdBy', '==', user_id), True)
+        ]
+        for query, skip_assigned in queries:
+            for task in iter_query(query.order_by('__name__'), page_size):
+                task_data = task.to_dict()
+                if skip_assigned and user_id in task_data.get('assigneeUids', []):
+                    continue
+                task_data['id'] = task.id
+                task_data['boardId'] = task.reference.parent.parent.id
+                yield task_data
+
+    def count_user_tasks(self, user_id, boards):
+        """
+        Count tasks created by or assigned to a user on the given boards, returning (total, completed).
+
+        Boards carry per-user userTaskCounts kept in the same transactions as taskCount, so
+        this reads no tasks. Boards written before those counters existed are counted with
+        aggregation queries through fan_out; a failed count raises FanOutError.
+        """
+        total = completed = 0
+        uncounted = []
+        for board in boards:
+            if 'userTaskCounts' not in board:
+                uncounted.append(board['id'])
+                continue
+            counts = board['userTaskCounts'].get(user_id) or {}
+            total += counts.get('tasks') or 0
+            completed += counts.get('completed') or 0
+
+        for task_count, completed_count in fan_out(lambda board_id: self.count_board_user_tasks(board_id, user_id), uncounted):
+            total += task_count
+            completed += completed_count
+        return total, completed
+
+    def count_board_user_tasks(self, board_id, user_id):
+        """Count one board's tasks created by or assigned to a user server-side, returning (tasks, completed)"""
+        tasks_ref = self.db.collection('boards').document(board_id).collection('tasks')
+
+        def count(query):
+            return query.count().get()[0][0].value
+
+        def involved(query):
+            created = count(query.where('createdBy', '==', user_id))
+            assigned = count(query.where('assigneeUids', 'array_contains', user_id))
+            both = count(query.where('createdBy', '==', user_id).where('assigneeUids', 'array_contains', user_id))
+            return created + assigned - both
+
+        return involved(tasks_ref), involved(tasks_ref.where('completed', '==', True))
+
+    def backfill_user_task_counts(self, board_ids=None):
+        """Rebuild every board's userTaskCounts from its tasks; run after backfill-assignee-index"""
+        try:
+            if board_ids:
+                boards = [self.db.collection('boards').document(board_id) for board_id in board_ids]
+            else:
+                boards = (board.reference for board in iter_query(self.db.collection('boards').select([]).order_by('__name__')))
+
+            updated = 0
+            for board_ref in boards:
+                user_counts = {}
+                query = board_ref.collection('tasks').select(['createdBy', 'assigneeUids', 'completed']).order_by('__name__')
+                for task in iter_query(query):
+                    task_data = task.to_dict()
+                    for uid in involved_uids(task_data):
+                        counts = user_counts.setdefault(uid, {'tasks': 0, 'completed': 0})
+                        counts['tasks'] += 1
+                        counts['completed'] += 1 if task_data.get('completed') else 0
+
+                board_ref.update({'userTaskCounts': user_counts})
+                invalidate_board_cache(board_ref.id)
+                updated += 1
+
+            logger.info(f"Rebuilt user task counts on {updated} boards")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling user task counts: {str(e)}", exc_info=True)
+            raise
+
+    def backfill_assignee_index(self, batch_size=400):
+        """Populate assigneeUids on tasks written before the index existed"""
+        try:
+            updated = 0
+            pending = 0
+            batch = self.db.batch()
+
+            for task in self.db.collection_group('tasks').stream():
+                task_data = task.to_dict()
+                index = build_assignee_index(task_data.get('assignedTo', []))
+                if task_data.get('assigneeUids') == index['assigneeUids']:
+                    continue
+
+                batch.update(task.reference, index)
+                pending += 1
+                updated += 1
+
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+
+            logger.info(f"Backfilled assignee index on {updated} tasks")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling assignee index: {str(e)}", exc_info=True)
+            raise
+            
+    def claim_pending_tasks(self, task_paths, email, user_id, display_name, batch_size=400):
+        """Attach a newly registered uid to the email-only assignees of the given "board/task" paths"""
+        try:
+            claimed = 0
+            pending = 0
+            batch = self.db.batch()
+            refs = []
+            for path in task_paths:
+                board_id, task_id = path.split('/', 1)
+                refs.append(self.db.collection('boards').document(board_id).collection('tasks').document(task_id))
+
+            claimed_boards = set()
+            for snapshot in self.db.get_all(refs) if refs else []:
+                if not snapshot.exists:
+                    continue
+
+                old_task = snapshot.to_dict()
+                assigned_to = copy.deepcopy(old_task.get('assignedTo', []))
+                modified = False
+                for assignee in [assigned_to] if isinstance(assigned_to, dict) else assigned_to or []:
+                    if normalize_email(assignee.get('email')) == normalize_email(email) and not assignee.get('uid'):
+                        assignee['uid'] = user_id
+                        assignee['displayName'] = display_name
+                        modified = True
+                if not modified:
+                    continue
+
+                update_data = {'assignedTo': assigned_to}
+                update_data.update(build_assignee_index(assigned_to))
+                batch.update(snapshot.reference, update_data)
+                # The user now counts this task on their profile, in the same batch
+                counts = user_count_increments(old_task, dict(old_task, **update_data))
+                if counts:
+                    board_ref = snapshot.reference.parent.parent
+                    batch.update(board_ref, counts)
+                    claimed_boards.add(board_ref.id)
+                    pending += 1
+                claimed += 1
+                pending += 1
+
+                if pending >= batch_size:
+                    batch.commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+            if pending:
+                batch.commit()
+            for board_id in claimed_boards:
+                invalidate_board_cache(board_id)
+
+            logger.info(f"Claimed {claimed} pending task assignments for {email}")
+            return claimed
+        except Exception as e:
+            logger.error(f"Error claiming pending tasks for {email}: {str(e)}", exc_info=True)
+            raise
+
     def get_task(self, board_id, task_id):
         """Get a specific task by ID"""
         try:
@@ -47,11 +369,26 @@ class TaskRepository:
     def add_task(self, board_id, task_data):
         """Add a new task to a board"""
         try:
-            task_ref = self.db.collection('boards').document(board_id).collection('tasks').add(task_data)
-            task_id = task_ref[1].id
-            
-            # Update task count in board
-            self.update_task_counts(board_id)
+            board_ref = self.db.collection('boards').document(board_id)
+            task_ref = board_ref.collection('tasks').document()
+
+            if 'assignedTo' in task_data:
+                task_data.update(build_assignee_index(task_data['assignedTo']))
+
+            @transactional
+            def create_in_transaction(transaction):
+                transaction.set(task_ref, task_data)
+                for email in unclaimed_emails(task_data.get('assignedTo', [])):
+                    self.pending_repo.record_task(transaction, email, board_id, task_ref.id)
+                counts = {'taskCount': firestore.Increment(1)}
+                if task_data.get('completed', False):
+                    counts['completedTaskCount'] = firestore.Increment(1)
+                counts.update(user_count_increments(None, task_data))
+                transaction.update(board_ref, counts)
+
+            create_in_transaction(self.db.transaction())
+            invalidate_board_cache(board_id)
+            task_id = task_ref.id
             
             logger.info(f"Added task {task_id} to board {board_id}")
             return task_id
@@ -62,10 +399,7 @@ class TaskRepository:
     def update_task(self, board_id, task_id, task_data):
         """Update a task"""
         try:
-            self.db.collection('boards').document(board_id).collection('tasks').document(task_id).update(task_data)
-            
-            # Update task counts in board
-            self.update_task_counts(board_id)
+            self._update_task_and_counts(board_id, task_id, task_data)
             
             logger.info(f"Updated task {task_id} in board {board_id}")
             return True
@@ -76,10 +410,26 @@ class TaskRepository:
     def delete_task(self, board_id, task_id):
         """Delete a task"""
         try:
-            self.db.collection('boards').document(board_id).collection('tasks').document(task_id).delete()
-            
-            # Update task counts in board
-            self.update_task_counts(board_id)
+            board_ref = self.db.collection('boards').document(board_id)
+            task_ref = board_ref.collection('tasks').document(task_id)
+
+            @transactional
+            def delete_in_transaction(transaction):
+                snapshot = task_ref.get(transaction=transaction)
+                if not snapshot.exists:
+                    return False
+
+                old_task = snapshot.to_dict()
+                transaction.delete(task_ref)
+                counts = {'taskCount': firestore.Increment(-1)}
+                if old_task.get('completed', False):
+                    counts['completedTaskCount'] = firestore.Increment(-1)
+                counts.update(user_count_increments(old_task, None))
+                transaction.update(board_ref, counts)
+                return True
+
+            if delete_in_transaction(self.db.transaction()):
+                invalidate_board_cache(board_id)
             
             logger.info(f"Deleted task {task_id} from board {board_id}")
             return True
@@ -90,38 +440,81 @@ class TaskRepository:
     def toggle_task_completion(self, board_id, task_id, update_data):
         """Toggle task completion status"""
         try:
-            self.db.collection('boards').document(board_id).collection('tasks').document(task_id).update(update_data)
-            
-            # Update completed task count in board
-            self.update_task_counts(board_id)
+            self._update_task_and_counts(board_id, task_id, update_data)
             
             logger.info(f"Toggled completion for task {task_id} in board {board_id}")
             return True
         except Exception as e:
             logger.error(f"Error toggling task {task_id} in board {board_id}: {str(e)}", exc_info=True)
             return False
+
+    def _update_task_and_counts(self, board_id, task_id, update_data):
+        """Apply a task update and adjust the board's completed and per-user counts in one transaction"""
+        board_ref = self.db.collection('boards').document(board_id)
+        task_ref = board_ref.collection('tasks').document(task_id)
+        if 'assignedTo' in update_data:
+            update_data = dict(update_data, **build_assignee_index(update_data['assignedTo']))
+
+        @transactional
+        def update_in_transaction(transaction):
+            snapshot = task_ref.get(transaction=transaction)
+            old_task = snapshot.to_dict() if snapshot.exists else {}
+            new_task = dict(old_task, **update_data)
+            was_completed = old_task.get('completed', False)
+            is_completed = new_task.get('completed', False)
+
+            transaction.update(task_ref, update_data)
+            for email in unclaimed_emails(update_data.get('assignedTo', [])):
+                self.pending_repo.record_task(transaction, email, board_id, task_id)
+            if not snapshot.exists:
+                return False
+
+            counts = user_count_increments(old_task, new_task)
+            if bool(was_completed) != bool(is_completed):
+                counts['completedTaskCount'] = firestore.Increment(1 if is_completed else -1)
+            if counts:
+                transaction.update(board_ref, counts)
+            return bool(counts)
+
+        if update_in_transaction(self.db.transaction()):
+            invalidate_board_cache(board_id)
             
+    def count_board_tasks(self, board_id):
+        """Count a board's tasks server-side, returning (task_count, completed_count)"""
+        tasks_ref = self.db.collection('boards').document(board_id).collection('tasks')
+        task_count = tasks_ref.count().get()[0][0].value
+        completed_count = tasks_ref.where('completed', '==', True).count().get()[0][0].value
+        return task_count, completed_count
+
+    def count_tasks_for_boards(self, board_ids, bulk=False):
+        """
+        Count several boards' tasks concurrently with fan_out, returning (task_count, completed_count)
+        per board in the order given. A count that fails or times out raises FanOutError.
+        """
+        return fan_out(self.count_board_tasks, board_ids, bulk=bulk)
+
     def update_task_counts(self, board_id):
-        """Update task count and completed task count in board"""
+        """Recount taskCount/completedTaskCount for a board, repairing any drift"""
+        try:
+            task_count, completed_count = self.count_board_tasks(board_id)
+            return self.set_task_counts(board_id, task_count, completed_count)
+        except Exception as e:
+            logger.error(f"Error updating task counts for board {board_id}: {str(e)}", exc_info=True)
+            return False
+
+    def set_task_counts(self, board_id, task_count, completed_count):
+        """Store already computed taskCount/completedTaskCount values on a board"""
         try:
-            tasks_ref = self.db.collection('boards').document(board_id).collection('tasks').stream()
-            task_count = 0
-            completed_count = 0
-            
-            for task in tasks_ref:
-                task_count += 1
-                if task.to_dict().get('completed', False):
-                    completed_count += 1
-                    
             self.db.collection('boards').document(board_id).update({
                 'taskCount': task_count,
                 'completedTaskCount': completed_count
             })
-            
+            invalidate_board_cache(board_id)
+
             logger.info(f"Updated task counts for board {board_id}: {completed_count}/{task_count}")
             return True
         except Exception as e:
-            logger.error(f"Error updating task counts for board {board_id}: {str(e)}", exc_info=True)
+            logger.error(f"Error setting task counts for board {board_id}: {str(e)}", exc_info=True)
             return False
             
     def get_task_comments(self, board_id, task_id):
@@ -141,14 +534,64 @@ class TaskRepository:
             logger.error(f"Error retrieving comments for task {task_id}: {str(e)}", exc_info=True)
             return []
             
+    def get_task_comments_page(self, board_id, task_id, after=None, page_size=20):
+        """Get one page of a task's comments ordered by createdAt, returning (comments, next_cursor)"""
+        try:
+            comments_ref = self.db.collection('boards').document(board_id).collection('tasks').document(task_id).collection('comments')
+            query = comments_ref.order_by('createdAt').order_by('__name__')
+
+            if after:
+                cursor = comments_ref.document(after).get()
+                if not cursor.exists:
+                    logger.warning(f"Comment cursor {after} not found for task {task_id}")
+                    return [], None
+                query = query.start_after(cursor)
+
+            # Fetch one extra document to know whether another page exists
+            comments = []
+            for comment in query.limit(page_size + 1).stream():
+                comment_data = comment.to_dict()
+                comment_data['id'] = comment.id
+                comments.append(comment_data)
+
+            next_cursor = None
+            if len(comments) > page_size:
+                comments = comments[:page_size]
+                next_cursor = comments[-1]['id']
+
+            logger.info(f"Retrieved {len(comments)} comments for task {task_id}")
+            return comments, next_cursor
+        except Exception as e:
+            logger.error(f"Error retrieving comments page for task {task_id}: {str(e)}", exc_info=True)
+            return [], None
+
     def add_comment(self, board_id, task_id, comment_data):
-        """Add a comment to a task"""
+        """Add a comment to a task and bump the task's commentCount"""
         try:
-            comment_ref = self.db.collection('boards').document(board_id).collection('tasks').document(task_id).collection('comments').add(comment_data)
-            comment_id = comment_ref[1].id
+            task_ref = self.db.collection('boards').document(board_id).collection('tasks').document(task_id)
+            comment_ref = task_ref.collection('comments').document()
+
+            batch = self.db.batch()
+            batch.set(comment_ref, comment_data)
+            batch.update(task_ref, {'commentCount': firestore.Increment(1)})
+            batch.commit()
+            comment_id = comment_ref.id
             
             logger.info(f"Added comment {comment_id} to task {task_id}")
             return comment_id
         except Exception as e:
             logger.error(f"Error adding comment to task {task_id}: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+
+    def update_comment_count(self, board_id, task_id):
+        """Recount a task's comments and store the result in commentCount"""
+        try:
+            task_ref = self.db.collection('boards').document(board_id).collection('tasks').document(task_id)
+            comment_count = task_ref.collection('comments').count().get()[0][0].value
+            task_ref.update({'commentCount': comment_count})
+
+            logger.info(f"Updated comment count for task {task_id}: {comment_count}")
+            return comment_count
+        except Exception as e:
+            logger.error(f"Error updating comment count for task {task_id}: {str(e)}", exc_info=True)
+            return None
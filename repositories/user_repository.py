@@ -1,21 +1,138 @@
 # repositories/user_repository.py
+import os
+import time
+import threading
 import logging
 from firebase_admin import auth
+from utils.cache_utils import LRUCache
+from utils.user_search_utils import user_search_index
+from utils.concurrency_utils import fan_out
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Firebase Auth user record cache settings
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '2048'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+USER_NEGATIVE_CACHE_TTL = int(os.getenv('USER_NEGATIVE_CACHE_TTL', '60'))
+
+# Admin user listing settings
+USER_PAGE_CACHE_TTL = int(os.getenv('USER_PAGE_CACHE_TTL', '60'))
+USER_COUNT_TTL = int(os.getenv('USER_COUNT_TTL', '600'))
+
+# auth.get_users accepts at most this many identifiers per call
+GET_USERS_BATCH_SIZE = 100
+# auth.list_users returns at most this many users per page
+LIST_USERS_MAX_PAGE_SIZE = 1000
+# auth.delete_users accepts at most this many uids per call
+DELETE_USERS_BATCH_SIZE = 1000
+# Seconds a bulk enable/disable may take before unfinished updates are reported as failed
+BULK_UPDATE_TIMEOUT = float(os.getenv('BULK_UPDATE_TIMEOUT', '120'))
+
+# Process-wide caches shared by every UserRepository instance, keyed by ('uid', uid) or ('email', email)
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# Lookups that found no user, kept briefly so repeated misses don't reach Firebase Auth
+missing_user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_NEGATIVE_CACHE_TTL)
+# Listing pages keyed by (page_token, page_size), so paging back does not list them again
+user_page_cache = LRUCache(maxsize=256, ttl=USER_PAGE_CACHE_TTL)
+# (page_token, page_size) -> token of the page before it, for "previous" links
+previous_page_tokens = LRUCache(maxsize=4096, ttl=USER_COUNT_TTL)
+
+_user_count = {'value': None, 'expires': 0, 'refreshing': False}
+_user_count_lock = threading.Lock()
+
+def _email_key(email):
+    return ('email', (email or '').strip().lower())
+
+def _cache_user(user):
+    user_cache.set(('uid', user.uid), user)
+    missing_user_cache.invalidate(('uid', user.uid))
+    if user.email:
+        user_cache.set(_email_key(user.email), user)
+        missing_user_cache.invalidate(_email_key(user.email))
+
+def invalidate_user_cache(user_id=None, email=None):
+    """Forget cached lookups for a user after it was changed outside UserRepository"""
+    cached = user_cache.get(('uid', user_id)) if user_id else None
+    emails = {email, cached.email if cached else None} - {None}
+    user_page_cache.clear()
+    if user_id:
+        user_cache.invalidate(('uid', user_id))
+        missing_user_cache.invalidate(('uid', user_id))
+    for address in emails:
+        user_cache.invalidate(_email_key(address))
+        missing_user_cache.invalidate(_email_key(address))
+
+def _adjust_user_count(delta):
+    """Keep the cached user count in step with users created or deleted by this process"""
+    with _user_count_lock:
+        if _user_count['value'] is not None:
+            _user_count['value'] = max(0, _user_count['value'] + delta)
+
+def _index_entry(user):
+    return {'uid': user.uid, 'email': user.email, 'display_name': user.display_name, 'disabled': user.disabled}
+
+def _sweep_users():
+    """Walk every Firebase Auth user once, refreshing the user count and the search index"""
+    try:
+        entries = []
+        page = auth.list_users(max_results=LIST_USERS_MAX_PAGE_SIZE)
+        while page:
+            entries.extend(_index_entry(user) for user in page.users)
+            page = page.get_next_page()
+
+        user_search_index.rebuild(entries)
+        with _user_count_lock:
+            _user_count.update(value=len(entries), expires=time.monotonic() + USER_COUNT_TTL)
+        logger.info(f"Swept {len(entries)} users")
+    except Exception as e:
+        logger.error(f"Error sweeping users: {str(e)}", exc_info=True)
+    finally:
+        with _user_count_lock:
+            _user_count['refreshing'] = False
+
+def _start_user_sweep(force=False):
+    """Start a background sweep unless one is running or the last one is still fresh"""
+    with _user_count_lock:
+        stale = force or time.monotonic() >= _user_count['expires']
+        start = stale and not _user_count['refreshing']
+        if start:
+            _user_count['refreshing'] = True
+
+    if start:
+        threading.Thread(target=_sweep_users, name='user-sweep', daemon=True).start()
+
+def refresh_user_index(user=None, removed_uid=None):
+    """Reflect a user created, changed (user record) or deleted (removed_uid) outside UserRepository"""
+    if user is not None:
+        user_search_index.add(_index_entry(user))
+    if removed_uid:
+        user_search_index.remove(removed_uid)
+
+def get_user_cache_stats():
+    """Return the counters of the user record caches"""
+    return {'found': user_cache.stats(), 'notFound': missing_user_cache.stats(), 'pages': user_page_cache.stats()}
+
 class UserRepository:
     def __init__(self, db):
         self.db = db
         
     def get_user_by_email(self, email):
         """Get a user by email"""
+        key = _email_key(email)
+        cached = user_cache.get(key)
+        if cached is not None:
+            return cached
+        if key in missing_user_cache:
+            return None
+
         try:
             user = auth.get_user_by_email(email)
+            _cache_user(user)
             logger.info(f"Retrieved user with email {email}")
             return user
         except auth.UserNotFoundError:
+            missing_user_cache.set(key, True)
             logger.warning(f"User with email {email} not found")
             return None
         except Exception as e:
@@ -24,17 +141,121 @@ class UserRepository:
             
     def get_user_by_id(self, user_id):
         """Get a user by ID"""
+        key = ('uid', user_id)
+        cached = user_cache.get(key)
+        if cached is not None:
+            return cached
+        if key in missing_user_cache:
+            return None
+
         try:
             user = auth.get_user(user_id)
+            _cache_user(user)
             logger.info(f"Retrieved user with ID {user_id}")
             return user
         except auth.UserNotFoundError:
+            missing_user_cache.set(key, True)
             logger.warning(f"User with ID {user_id} not found")
             return None
         except Exception as e:
             logger.error(f"Error retrieving user with ID {user_id}: {str(e)}", exc_info=True)
             raise
             
+    def get_users_by_ids(self, user_ids):
+        """Get several users by ID, returning a dict of uid to user record or None if not found"""
+        users = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = user_cache.get(('uid', user_id))
+            if cached is not None:
+                users[user_id] = cached
+            elif ('uid', user_id) in missing_user_cache:
+                users[user_id] = None
+            else:
+                missing.append(user_id)
+
+        try:
+            # One Auth call per GET_USERS_BATCH_SIZE users not already cached
+            for start in range(0, len(missing), GET_USERS_BATCH_SIZE):
+                chunk = missing[start:start + GET_USERS_BATCH_SIZE]
+                result = auth.get_users([auth.UidIdentifier(user_id) for user_id in chunk])
+                for user in result.users:
+                    _cache_user(user)
+                    users[user.uid] = user
+                for user_id in chunk:
+                    if user_id not in users:
+                        missing_user_cache.set(('uid', user_id), True)
+                        users[user_id] = None
+
+            logger.info(f"Retrieved {len(users)} users, {len(missing)} from Firebase Auth")
+            return users
+        except Exception as e:
+            logger.error(f"Error retrieving users {missing}: {str(e)}", exc_info=True)
+            raise
+            
+    def list_users_page(self, page_token=None, page_size=50):
+        """
+        Get one page of Firebase Auth users for the admin listing.
+
+        Returns:
+            (users, next_page_token); users are dicts, next_page_token is None on the last page
+        """
+        page_size = max(1, min(page_size, LIST_USERS_MAX_PAGE_SIZE))
+        key = (page_token or '', page_size)
+        cached = user_page_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            page = auth.list_users(page_token=page_token or None, max_results=page_size)
+            users = [{
+                'uid': user.uid,
+                'email': user.email,
+                'display_name': user.display_name,
+                'disabled': user.disabled,
+                'custom_claims': user.custom_claims
+            } for user in page.users]
+            result = (users, page.next_page_token or None)
+            user_page_cache.set(key, result)
+            if result[1]:
+                previous_page_tokens.set((result[1], page_size), page_token or '')
+
+            logger.info(f"Listed {len(users)} users")
+            return result
+        except Exception as e:
+            logger.error(f"Error listing users: {str(e)}", exc_info=True)
+            raise
+
+    def get_previous_page_token(self, page_token, page_size=50):
+        """Return the token of the page listed before page_token ('' for the first page), or None if unknown"""
+        if not page_token:
+            return None
+        return previous_page_tokens.get((page_token, max(1, min(page_size, LIST_USERS_MAX_PAGE_SIZE))))
+
+    def get_user_count(self):
+        """
+        Return the cached number of users, or None until it has been counted.
+
+        A stale or missing count is recounted on a background thread, so callers never
+        wait for the full sweep.
+        """
+        with _user_count_lock:
+            value = _user_count['value']
+        _start_user_sweep()
+        return value
+
+    def search_users(self, query, limit=20):
+        """
+        Search users by email or display name in the in-process index.
+
+        Returns:
+            (users, ready); ready is False while the first sweep is still building the index
+        """
+        if not user_search_index.ready:
+            _start_user_sweep(force=True)
+            return [], False
+        return user_search_index.search(query, limit=limit), True
+
     def create_user(self, email, password, display_name=None):
         """Create a new user"""
         try:
@@ -43,6 +264,10 @@ class UserRepository:
                 password=password,
                 display_name=display_name
             )
+            _cache_user(user)
+            user_page_cache.clear()
+            user_search_index.add(_index_entry(user))
+            _adjust_user_count(1)
             logger.info(f"Created user with email {email}")
             return user
         except Exception as e:
@@ -56,6 +281,9 @@ class UserRepository:
                 user_id,
                 display_name=display_name
             )
+            _cache_user(user)
+            user_page_cache.clear()
+            user_search_index.add(_index_entry(user))
             logger.info(f"Updated user with ID {user_id}")
             return user
         except Exception as e:
@@ -66,8 +294,68 @@ class UserRepository:
         """Delete a user"""
         try:
             auth.delete_user(user_id)
+            invalidate_user_cache(user_id)
+            user_search_index.remove(user_id)
+            _adjust_user_count(-1)
             logger.info(f"Deleted user with ID {user_id}")
             return True
         except Exception as e:
             logger.error(f"Error deleting user with ID {user_id}: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            raise
+            
+    def delete_users(self, user_ids):
+        """
+        Delete many users with auth.delete_users, DELETE_USERS_BATCH_SIZE uids per call.
+
+        Returns:
+            List of {'uid', 'success', 'error'} in input order
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        results = {}
+        for start in range(0, len(user_ids), DELETE_USERS_BATCH_SIZE):
+            chunk = user_ids[start:start + DELETE_USERS_BATCH_SIZE]
+            try:
+                result = auth.delete_users(chunk)
+                errors = {error.index: error.reason for error in result.errors}
+            except Exception as e:
+                logger.error(f"Error deleting {len(chunk)} users: {str(e)}", exc_info=True)
+                errors = {index: str(e) for index in range(len(chunk))}
+
+            for index, user_id in enumerate(chunk):
+                results[user_id] = {'uid': user_id, 'success': index not in errors, 'error': errors.get(index)}
+                if index not in errors:
+                    invalidate_user_cache(user_id)
+                    user_search_index.remove(user_id)
+                    _adjust_user_count(-1)
+
+        deleted = sum(1 for result in results.values() if result['success'])
+        logger.info(f"Bulk deleted {deleted} of {len(user_ids)} users")
+        return [results[user_id] for user_id in user_ids]
+
+    def set_users_disabled(self, user_ids, disabled):
+        """
+        Enable or disable many users, updating them in parallel on the bulk fan-out pool.
+
+        Returns:
+            List of {'uid', 'success', 'error'} in input order
+        """
+        def update(user_id):
+            try:
+                user = auth.update_user(user_id, disabled=disabled)
+                _cache_user(user)
+                user_search_index.add(_index_entry(user))
+                return {'uid': user_id, 'success': True, 'error': None}
+            except Exception as e:
+                return {'uid': user_id, 'success': False, 'error': str(e)}
+
+        user_ids = list(dict.fromkeys(user_ids))
+        results = fan_out(update, user_ids, timeout=BULK_UPDATE_TIMEOUT, bulk=True, return_exceptions=True)
+        results = [
+            {'uid': user_id, 'success': False, 'error': str(result) or 'Timed out'} if isinstance(result, Exception) else result
+            for user_id, result in zip(user_ids, results)
+        ]
+        user_page_cache.clear()
+
+        updated = sum(1 for result in results if result['success'])
+        logger.info(f"Bulk {'disabled' if disabled else 'enabled'} {updated} of {len(user_ids)} users")
+        return results
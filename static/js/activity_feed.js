@@ -0,0 +1,34 @@
+// Shared by index.html and dashboard.html
+// Page through older activity
+(function () {
+    const loadMoreActivity = document.getElementById('load-more-activity');
+    if (!loadMoreActivity) return;
+
+    loadMoreActivity.addEventListener('click', function () {
+        const url = this.dataset.feedUrl + "?limit=10&after=" + encodeURIComponent(this.dataset.nextCursor);
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                const container = document.getElementById('recent-activity');
+                (data.activities || []).forEach(activity => {
+                    const card = document.createElement('div');
+                    card.className = 'card card-fancy mb-2';
+                    const row = document.createElement('div');
+                    row.className = 'd-flex w-100 justify-content-between';
+                    const description = document.createElement('p');
+                    description.className = 'mb-0';
+                    description.textContent = activity.description;
+                    const timestamp = document.createElement('small');
+                    timestamp.textContent = activity.timestamp ? activity.timestamp.slice(0, 10) : '';
+                    row.append(description, timestamp);
+                    card.appendChild(row);
+                    container.appendChild(card);
+                });
+                if (data.nextCursor) {
+                    this.dataset.nextCursor = data.nextCursor;
+                } else {
+                    this.remove();
+                }
+            });
+    });
+})();
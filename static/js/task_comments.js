@@ -0,0 +1,54 @@
+// Shared by board.html and shared_board.html
+// Lazy-load task comments the first time a comments panel is opened
+function loadComments(panel) {
+    const list = panel.querySelector('.comments-list');
+    const moreButton = panel.querySelector('.comments-more');
+    const cursor = list.dataset.nextCursor;
+    const url = list.dataset.commentsUrl + (cursor ? `?after=${encodeURIComponent(cursor)}` : '');
+
+    moreButton.classList.add('d-none');
+    fetch(url)
+        .then(response => response.json())
+        .then(data => {
+            list.querySelector('.comments-placeholder')?.remove();
+            (data.comments || []).forEach(comment => {
+                const item = document.createElement('div');
+                item.className = 'list-group-item list-group-item-action';
+                const header = document.createElement('div');
+                header.className = 'd-flex w-100 justify-content-between';
+                const author = document.createElement('strong');
+                author.textContent = comment.creatorName;
+                const createdAt = document.createElement('small');
+                createdAt.textContent = comment.createdAt ? comment.createdAt.slice(0, 10) : '';
+                header.append(author, createdAt);
+                const text = document.createElement('p');
+                text.className = 'mb-1';
+                text.textContent = comment.text;
+                item.append(header, text);
+                list.appendChild(item);
+            });
+
+            if (!list.children.length) {
+                const empty = document.createElement('div');
+                empty.className = 'list-group-item text-center text-muted';
+                empty.textContent = 'No comments yet';
+                list.appendChild(empty);
+            }
+
+            list.dataset.nextCursor = data.nextCursor || '';
+            moreButton.classList.toggle('d-none', !data.nextCursor);
+        })
+        .catch(() => {
+            const placeholder = list.querySelector('.comments-placeholder');
+            if (placeholder) {placeholder.textContent = 'Could not load comments';}
+        });
+}
+
+document.querySelectorAll('[id^="commentsCollapse"]').forEach(panel => {
+    panel.addEventListener('show.bs.collapse', function () {
+        if (this.dataset.loaded) {return;}
+        this.dataset.loaded = 'true';
+        loadComments(this);
+    });
+    panel.querySelector('.comments-more').addEventListener('click', () => loadComments(panel));
+});
@@ -0,0 +1,46 @@
+# storage/__init__.py
+import os
+import logging
+from storage.document_store import DocumentStore, DocumentNotFoundError, transactional
+
+# Which database the repositories use: firestore, memory or sqlite
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore').strip().lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/taskmanager.sqlite3')
+
+STORAGE_BACKENDS = ('firestore', 'memory', 'sqlite')
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_db = None
+
+def init_storage(default=None, backend=None):
+    """
+    Create the database client the repositories are given, as chosen by STORAGE_BACKEND.
+
+    Args:
+        default: Firestore client to use for the firestore backend; one is created if omitted
+        backend: Overrides STORAGE_BACKEND
+    """
+    global _db
+    backend = (backend or STORAGE_BACKEND).strip().lower()
+
+    if backend == 'firestore':
+        # Imported here so the other backends never need Firestore credentials
+        from firebase_admin import firestore
+        _db = default or firestore.client()
+    elif backend == 'memory':
+        from storage.memory_backend import MemoryStore
+        _db = MemoryStore()
+    elif backend == 'sqlite':
+        from storage.sqlite_backend import SQLiteStore
+        _db = SQLiteStore(SQLITE_PATH)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected one of {', '.join(STORAGE_BACKENDS)}")
+
+    logger.info(f"Using {backend} storage backend")
+    return _db
+
+def get_db():
+    """Return the database client chosen by init_storage, initialising it on first use"""
+    return _db if _db is not None else init_storage()
@@ -0,0 +1,578 @@
+# storage/document_store.py
+import abc
+import contextlib
+import copy
+import random
+import string
+import threading
+from datetime import datetime, date, timezone
+import logging
+from firebase_admin import firestore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+ASCENDING = 'ASCENDING'
+DESCENDING = 'DESCENDING'
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+class DocumentNotFoundError(Exception):
+    """Raised when updating a document that does not exist"""
+
+def _auto_id():
+    return ''.join(random.choices(_AUTO_ID_CHARS, k=20))
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+def _split_field(field_path):
+    return field_path.split('.')
+
+def get_field(data, field_path):
+    """Return (found, value) for a dotted field path"""
+    if field_path == '__name__':
+        raise ValueError('__name__ is resolved from the document path')
+    value = data
+    for part in _split_field(field_path):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+def _set_field(data, field_path, value):
+    parts = _split_field(field_path)
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    data[parts[-1]] = value
+
+def _delete_field(data, field_path):
+    parts = _split_field(field_path)
+    for part in parts[:-1]:
+        data = data.get(part)
+        if not isinstance(data, dict):
+            return
+    data.pop(parts[-1], None)
+
+def _type_rank(value):
+    # Firestore orders values of different types by type first
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, (datetime, date)):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, (list, tuple)):
+        return 8
+    return 9
+
+def sort_key(value):
+    """Key that orders any stored value the way Firestore does"""
+    rank = _type_rank(value)
+    if rank == 3:
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        value = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    elif rank == 8:
+        value = tuple(sort_key(item) for item in value)
+    elif rank == 9:
+        value = tuple(sorted((k, sort_key(v)) for k, v in value.items())) if isinstance(value, dict) else repr(value)
+    return (rank, value)
+
+def _matches(data, field, op, value):
+    found, current = get_field(data, field)
+    if op == 'not-in':
+        return found and current is not None and all(sort_key(current) != sort_key(v) for v in value)
+    if not found:
+        return False
+    if op == '==':
+        return sort_key(current) == sort_key(value)
+    if op == '!=':
+        return sort_key(current) != sort_key(value)
+    if op == 'in':
+        return any(sort_key(current) == sort_key(v) for v in value)
+    if op == 'array_contains':
+        return isinstance(current, list) and any(sort_key(item) == sort_key(value) for item in current)
+    if op == 'array_contains_any':
+        return isinstance(current, list) and any(sort_key(item) == sort_key(v) for item in current for v in value)
+    if _type_rank(current) != _type_rank(value):
+        # Range filters only match values of the same type
+        return False
+    if op == '<':
+        return sort_key(current) < sort_key(value)
+    if op == '<=':
+        return sort_key(current) <= sort_key(value)
+    if op == '>':
+        return sort_key(current) > sort_key(value)
+    if op == '>=':
+        return sort_key(current) >= sort_key(value)
+    raise ValueError(f"Unsupported filter operator {op!r}")
+
+def _resolve(value, current, now):
+    """Return value with server timestamps, increments and array transforms applied to current"""
+    if isinstance(value, dict):
+        current = current if isinstance(current, dict) else {}
+        return {key: _resolve(item, current.get(key), now) for key, item in value.items()}
+    if value is firestore.SERVER_TIMESTAMP:
+        return now
+    if value is firestore.DELETE_FIELD:
+        return value
+    if isinstance(value, firestore.Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, firestore.ArrayUnion):
+        base = list(current) if isinstance(current, list) else []
+        return base + [copy.deepcopy(item) for item in value.values if item not in base]
+    if isinstance(value, firestore.ArrayRemove):
+        base = current if isinstance(current, list) else []
+        return [item for item in base if item not in value.values]
+    return copy.deepcopy(value)
+
+def _merge(target, updates):
+    for key, value in updates.items():
+        if value is firestore.DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+def _strip_deletes(data):
+    return {
+        key: _strip_deletes(value) if isinstance(value, dict) else value
+        for key, value in data.items() if value is not firestore.DELETE_FIELD
+    }
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        found, value = get_field(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class _Watch:
+    def __init__(self, store, path, callback):
+        self._store = store
+        self._path = path
+        self._callback = callback
+
+    def unsubscribe(self):
+        self._store._remove_watch(self._path, self._callback)
+
+
+class DocumentReference:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._store, self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id):
+        return CollectionReference(self._store, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None):
+        return DocumentSnapshot(self, self._store._get(self.path))
+
+    def set(self, document_data, merge=False):
+        self._store._commit([('set', self.path, document_data, merge)])
+
+    def update(self, field_updates):
+        self._store._commit([('update', self.path, field_updates, False)])
+
+    def delete(self):
+        self._store._commit([('delete', self.path, None, False)])
+
+    def on_snapshot(self, callback):
+        watch = self._store._add_watch(self.path, callback)
+        callback([self.get()], [], _utcnow())
+        return watch
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class _AggregationResult:
+    def __init__(self, value):
+        self.alias = 'field_1'
+        self.value = value
+
+
+class AggregationQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self, transaction=None):
+        return [[_AggregationResult(sum(1 for _ in self._query._run()))]]
+
+
+class Query:
+    def __init__(self, store, collection_path=None, collection_id=None, filters=(), orders=(),
+                 limit=None, cursor=None):
+        self._store = store
+        self._collection_path = collection_path
+        self._collection_id = collection_id
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        fields = {
+            'collection_path': self._collection_path,
+            'collection_id': self._collection_id,
+            'filters': self._filters,
+            'orders': self._orders,
+            'limit': self._limit,
+            'cursor': self._cursor
+        }
+        fields.update(changes)
+        return Query(self._store, **fields)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        # Projections only save bandwidth on Firestore; locally the whole document is returned
+        return self
+
+    def count(self, alias=None):
+        return AggregationQuery(self)
+
+    def stream(self, transaction=None):
+        return iter(self._run())
+
+    def get(self, transaction=None):
+        return self._run()
+
+    def _order_key(self, path, data):
+        key = []
+        for field, direction in self._effective_orders():
+            value = path if field == '__name__' else get_field(data, field)[1]
+            item = sort_key(value)
+            key.append(item if direction == ASCENDING else _Reversed(item))
+        return key
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        if not any(field == '__name__' for field, _ in orders):
+            # Firestore breaks ties by document name, in the direction of the last ordering
+            orders.append(('__name__', orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _run(self):
+        documents = []
+        for path, data in self._store._scan(self._collection_path, self._collection_id, self._filters):
+            if not all(_matches(data, field, op, value) for field, op, value in self._filters):
+                continue
+            # Ordering by a field leaves out documents that do not have it
+            if any(field != '__name__' and not get_field(data, field)[0] for field, _ in self._orders):
+                continue
+            documents.append((path, data))
+
+        documents.sort(key=lambda document: self._order_key(*document))
+
+        if self._cursor is not None:
+            cursor_key = self._cursor_key()
+            documents = [document for document in documents
+                         if self._order_key(*document)[:len(cursor_key)] > cursor_key]
+
+        if self._limit is not None:
+            documents = documents[:self._limit]
+        return [DocumentSnapshot(DocumentReference(self._store, path), copy.deepcopy(data)) for path, data in documents]
+
+    def _cursor_key(self):
+        if isinstance(self._cursor, DocumentSnapshot):
+            return self._order_key(self._cursor.reference.path, self._cursor._data or {})
+
+        key = []
+        for field, direction in self._effective_orders():
+            if field not in self._cursor:
+                break
+            item = sort_key(self._cursor[field])
+            key.append(item if direction == ASCENDING else _Reversed(item))
+        return key
+
+
+class _Reversed:
+    """Inverts comparisons so descending orderings can share one sort"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __gt__(self, other):
+        return other.value > self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __le__(self, other):
+        return other.value <= self.value
+
+    def __ge__(self, other):
+        return other.value >= self.value
+
+
+class CollectionReference(Query):
+    def __init__(self, store, path):
+        super().__init__(store, collection_path=path)
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        if '/' not in self.path:
+            return None
+        return DocumentReference(self._store, self.path.rsplit('/', 1)[0])
+
+    def document(self, document_id=None):
+        return DocumentReference(self._store, f"{self.path}/{document_id or _auto_id()}")
+
+    def add(self, document_data, document_id=None):
+        reference = self.document(document_id)
+        reference.set(document_data)
+        return _utcnow(), reference
+
+    def list_documents(self, page_size=None):
+        return [DocumentReference(self._store, path) for path in self._store._list_paths(self.path)]
+
+
+class WriteBatch:
+    def __init__(self, store):
+        self._store = store
+        self._operations = []
+
+    def set(self, reference, document_data, merge=False):
+        self._operations.append(('set', reference.path, document_data, merge))
+
+    def update(self, reference, field_updates):
+        self._operations.append(('update', reference.path, field_updates, False))
+
+    def delete(self, reference):
+        self._operations.append(('delete', reference.path, None, False))
+
+    def commit(self):
+        operations, self._operations = self._operations, []
+        self._store._commit(operations)
+        return []
+
+    def __len__(self):
+        return len(self._operations)
+
+
+class Transaction(WriteBatch):
+    """Writes are buffered and committed together; transactional() holds the store's write lock meanwhile"""
+
+
+def transactional(fn):
+    """
+    Like firestore.transactional, for any storage backend.
+
+    Firestore transactions are handed to the Firestore implementation; local stores run
+    the function inside one write transaction of the backend, so its reads and writes are
+    not interleaved with writes from other threads or processes.
+    """
+    def wrapper(transaction, *args, **kwargs):
+        if not isinstance(transaction, Transaction):
+            return firestore.transactional(fn)(transaction, *args, **kwargs)
+
+        with transaction._store._atomic():
+            result = fn(transaction, *args, **kwargs)
+            transaction.commit()
+        return result
+
+    return wrapper
+
+
+class DocumentStore(abc.ABC):
+    """
+    Base of the local storage backends, exposing the subset of the Firestore client API the
+    repositories use on top of a few primitive operations implemented by each backend.
+    """
+
+    # Whether on_snapshot reports every write to the data, or only writes made through this instance
+    listeners_see_all_writes = True
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._write_depth = 0
+        self._watches = {}
+
+    # Firestore client API
+
+    def collection(self, collection_path):
+        return CollectionReference(self, collection_path)
+
+    def collection_group(self, collection_id):
+        return Query(self, collection_id=collection_id)
+
+    def document(self, document_path):
+        return DocumentReference(self, document_path)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for reference in references:
+            yield DocumentSnapshot(reference, self._get(reference.path))
+
+    # Primitive operations implemented by each backend
+
+    @abc.abstractmethod
+    def _load(self, path):
+        """Return the stored data of path, or None"""
+
+    @abc.abstractmethod
+    def _load_many(self, collection_path, collection_id, filters):
+        """Yield (path, data) for a collection or collection group; filters may be used to narrow the scan"""
+
+    @abc.abstractmethod
+    def _list_paths(self, collection_path):
+        """Return the paths of the documents directly in a collection"""
+
+    @abc.abstractmethod
+    def _store_many(self, changes):
+        """Persist [(path, data or None to delete)]; always called inside _atomic()"""
+
+    def _begin_write(self):
+        """Start a write transaction that other processes sharing the data must wait for"""
+
+    def _end_write(self, commit):
+        """Commit, or roll back, the write transaction started by _begin_write"""
+
+    # Shared behaviour
+
+    def _get(self, path):
+        with self._lock:
+            return copy.deepcopy(self._load(path))
+
+    def _scan(self, collection_path, collection_id, filters):
+        with self._lock:
+            return list(self._load_many(collection_path, collection_id, filters))
+
+    @contextlib.contextmanager
+    def _atomic(self):
+        """Hold the store lock and one backend write transaction; nested calls join the outer one"""
+        with self._lock:
+            outermost = self._write_depth == 0
+            if outermost:
+                self._begin_write()
+            self._write_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._write_depth -= 1
+                if outermost:
+                    self._end_write(commit=False)
+                raise
+            self._write_depth -= 1
+            if outermost:
+                self._end_write(commit=True)
+
+    def _commit(self, operations):
+        now = _utcnow()
+        # The current documents are read inside the write transaction, so transforms such as
+        # Increment cannot lose updates made by another process in between
+        with self._atomic():
+            documents = {}
+            for kind, path, data, merge in operations:
+                current = documents[path] if path in documents else copy.deepcopy(self._load(path))
+
+                if kind == 'delete':
+                    documents[path] = None
+                    continue
+
+                if kind == 'set':
+                    data = _resolve(data, current if merge else None, now)
+                    if merge and current is not None:
+                        _merge(current, data)
+                        documents[path] = current
+                    else:
+                        documents[path] = _strip_deletes(data)
+                else:
+                    if current is None:
+                        raise DocumentNotFoundError(f"No document to update: {path}")
+                    for field_path, value in data.items():
+                        if value is firestore.DELETE_FIELD:
+                            _delete_field(current, field_path)
+                        else:
+                            _set_field(current, field_path, _resolve(value, get_field(current, field_path)[1], now))
+                    documents[path] = current
+
+            changes = list(documents.items())
+            self._store_many(changes)
+            watched = [(path, data, list(self._watches.get(path, ()))) for path, data in changes if self._watches.get(path)]
+
+        for path, data, callbacks in watched:
+            snapshot = DocumentSnapshot(DocumentReference(self, path), copy.deepcopy(data))
+            for callback in callbacks:
+                try:
+                    callback([snapshot], [], now)
+                except Exception as e:
+                    logger.error(f"Error in snapshot listener for {path}: {str(e)}", exc_info=True)
+
+    def _add_watch(self, path, callback):
+        with self._lock:
+            self._watches.setdefault(path, []).append(callback)
+        return _Watch(self, path, callback)
+
+    def _remove_watch(self, path, callback):
+        with self._lock:
+            callbacks = self._watches.get(path, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._watches.pop(path, None)
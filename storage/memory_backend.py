@@ -0,0 +1,47 @@
+# storage/memory_backend.py
+import logging
+from storage.document_store import DocumentStore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class MemoryStore(DocumentStore):
+    """
+    Keeps every document in process memory. Fast and dependency free, but nothing
+    survives a restart and it cannot be shared between worker processes.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._documents = {}
+        # collection path -> set of document paths directly in it
+        self._collections = {}
+
+    def _load(self, path):
+        return self._documents.get(path)
+
+    def _load_many(self, collection_path, collection_id, filters):
+        if collection_path is not None:
+            paths = self._collections.get(collection_path, ())
+        else:
+            paths = [path for collection, members in self._collections.items()
+                     if collection.rsplit('/', 1)[-1] == collection_id for path in members]
+        for path in paths:
+            yield path, self._documents[path]
+
+    def _list_paths(self, collection_path):
+        return sorted(self._collections.get(collection_path, ()))
+
+    def _store_many(self, changes):
+        for path, data in changes:
+            collection = path.rsplit('/', 1)[0]
+            if data is None:
+                self._documents.pop(path, None)
+                members = self._collections.get(collection)
+                if members is not None:
+                    members.discard(path)
+                    if not members:
+                        del self._collections[collection]
+            else:
+                self._documents[path] = data
+                self._collections.setdefault(collection, set()).add(path)
@@ -0,0 +1,135 @@
+# storage/sqlite_backend.py
+import os
+import json
+import sqlite3
+from datetime import datetime, date
+import logging
+from storage.document_store import DocumentStore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_collection ON documents (collection);
+CREATE INDEX IF NOT EXISTS documents_collection_id ON documents (collection_id);
+"""
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'__bytes__': value.hex()}
+    raise TypeError(f"Cannot store value of type {type(value).__name__}")
+
+def _decode(value):
+    if len(value) == 1:
+        if '__datetime__' in value:
+            return datetime.fromisoformat(value['__datetime__'])
+        if '__date__' in value:
+            return date.fromisoformat(value['__date__'])
+        if '__bytes__' in value:
+            return bytes.fromhex(value['__bytes__'])
+    return value
+
+def _json_path(field_path):
+    """JSON path for json_extract, or None if the field name cannot be quoted safely"""
+    parts = field_path.split('.')
+    if any('"' in part or not part for part in parts):
+        return None
+    return '$.' + '.'.join(f'"{part}"' for part in parts)
+
+def _pushdown_value(value):
+    # Only plain strings and numbers compare the same way in SQL and in Python
+    return isinstance(value, str) or (isinstance(value, (int, float)) and not isinstance(value, bool))
+
+class SQLiteStore(DocumentStore):
+    """
+    Keeps documents as JSON rows in a single SQLite file, for single node deployments.
+
+    Equality and array_contains filters on strings and numbers narrow the scan in SQL;
+    every filter is still checked in Python, so the other operators work too.
+
+    Several worker processes may share the file: every write and transaction runs inside
+    BEGIN IMMEDIATE, so transforms and transactional read-modify-writes are atomic across
+    processes. on_snapshot only reports writes made through this instance, so
+    listener-backed caches must not rely on it.
+
+    Args:
+        path: Database file, created along with its directory if missing
+    """
+
+    listeners_see_all_writes = False
+
+    def __init__(self, path):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # One connection shared by all threads; DocumentStore serialises access with its lock.
+        # Writers in other processes wait up to the timeout for the write lock
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        logger.info(f"Opened SQLite document store at {path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, path):
+        row = self._conn.execute('SELECT data FROM documents WHERE path = ?', (path,)).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def _load_many(self, collection_path, collection_id, filters):
+        if collection_path is not None:
+            clauses, params = ['collection = ?'], [collection_path]
+        else:
+            clauses, params = ['collection_id = ?'], [collection_id]
+
+        for field, op, value in filters:
+            json_path = _json_path(field)
+            if json_path is None or not _pushdown_value(value):
+                continue
+            if op == '==':
+                clauses.append('json_extract(data, ?) = ?')
+                params.extend([json_path, value])
+            elif op == 'array_contains':
+                clauses.append('EXISTS (SELECT 1 FROM json_each(data, ?) WHERE json_each.value = ?)')
+                params.extend([json_path, value])
+
+        rows = self._conn.execute(f"SELECT path, data FROM documents WHERE {' AND '.join(clauses)}", params)
+        for path, data in rows.fetchall():
+            yield path, json.loads(data, object_hook=_decode)
+
+    def _list_paths(self, collection_path):
+        rows = self._conn.execute('SELECT path FROM documents WHERE collection = ? ORDER BY path', (collection_path,))
+        return [row[0] for row in rows.fetchall()]
+
+    def _begin_write(self):
+        # Takes the database write lock before anything is read, so a read-modify-write
+        # cannot interleave with one in another process
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    def _end_write(self, commit):
+        self._conn.execute('COMMIT' if commit else 'ROLLBACK')
+
+    def _store_many(self, changes):
+        for path, data in changes:
+            if data is None:
+                self._conn.execute('DELETE FROM documents WHERE path = ?', (path,))
+                continue
+            collection = path.rsplit('/', 1)[0]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO documents (path, collection, collection_id, data) VALUES (?, ?, ?, ?)',
+                (path, collection, collection.rsplit('/', 1)[-1], json.dumps(data, default=_encode))
+            )
@@ -0,0 +1,12 @@
+# tests/conftest.py
+import pytest
+from storage.memory_backend import MemoryStore
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory store; the process-wide board cache is emptied afterwards"""
+    yield MemoryStore()
+
+    from repositories.board_repository import board_cache
+    board_cache.clear()
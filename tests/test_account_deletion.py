@@ -0,0 +1,100 @@
+# tests/test_account_deletion.py
+from datetime import datetime, timedelta, timezone
+import pytest
+import utils.account_deletion_utils as deletion
+from utils.account_deletion_utils import (AccountDeletionJob, DELETION_STEPS, DELETION_JOBS_COLLECTION,
+                                          start_account_deletion, get_account_deletion_status,
+                                          resume_account_deletions)
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Replace every step with one that records its calls; set steps.fail to a step name to make it raise"""
+    class Steps:
+        calls = []
+        fail = None
+
+    def make_step(name):
+        def step(self, uid, email):
+            Steps.calls.append(name)
+            if Steps.fail == name:
+                raise RuntimeError(f"{name} failed")
+            return 1
+        return step
+
+    for name in DELETION_STEPS:
+        monkeypatch.setattr(AccountDeletionJob, f"_step_{name}", make_step(name))
+    return Steps
+
+
+@pytest.fixture
+def no_threads(monkeypatch):
+    """Record the jobs start_account_deletion would run instead of starting threads"""
+    started = []
+
+    class Thread:
+        def __init__(self, target, name, daemon):
+            self.target = target
+
+        def start(self):
+            started.append(self.target.__self__.job_id)
+
+    monkeypatch.setattr(deletion.threading, 'Thread', Thread)
+    return started
+
+
+def job_ref(db, job_id):
+    return db.collection(DELETION_JOBS_COLLECTION).document(job_id)
+
+
+def test_failed_job_resumes_after_its_last_checkpoint(db, steps, no_threads):
+    job_id, _ = start_account_deletion(db, 'u1', 'u1@example.com')
+    steps.fail = 'shared_boards'
+
+    assert AccountDeletionJob(db, job_id).run() == 'failed'
+    assert steps.calls == ['export', 'auth_user', 'owned_boards', 'shared_boards']
+    assert job_ref(db, job_id).get().to_dict()['error'] == 'shared_boards failed'
+
+    steps.calls.clear()
+    steps.fail = None
+    assert resume_account_deletions(db) == 1
+    assert steps.calls == ['shared_boards', 'activities']
+    assert job_ref(db, job_id).get().to_dict()['status'] == 'done'
+
+    # A finished job is never run again
+    assert AccountDeletionJob(db, job_id).run() is None
+
+
+def test_running_job_is_claimed_only_once(db, steps, no_threads):
+    job_id, token = start_account_deletion(db, 'u1', 'u1@example.com')
+    assert no_threads == [job_id]
+
+    job = AccountDeletionJob(db, job_id)
+    assert job.claim() is not None
+    # A second runner and a second request both leave the running job alone
+    assert job.claim() is None
+    assert start_account_deletion(db, 'u1', 'u1@example.com') == (job_id, token)
+    assert no_threads == [job_id]
+    assert resume_account_deletions(db) == 0
+
+
+def test_stale_running_job_is_resumed(db, steps, no_threads):
+    job_id, _ = start_account_deletion(db, 'u1', 'u1@example.com')
+    job_ref(db, job_id).update({'status': 'running',
+                                'updatedAt': datetime.now(timezone.utc) - timedelta(hours=1)})
+
+    assert resume_account_deletions(db, stale_after=60) == 1
+    assert steps.calls == list(DELETION_STEPS)
+
+
+def test_status_requires_the_job_token(db, steps, no_threads):
+    job_id, token = start_account_deletion(db, 'u1', 'u1@example.com')
+
+    status = get_account_deletion_status(db, job_id, token)
+    assert status['status'] == 'pending'
+    assert status['totalSteps'] == len(DELETION_STEPS)
+    assert 'uid' not in status and 'statusToken' not in status
+
+    assert get_account_deletion_status(db, job_id, 'guess') is None
+    assert get_account_deletion_status(db, job_id, None) is None
+    assert get_account_deletion_status(db, 'missing', token) is None
@@ -0,0 +1,72 @@
+# tests/test_board_delete.py
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+import repositories.board_repository as boards_module
+from repositories.board_repository import BoardRepository
+
+
+@pytest.fixture
+def board_repo(db, monkeypatch):
+    monkeypatch.setattr(boards_module, 'BOARD_DELETE_ASYNC_THRESHOLD', 2)
+    monkeypatch.setattr(boards_module, 'BOARD_DELETE_PAGE_SIZE', 2)
+    board_ref = db.collection('boards').document('b1')
+    board_ref.set({'name': 'Board', 'createdBy': 'u1', 'users': [], 'taskCount': 5})
+    for i in range(5):
+        task_ref = board_ref.collection('tasks').document(f't{i}')
+        task_ref.set({'title': f'Task {i}'})
+        task_ref.collection('comments').document('c1').set({'text': 'Hi'})
+    return BoardRepository(db)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_small_board_is_deleted_inline(db, board_repo):
+    db.collection('boards').document('b1').update({'taskCount': 1})
+
+    assert board_repo.delete_board('b1', allow_async=True) == {'tasks': 5, 'comments': 5, 'async': False}
+    assert not db.collection('boards').document('b1').get().exists
+    assert list(db.collection_group('comments').stream()) == []
+
+
+def test_background_delete_hides_the_board_until_done(db, board_repo):
+    assert board_repo.get_board('b1') is not None
+    assert board_repo.delete_board('b1', allow_async=True)['async']
+
+    wait_for(lambda: not db.collection('boards').document('b1').get().exists)
+    assert board_repo.get_board('b1') is None
+    assert list(db.collection_group('tasks').stream()) == []
+
+
+def test_failed_background_delete_is_recorded_and_resumed(db, board_repo, monkeypatch):
+    original = BoardRepository._delete_board_tree
+    monkeypatch.setattr(BoardRepository, '_delete_board_tree', lambda self, board_id: None)
+
+    board_repo.delete_board('b1', allow_async=True)
+    board_ref = db.collection('boards').document('b1')
+    wait_for(lambda: board_ref.get().to_dict().get('deleteError'))
+
+    assert board_repo.get_board('b1') is None
+    assert board_repo.get_user_boards('u1') == []
+
+    monkeypatch.setattr(BoardRepository, '_delete_board_tree', original)
+    assert board_repo.resume_board_deletes() == 1
+    assert not board_ref.get().exists
+    assert list(db.collection_group('comments').stream()) == []
+
+
+def test_resume_skips_live_deletes_and_picks_up_stale_ones(db, board_repo):
+    board_ref = db.collection('boards').document('b1')
+    board_ref.update({'deleting': True, 'deleteUpdatedAt': datetime.now(timezone.utc)})
+
+    assert board_repo.resume_board_deletes(stale_after=600) == 0
+    assert board_ref.get().exists
+
+    board_ref.update({'deleteUpdatedAt': datetime.now(timezone.utc) - timedelta(hours=1)})
+    assert board_repo.resume_board_deletes(stale_after=600) == 1
+    assert not board_ref.get().exists
@@ -0,0 +1,140 @@
+# tests/test_email_outbox.py
+import socketserver
+import threading
+import time
+import pytest
+from utils.email_utils import EmailOutbox, open_smtp_connection, _build_message
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server that records delivered messages and can refuse the first senders"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuse_first=0):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.refuse_left = refuse_first
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in ready')
+        recipients = []
+
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stand-in')
+            elif verb == 'MAIL':
+                with server.lock:
+                    refuse = server.refuse_left > 0
+                    server.refuse_left -= refuse
+                self.reply('451 try again later' if refuse else '250 OK')
+                recipients = []
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip('<> '))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 end with .')
+                lines = []
+                for data in self.rfile:
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data.decode())
+                with server.lock:
+                    server.messages.append((recipients, ''.join(lines)))
+                self.reply('250 queued')
+            elif verb == 'RSET' or verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SMTPStandIn(refuse_first=getattr(request, 'param', 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_outbox(server, **kwargs):
+    host, port = server.server_address
+    return EmailOutbox(connection_factory=lambda: open_smtp_connection(host, port, use_ssl=False),
+                       backoff=0, **kwargs)
+
+
+def test_delivers_queued_mail_over_one_connection(smtp_server):
+    outbox = make_outbox(smtp_server, workers=1)
+    for i in range(3):
+        assert outbox.enqueue(_build_message(f"user{i}@example.com", f"Subject {i}", "<p>Hello</p>"))
+
+    assert outbox.flush(timeout=10)
+    outbox.stop()
+
+    assert [recipients for recipients, _ in smtp_server.messages] == [[f"user{i}@example.com"] for i in range(3)]
+    assert 'Subject: Subject 0' in smtp_server.messages[0][1]
+    assert smtp_server.connections == 1
+    assert outbox.stats() == {'queued': 0, 'sent': 3, 'failed': 0, 'retries': 0}
+
+
+@pytest.mark.parametrize('smtp_server', [2], indirect=True)
+def test_retries_on_a_fresh_connection(smtp_server):
+    outbox = make_outbox(smtp_server, workers=1, max_retries=3)
+    assert outbox.enqueue(_build_message("user@example.com", "Retry", "<p>Hello</p>"))
+
+    assert outbox.flush(timeout=10)
+    outbox.stop()
+
+    assert len(smtp_server.messages) == 1
+    assert smtp_server.connections == 3
+    assert outbox.stats()['sent'] == 1
+    assert outbox.stats()['retries'] == 2
+
+
+@pytest.mark.parametrize('smtp_server', [5], indirect=True)
+def test_drops_message_after_max_retries(smtp_server):
+    outbox = make_outbox(smtp_server, workers=1, max_retries=1)
+    assert outbox.enqueue(_build_message("user@example.com", "Dropped", "<p>Hello</p>"))
+
+    assert outbox.flush(timeout=10)
+    outbox.stop()
+
+    assert smtp_server.messages == []
+    assert outbox.stats()['failed'] == 1
+
+
+def test_full_outbox_refuses_and_stop_does_not_block():
+    release = threading.Event()
+
+    def stuck_connection():
+        release.wait(5)
+        raise OSError("server unreachable")
+
+    outbox = EmailOutbox(connection_factory=stuck_connection, workers=1, max_queue=1, max_retries=0)
+    assert outbox.enqueue(_build_message("a@example.com", "First", ""))
+    # Wait for the worker to pick up the first message so the queue slot is free again
+    while outbox.stats()['queued']:
+        time.sleep(0.01)
+    assert outbox.enqueue(_build_message("b@example.com", "Second", ""))
+    assert not outbox.enqueue(_build_message("c@example.com", "Third", ""))
+
+    started = time.monotonic()
+    outbox.stop(timeout=0.2)
+    assert time.monotonic() - started < 2
+    release.set()
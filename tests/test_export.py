@@ -0,0 +1,47 @@
+# tests/test_export.py
+import json
+import os
+import zipfile
+import utils.account_deletion_utils as deletion
+from utils.export_utils import export_user_data
+
+
+def seed(db):
+    board_ref = db.collection('boards').document('b1')
+    board_ref.set({'name': 'Mine', 'createdBy': 'u1', 'users': []})
+    board_ref.collection('tasks').document('t1').set({'title': 'Created', 'createdBy': 'u1', 'assigneeUids': []})
+    other_ref = db.collection('boards').document('b2')
+    other_ref.set({'name': 'Theirs', 'createdBy': 'u2', 'users': []})
+    other_ref.collection('tasks').document('t2').set({'title': 'Assigned', 'createdBy': 'u2', 'assigneeUids': ['u1']})
+    other_ref.collection('tasks').document('t3').set({'title': 'Unrelated', 'createdBy': 'u2', 'assigneeUids': []})
+    db.collection('activity').document('a1').set({'userId': 'u1', 'description': 'Did things'})
+
+
+def test_export_streams_only_the_users_data(db):
+    seed(db)
+    zip_path = export_user_data(db, 'u1', 'u1@example.com')
+    try:
+        with zipfile.ZipFile(zip_path) as zipf:
+            boards = json.loads(zipf.read('boards.json'))
+            tasks = json.loads(zipf.read('tasks.json'))
+            activities = json.loads(zipf.read('activities.json'))
+    finally:
+        os.remove(zip_path)
+
+    assert [board['name'] for board in boards] == ['Mine']
+    assert sorted(task['title'] for task in tasks) == ['Assigned', 'Created']
+    assert [activity['description'] for activity in activities] == ['Did things']
+
+
+def test_deletion_export_leaves_no_file_behind(db, monkeypatch):
+    seed(db)
+    attached = []
+
+    def queue_email(recipient, subject, message_body, attachment_path):
+        attached.append(attachment_path)
+        return os.path.exists(attachment_path)
+
+    monkeypatch.setattr(deletion, 'send_email_with_attachment', queue_email)
+    assert deletion.AccountDeletionJob(db, 'job')._step_export('u1', 'u1@example.com') == 1
+    assert len(attached) == 1
+    assert not os.path.exists(attached[0])
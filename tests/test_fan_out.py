@@ -0,0 +1,68 @@
+# tests/test_fan_out.py
+import threading
+import time
+import pytest
+from utils.concurrency_utils import fan_out, FanOutError, FanOutTimeoutError
+from repositories.task_repository import TaskRepository
+
+
+def test_results_keep_input_order():
+    def slow_echo(item):
+        time.sleep(0.01 * (5 - item))
+        return item * 10
+
+    assert fan_out(slow_echo, range(5)) == [0, 10, 20, 30, 40]
+
+
+def test_concurrency_is_capped():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def track(item):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return item
+
+    assert fan_out(track, range(8), max_concurrency=2) == list(range(8))
+    assert peak <= 2
+
+
+def test_failures_raise_with_partial_results():
+    def fail_on_two(item):
+        if item == 2:
+            raise ValueError("boom")
+        return item
+
+    with pytest.raises(FanOutError) as excinfo:
+        fan_out(fail_on_two, range(4))
+    assert list(excinfo.value.errors) == [2]
+    assert excinfo.value.results == [0, 1, None, 3]
+
+    results = fan_out(fail_on_two, range(4), return_exceptions=True)
+    assert isinstance(results[2], ValueError)
+
+
+def test_calls_past_their_deadline_time_out():
+    def sleepy(item):
+        time.sleep(0.5 if item else 0)
+        return item
+
+    results = fan_out(sleepy, [0, 1], timeout=0.1, return_exceptions=True)
+    assert results[0] == 0
+    assert isinstance(results[1], FanOutTimeoutError)
+
+
+def test_count_tasks_for_boards(db):
+    for board_id, completed in (('b1', [True, False]), ('b2', [True, True, True])):
+        board_ref = db.collection('boards').document(board_id)
+        board_ref.set({'name': board_id})
+        for i, done in enumerate(completed):
+            board_ref.collection('tasks').document(f't{i}').set({'completed': done})
+
+    assert TaskRepository(db).count_tasks_for_boards(['b2', 'b1', 'empty']) == [(3, 3), (2, 1), (0, 0)]
@@ -0,0 +1,80 @@
+# tests/test_pending_memberships.py
+import pytest
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.pending_membership_repository import PendingMembershipRepository
+
+
+@pytest.fixture
+def repos(db):
+    return BoardRepository(db), TaskRepository(db), PendingMembershipRepository(db)
+
+
+def owner():
+    return {'uid': 'owner', 'email': 'owner@example.com', 'role': 'owner'}
+
+
+def claim(repos, email, uid, page_size=400):
+    """The registration flow: claim each page of grants, then clear exactly that page"""
+    board_repo, task_repo, pending_repo = repos
+    for pending in pending_repo.iter_pending(email, page_size=page_size):
+        board_repo.claim_pending_boards(pending['boardIds'], email, uid, 'New User')
+        task_repo.claim_pending_tasks(pending['taskPaths'], email, uid, 'New User')
+        pending_repo.clear(pending['grantRefs'])
+
+
+def test_invites_are_recorded_one_grant_each(db, repos):
+    board_repo, task_repo, pending_repo = repos
+    board_id = board_repo.create_board({'name': 'B', 'createdBy': 'owner',
+                                        'users': [owner(), {'email': 'New@Example.com'}]})
+    task_repo.add_task(board_id, {'title': 'T', 'createdBy': 'owner', 'assignedTo': [{'email': 'new@example.com'}]})
+    # Recording the same board again does not add a second grant
+    board_repo.set_board_users(board_id, [owner(), {'email': 'new@example.com'}])
+
+    pages = list(pending_repo.iter_pending('new@example.com'))
+    assert len(pages) == 1
+    assert pages[0]['boardIds'] == [board_id]
+    assert len(pages[0]['taskPaths']) == 1
+    assert len(pages[0]['grantRefs']) == 2
+
+
+def test_registration_claims_every_page_and_clears_the_grants(db, repos):
+    board_repo, task_repo, pending_repo = repos
+    board_ids = [board_repo.create_board({'name': f'B{i}', 'createdBy': 'owner',
+                                          'users': [owner(), {'email': 'new@example.com'}]}) for i in range(5)]
+    task_id = task_repo.add_task(board_ids[0], {'title': 'T', 'createdBy': 'owner',
+                                                'assignedTo': [{'email': 'new@example.com'}]})
+
+    claim(repos, 'new@example.com', 'new', page_size=2)
+
+    for board_id in board_ids:
+        assert 'new' in db.collection('boards').document(board_id).get().to_dict()['memberUids']
+    assert task_repo.get_task(board_ids[0], task_id)['assigneeUids'] == ['new']
+    assert list(pending_repo.iter_pending('new@example.com')) == []
+
+
+def test_clear_keeps_grants_recorded_after_the_claim_read(db, repos):
+    board_repo, task_repo, pending_repo = repos
+    first = board_repo.create_board({'name': 'First', 'createdBy': 'owner',
+                                     'users': [owner(), {'email': 'new@example.com'}]})
+
+    pending = next(pending_repo.iter_pending('new@example.com'))
+    # Another request invites the same email while registration is claiming
+    later = board_repo.create_board({'name': 'Later', 'createdBy': 'owner',
+                                     'users': [owner(), {'email': 'new@example.com'}]})
+    board_repo.claim_pending_boards(pending['boardIds'], 'new@example.com', 'new', 'New User')
+    pending_repo.clear(pending['grantRefs'])
+
+    remaining = list(pending_repo.iter_pending('new@example.com'))
+    assert [page['boardIds'] for page in remaining] == [[later]]
+    assert first not in remaining[0]['boardIds']
+
+
+def test_backfill_replaces_legacy_documents(db, repos):
+    board_repo, task_repo, pending_repo = repos
+    db.collection('pending_memberships').document('new@example.com').set({'boardIds': ['stale']})
+    db.collection('boards').document('b1').set({'name': 'B', 'users': [owner(), {'email': 'new@example.com'}]})
+
+    assert pending_repo.backfill() == 1
+    assert not db.collection('pending_memberships').document('new@example.com').get().exists
+    assert [page['boardIds'] for page in pending_repo.iter_pending('new@example.com')] == [['b1']]
@@ -0,0 +1,206 @@
+# tests/test_storage_backends.py
+import multiprocessing
+import pytest
+from firebase_admin import firestore
+from storage import DocumentStore, transactional
+from storage.memory_backend import MemoryStore
+from storage.sqlite_backend import SQLiteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def db(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryStore()
+    else:
+        store = SQLiteStore(str(tmp_path / 'store.sqlite3'))
+        yield store
+        store.close()
+
+
+@pytest.fixture
+def board(db):
+    board_ref = db.collection('boards').document('b1')
+    board_ref.set({'name': 'Board', 'createdBy': 'u1', 'taskCount': 0})
+    for i in range(5):
+        board_ref.collection('tasks').document(f't{i}').set({
+            'n': i,
+            'rank': i // 2,
+            'completed': i % 2 == 0,
+            'createdBy': 'u1',
+            'assigneeUids': ['u2'] if i < 2 else []
+        })
+    return board_ref
+
+
+def ids(query):
+    return [snapshot.id for snapshot in query.stream()]
+
+
+def test_cursor_pages_by_name(db, board):
+    query = db.collection_group('tasks').where('createdBy', '==', 'u1').order_by('__name__')
+
+    first = list(query.limit(2).stream())
+    assert [snapshot.id for snapshot in first] == ['t0', 't1']
+    assert ids(query.start_after(first[-1]).limit(2)) == ['t2', 't3']
+    assert ids(query.start_after({'__name__': 'boards/b1/tasks/t3'})) == ['t4']
+
+
+def test_descending_with_name_tie_breaker(db, board):
+    query = board.collection('tasks')\
+        .order_by('rank', direction=firestore.Query.DESCENDING)\
+        .order_by('__name__', direction=firestore.Query.DESCENDING)
+
+    assert ids(query) == ['t4', 't3', 't2', 't1', 't0']
+
+    first = list(query.limit(2).stream())
+    assert ids(query.start_after(first[-1]).limit(2)) == ['t2', 't1']
+    assert ids(query.start_after(db.document('boards/b1/tasks/t2').get())) == ['t1', 't0']
+
+
+def test_filters_and_count(db, board):
+    assert ids(db.collection_group('tasks').where('assigneeUids', 'array_contains', 'u2')) == ['t0', 't1']
+    assert board.collection('tasks').where('completed', '==', True).count().get()[0][0].value == 3
+    assert ids(board.collection('tasks').where('n', '>=', 3).order_by('n')) == ['t3', 't4']
+
+
+def test_sentinels(db, board):
+    board.update({
+        'taskCount': firestore.Increment(2),
+        'counts.open': firestore.Increment(1),
+        'users': firestore.ArrayUnion(['u2', 'u3']),
+        'updatedAt': firestore.SERVER_TIMESTAMP
+    })
+    board.update({'users': firestore.ArrayRemove(['u2']), 'name': firestore.DELETE_FIELD})
+
+    data = board.get().to_dict()
+    assert data['taskCount'] == 2
+    assert data['counts'] == {'open': 1}
+    assert data['users'] == ['u3']
+    assert 'name' not in data
+    assert data['updatedAt'].tzinfo is not None
+
+
+def test_set_merge(db, board):
+    board.set({'settings': {'theme': 'dark'}, 'taskCount': firestore.Increment(1)}, merge=True)
+    board.set({'settings': {'locale': 'en'}}, merge=True)
+
+    data = board.get().to_dict()
+    assert data['name'] == 'Board'
+    assert data['taskCount'] == 1
+    assert data['settings'] == {'theme': 'dark', 'locale': 'en'}
+
+    board.set({'name': 'Replaced'})
+    assert board.get().to_dict() == {'name': 'Replaced'}
+
+
+def test_transaction_commits_writes_together(db, board):
+    task_ref = board.collection('tasks').document('t5')
+
+    @transactional
+    def add_task(transaction):
+        snapshot = board.get(transaction=transaction)
+        transaction.set(task_ref, {'n': 5})
+        transaction.update(board, {'taskCount': snapshot.to_dict()['taskCount'] + 1})
+
+    add_task(db.transaction())
+    assert task_ref.get().exists
+    assert board.get().to_dict()['taskCount'] == 1
+
+
+def test_failed_transaction_writes_nothing(db, board):
+    task_ref = board.collection('tasks').document('t5')
+
+    @transactional
+    def add_task(transaction):
+        transaction.set(task_ref, {'n': 5})
+        transaction.update(db.collection('boards').document('missing'), {'taskCount': 1})
+
+    with pytest.raises(Exception):
+        add_task(db.transaction())
+    assert not task_ref.get().exists
+
+
+def test_batch_and_get_all(db, board):
+    batch = db.batch()
+    batch.delete(board.collection('tasks').document('t0'))
+    batch.update(board, {'taskCount': 4})
+    batch.commit()
+
+    assert len(list(board.collection('tasks').list_documents())) == 4
+    snapshots = db.get_all([board, db.collection('boards').document('missing')])
+    assert [snapshot.exists for snapshot in snapshots] == [True, False]
+
+
+def test_on_snapshot_reports_writes_through_same_store(db, board):
+    seen = []
+    watch = board.on_snapshot(lambda docs, changes, read_time: seen.append(docs[0].to_dict()['taskCount']))
+    board.update({'taskCount': 1})
+    watch.unsubscribe()
+    board.update({'taskCount': 2})
+
+    assert seen == [0, 1]
+
+
+def test_sqlite_listeners_miss_other_processes_writes(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    first, second = SQLiteStore(path), SQLiteStore(path)
+    try:
+        board_ref = first.collection('boards').document('b1')
+        board_ref.set({'taskCount': 0})
+
+        seen = []
+        board_ref.on_snapshot(lambda docs, changes, read_time: seen.append(docs[0].to_dict()['taskCount']))
+        second.collection('boards').document('b1').update({'taskCount': 1})
+
+        # The write is stored but never reported, which is why the board cache is off for sqlite
+        assert seen == [0]
+        assert board_ref.get().to_dict()['taskCount'] == 1
+        assert not first.listeners_see_all_writes
+        assert MemoryStore.listeners_see_all_writes
+    finally:
+        first.close()
+        second.close()
+
+
+def increment_counters(path, rounds):
+    """Bump a counter with Increment and another with a transactional read-modify-write"""
+    store = SQLiteStore(path)
+    counter_ref = store.collection('counters').document('c1')
+
+    @transactional
+    def bump(transaction):
+        count = counter_ref.get(transaction=transaction).to_dict()['read_modify_write']
+        transaction.update(counter_ref, {'read_modify_write': count + 1})
+
+    try:
+        for _ in range(rounds):
+            counter_ref.update({'increment': firestore.Increment(1)})
+            bump(store.transaction())
+    finally:
+        store.close()
+
+
+def test_sqlite_writes_are_atomic_across_processes(tmp_path):
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        pytest.skip('needs the fork start method')
+    path = str(tmp_path / 'shared.sqlite3')
+    store = SQLiteStore(path)
+    counter_ref = store.collection('counters').document('c1')
+    counter_ref.set({'increment': 0, 'read_modify_write': 0})
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=increment_counters, args=(path, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+    try:
+        assert [worker.exitcode for worker in workers] == [0] * 4
+        assert counter_ref.get().to_dict() == {'increment': 800, 'read_modify_write': 800}
+    finally:
+        store.close()
+
+
+def test_backends_implement_every_hook():
+    with pytest.raises(TypeError):
+        DocumentStore()
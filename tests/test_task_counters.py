@@ -0,0 +1,51 @@
+# tests/test_task_counters.py
+import pytest
+from repositories.task_repository import TaskRepository
+
+
+@pytest.fixture
+def task_repo(db):
+    db.collection('boards').document('b1').set({'name': 'Board', 'createdBy': 'u1', 'users': []})
+    return TaskRepository(db)
+
+
+def board_counts(db):
+    data = db.collection('boards').document('b1').get().to_dict()
+    return data.get('taskCount'), data.get('completedTaskCount', 0)
+
+
+def test_add_and_delete_keep_counts(db, task_repo):
+    open_id = task_repo.add_task('b1', {'title': 'Open', 'completed': False, 'createdBy': 'u1'})
+    done_id = task_repo.add_task('b1', {'title': 'Done', 'completed': True, 'createdBy': 'u1'})
+    assert board_counts(db) == (2, 1)
+
+    assert task_repo.delete_task('b1', done_id)
+    assert board_counts(db) == (1, 0)
+
+    # Deleting a task that is already gone changes nothing
+    assert task_repo.delete_task('b1', done_id)
+    assert board_counts(db) == (1, 0)
+    assert task_repo.get_task('b1', open_id) is not None
+
+
+def test_completion_changes_adjust_completed_count(db, task_repo):
+    task_id = task_repo.add_task('b1', {'title': 'Task', 'completed': False, 'createdBy': 'u1'})
+
+    assert task_repo.toggle_task_completion('b1', task_id, {'completed': True})
+    assert board_counts(db) == (1, 1)
+
+    # Saving the same state again must not count it twice
+    assert task_repo.update_task('b1', task_id, {'completed': True, 'title': 'Renamed'})
+    assert board_counts(db) == (1, 1)
+
+    assert task_repo.toggle_task_completion('b1', task_id, {'completed': False})
+    assert board_counts(db) == (1, 0)
+
+
+def test_update_task_counts_repairs_drift(db, task_repo):
+    task_repo.add_task('b1', {'title': 'A', 'completed': True, 'createdBy': 'u1'})
+    task_repo.add_task('b1', {'title': 'B', 'completed': False, 'createdBy': 'u1'})
+    db.collection('boards').document('b1').update({'taskCount': 7, 'completedTaskCount': 5})
+
+    assert task_repo.update_task_counts('b1')
+    assert board_counts(db) == (2, 1)
@@ -0,0 +1,106 @@
+# tests/test_user_tasks.py
+from datetime import datetime, timedelta, timezone
+import pytest
+from firebase_admin import firestore
+from repositories.task_repository import TaskRepository, encode_task_cursor
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def task_repo(db):
+    for board_id in ('b1', 'b2', 'left'):
+        db.collection('boards').document(board_id).set({'name': board_id, 'createdBy': 'owner', 'users': []})
+    return TaskRepository(db)
+
+
+def add(task_repo, board_id, minute, created_by='other', assignees=(), completed=False):
+    return task_repo.add_task(board_id, {
+        'title': f"{board_id}-{minute}",
+        'createdBy': created_by,
+        'assignedTo': [{'uid': uid, 'email': f"{uid}@example.com"} for uid in assignees],
+        'completed': completed,
+        'createdAt': START + timedelta(minutes=minute)
+    })
+
+
+def boards(db, *board_ids):
+    return [dict(db.collection('boards').document(board_id).get().to_dict(), id=board_id) for board_id in board_ids]
+
+
+def test_pages_newest_first_over_accessible_boards_only(db, task_repo):
+    for minute in range(6):
+        add(task_repo, 'b1', minute, created_by='u1')
+        add(task_repo, 'b2', minute, assignees=['u1'])
+        add(task_repo, 'left', minute, created_by='u1')
+    # Created by and assigned to the user; listed once
+    add(task_repo, 'b1', 10, created_by='u1', assignees=['u1'])
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = task_repo.get_user_tasks_page('u1', {'b1', 'b2'}, after=cursor, page_size=5)
+        assert len(page) == 5 or cursor is None
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert len(seen) == 13
+    assert {task['boardId'] for task in seen} == {'b1', 'b2'}
+    created = [task['createdAt'] for task in seen]
+    assert created == sorted(created, reverse=True)
+    assert len({(task['boardId'], task['id']) for task in seen}) == 13
+
+
+def test_cursor_outside_accessible_boards_is_rejected(db, task_repo):
+    task_id = add(task_repo, 'left', 0, created_by='u1')
+
+    assert task_repo.get_user_tasks_page('u1', {'b1'}, after=encode_task_cursor('left', task_id)) == ([], None)
+    assert task_repo.get_user_tasks_page('u1', {'b1'}, after='users/someone') == ([], None)
+    assert task_repo.get_user_tasks_page('u1', {'b1'}, after=encode_task_cursor('b1', '../x/y')) == ([], None)
+
+
+def test_counts_follow_task_changes_without_reading_tasks(db, task_repo):
+    created = add(task_repo, 'b1', 0, created_by='u1')
+    assigned = add(task_repo, 'b1', 1, assignees=['u1'], completed=True)
+    add(task_repo, 'b1', 2, created_by='u1', assignees=['u1', 'u2'])
+    add(task_repo, 'left', 0, created_by='u1')
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (3, 1)
+    assert task_repo.count_user_tasks('u2', boards(db, 'b1')) == (1, 0)
+
+    task_repo.toggle_task_completion('b1', created, {'completed': True})
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (3, 2)
+
+    # Unassigning the user removes the task from their counts
+    task_repo.update_task('b1', assigned, {'assignedTo': [{'uid': 'u2', 'email': 'u2@example.com'}]})
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (2, 1)
+    assert task_repo.count_user_tasks('u2', boards(db, 'b1')) == (2, 1)
+
+    task_repo.delete_task('b1', created)
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (1, 0)
+
+
+def test_claimed_assignments_are_counted(db, task_repo):
+    task_id = task_repo.add_task('b1', {
+        'title': 'Invite', 'createdBy': 'owner', 'completed': True,
+        'assignedTo': [{'email': 'new@example.com'}]
+    })
+    assert task_repo.count_user_tasks('new', boards(db, 'b1')) == (0, 0)
+
+    assert task_repo.claim_pending_tasks([f"b1/{task_id}"], 'New@example.com', 'new', 'New') == 1
+    assert task_repo.count_user_tasks('new', boards(db, 'b1')) == (1, 1)
+
+
+def test_boards_without_counters_fall_back_to_aggregations(db, task_repo):
+    add(task_repo, 'b1', 0, created_by='u1', completed=True)
+    add(task_repo, 'b1', 1, created_by='u1', assignees=['u1'])
+    add(task_repo, 'b1', 2, assignees=['u1'])
+    db.collection('boards').document('b1').update({'userTaskCounts': firestore.DELETE_FIELD})
+
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (3, 1)
+    assert task_repo.count_user_tasks('other', boards(db, 'b1')) == (1, 0)
+
+    assert task_repo.backfill_user_task_counts() == 3
+    assert 'userTaskCounts' in boards(db, 'b1')[0]
+    assert task_repo.count_user_tasks('u1', boards(db, 'b1')) == (3, 1)
+    assert task_repo.count_user_tasks('other', boards(db, 'b1')) == (1, 0)
@@ -0,0 +1,215 @@
+# utils/account_deletion_utils.py
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+import logging
+from repositories.user_repository import UserRepository
+from repositories.board_repository import BoardRepository
+from repositories.activity_repository import ActivityRepository
+from utils.email_utils import send_email_with_attachment, build_email_body
+from utils.export_utils import export_user_data
+from storage import transactional
+
+DELETION_BATCH_SIZE = int(os.getenv('DELETION_BATCH_SIZE', '400'))
+# A running job whose checkpoint is older than this is considered abandoned and may be resumed
+DELETION_STALE_AFTER = int(os.getenv('DELETION_STALE_AFTER', '600'))
+
+# One document per account deletion, holding its checkpoint
+DELETION_JOBS_COLLECTION = 'account_deletions'
+
+# Steps run in this order; each one is safe to repeat after a crash
+DELETION_STEPS = ('export', 'auth_user', 'owned_boards', 'shared_boards', 'activities')
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class AccountDeletionJob:
+    """
+    Deletes a user's account and data step by step, recording each finished step on
+    the job document so an interrupted job picks up where it stopped.
+    """
+
+    def __init__(self, db, job_id, batch_size=DELETION_BATCH_SIZE):
+        self.db = db
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.job_ref = db.collection(DELETION_JOBS_COLLECTION).document(job_id)
+
+    def claim(self, stale_after=DELETION_STALE_AFTER):
+        """
+        Mark the job running in a transaction, returning its data, or None if it is done,
+        missing, or running elsewhere with a checkpoint newer than stale_after seconds.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+
+        @transactional
+        def claim_in_transaction(transaction):
+            job = self.job_ref.get(transaction=transaction)
+            if not job.exists:
+                logger.warning(f"Account deletion job {self.job_id} not found")
+                return None
+
+            job_data = job.to_dict()
+            if job_data.get('status') == 'done':
+                return None
+            updated_at = job_data.get('updatedAt')
+            if job_data.get('status') == 'running' and updated_at and updated_at > cutoff:
+                logger.info(f"Account deletion job {self.job_id} is already running")
+                return None
+
+            transaction.update(self.job_ref, {'status': 'running', 'error': None,
+                                              'updatedAt': firestore.SERVER_TIMESTAMP})
+            return job_data
+
+        return claim_in_transaction(self.db.transaction())
+
+    def run(self, stale_after=DELETION_STALE_AFTER):
+        """Claim the job and run every step not yet checkpointed, returning the final status"""
+        job_data = self.claim(stale_after)
+        if job_data is None:
+            return None
+
+        uid, email = job_data['uid'], job_data['email']
+        completed = set(job_data.get('completedSteps', []))
+
+        try:
+            for step in DELETION_STEPS:
+                if step in completed:
+                    continue
+                count = getattr(self, f"_step_{step}")(uid, email)
+                self._checkpoint({
+                    'completedSteps': firestore.ArrayUnion([step]),
+                    f"counts.{step}": count
+                })
+                logger.info(f"Account deletion {self.job_id}: finished {step} ({count})")
+
+            self._checkpoint({'status': 'done', 'finishedAt': firestore.SERVER_TIMESTAMP})
+            logger.info(f"Account deletion {self.job_id} for {email} completed")
+            return 'done'
+        except Exception as e:
+            logger.error(f"Account deletion {self.job_id} for {email} failed: {str(e)}", exc_info=True)
+            self._checkpoint({'status': 'failed', 'error': str(e)})
+            return 'failed'
+
+    def _checkpoint(self, fields):
+        self.job_ref.update(dict(fields, updatedAt=firestore.SERVER_TIMESTAMP))
+
+    def _step_export(self, uid, email):
+        # The data export is a courtesy; losing it must not block the deletion
+        export_zip_path = None
+        try:
+            export_zip_path = export_user_data(self.db, uid, email)
+            body = build_email_body(recipient_email=email, subject_type="account_deleted")
+            queued = send_email_with_attachment(recipient=email, subject="Your Account Has Been Deleted",
+                                                message_body=body, attachment_path=export_zip_path)
+            # The outbox delivers later, so this only records that the email was handed off
+            logger.info(f"Queued account deletion email with export to {email}" if queued
+                        else f"Could not queue account deletion email to {email}")
+            return 1 if queued else 0
+        except Exception as e:
+            logger.error(f"Failed to send export email to {email}: {e}", exc_info=True)
+            return 0
+        finally:
+            # The attachment is read when the email is queued, so the deleted user's data leaves the disk now
+            if export_zip_path and os.path.exists(export_zip_path):
+                os.remove(export_zip_path)
+
+    def _step_auth_user(self, uid, email):
+        user_repo = UserRepository(self.db)
+        deleted = 0
+        if user_repo.get_user_by_id(uid) is not None:
+            user_repo.delete_user(uid)
+            deleted = 1
+
+        # Board views read the creator's status from the board instead of asking Firebase Auth
+        BoardRepository(self.db).mark_creator_deleted(uid, batch_size=self.batch_size)
+        return deleted
+
+    def _step_owned_boards(self, uid, email):
+        board_repo = BoardRepository(self.db)
+        deleted = 0
+        for board in board_repo.get_user_boards(uid):
+            if not board_repo.delete_board(board['id']):
+                raise RuntimeError(f"Could not delete board {board['id']}")
+            deleted += 1
+        return deleted
+
+    def _step_shared_boards(self, uid, email):
+        return BoardRepository(self.db).remove_user_from_all_boards(uid, batch_size=self.batch_size)
+
+    def _step_activities(self, uid, email):
+        return ActivityRepository(self.db).delete_user_activities(uid, batch_size=self.batch_size)
+
+
+def start_account_deletion(db, uid, email):
+    """
+    Record an account deletion job and run it on a background thread.
+
+    Returns:
+        (job_id, status_token); the token authorizes get_account_deletion_status, since
+        the user is signed out and their account removed while the job runs
+    """
+    existing = list(db.collection(DELETION_JOBS_COLLECTION)
+                    .where('uid', '==', uid).where('status', 'in', ['pending', 'running', 'failed'])
+                    .limit(1).stream())
+    if existing:
+        job_ref = existing[0].reference
+        status_token = existing[0].to_dict().get('statusToken')
+        if not status_token:
+            status_token = secrets.token_urlsafe(32)
+            job_ref.update({'statusToken': status_token})
+        if existing[0].to_dict().get('status') == 'running':
+            # Its runner or resume-account-deletions finishes it; a second runner would race it
+            logger.info(f"Account deletion job {job_ref.id} for {email} is already running")
+            return job_ref.id, status_token
+    else:
+        job_ref = db.collection(DELETION_JOBS_COLLECTION).document()
+        status_token = secrets.token_urlsafe(32)
+        job_ref.set({
+            'uid': uid,
+            'email': email,
+            'statusToken': status_token,
+            'status': 'pending',
+            'completedSteps': [],
+            'counts': {},
+            'createdAt': firestore.SERVER_TIMESTAMP,
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        })
+
+    threading.Thread(target=AccountDeletionJob(db, job_ref.id).run,
+                     name=f"account-deletion-{job_ref.id}", daemon=True).start()
+    logger.info(f"Started account deletion job {job_ref.id} for {email}")
+    return job_ref.id, status_token
+
+
+def get_account_deletion_status(db, job_id, status_token):
+    """Return the public progress of a deletion job, or None if it does not exist or the token does not match"""
+    job = db.collection(DELETION_JOBS_COLLECTION).document(job_id).get()
+    if not job.exists:
+        return None
+
+    job_data = job.to_dict()
+    if not status_token or not secrets.compare_digest(status_token, job_data.get('statusToken') or ''):
+        return None
+
+    return {
+        'jobId': job.id,
+        'status': job_data.get('status'),
+        'completedSteps': [step for step in DELETION_STEPS if step in job_data.get('completedSteps', [])],
+        'totalSteps': len(DELETION_STEPS),
+        'counts': job_data.get('counts', {}),
+        'error': job_data.get('error')
+    }
+
+
+def resume_account_deletions(db, stale_after=DELETION_STALE_AFTER):
+    """Run, in the foreground, every failed job and every job whose checkpoint has gone stale"""
+    resumed = 0
+    for job in db.collection(DELETION_JOBS_COLLECTION).where('status', 'in', ['pending', 'running', 'failed']).stream():
+        # run() skips jobs that a live process is still checkpointing
+        if AccountDeletionJob(db, job.id).run(stale_after) is not None:
+            logger.info(f"Resumed account deletion job {job.id}")
+            resumed += 1
+    return resumed
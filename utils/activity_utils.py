@@ -1,15 +1,152 @@
 # utils/activity_utils.py
+import os
+import time
+import atexit
+import threading
 from firebase_admin import firestore
 from flask import session
 import logging
+from repositories.activity_repository import add_rollup_increments
+
+ACTIVITY_BUFFER_ENABLED = os.getenv('ACTIVITY_BUFFER_ENABLED', 'true').lower() == 'true'
+ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '100'))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '1.0'))
+ACTIVITY_MAX_BUFFER = int(os.getenv('ACTIVITY_MAX_BUFFER', '5000'))
+ACTIVITY_COMMIT_RETRIES = int(os.getenv('ACTIVITY_COMMIT_RETRIES', '3'))
+
+# Firestore rejects write batches larger than this; every entry may also bump a daily rollup
+MAX_BATCH_WRITES = 500
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+class ActivitySink:
+    """
+    Collects activity entries and writes them to Firestore with WriteBatch from a
+    background thread, flushing when batch_size entries are waiting or every
+    flush_interval seconds.
+
+    Args:
+        batch_size: Number of buffered entries that triggers an early flush
+        flush_interval: Maximum seconds an entry waits in the buffer
+        max_buffer: Buffered entries above which writes fall back to synchronous adds
+        max_retries: Extra attempts at committing a batch that failed
+        backoff: Base delay in seconds between attempts, doubled on every retry
+    """
+
+    def __init__(self, batch_size=ACTIVITY_BATCH_SIZE, flush_interval=ACTIVITY_FLUSH_INTERVAL,
+                 max_buffer=ACTIVITY_MAX_BUFFER, max_retries=ACTIVITY_COMMIT_RETRIES, backoff=0.5):
+        self.batch_size = min(batch_size, MAX_BATCH_WRITES // 2)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+
+    def add(self, db, activity_data):
+        """Buffer an activity entry, returning False if the caller should write it directly"""
+        if self._stopped:
+            return False
+
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                return False
+            # The document ID is fixed now so a retried commit rewrites the same documents
+            self._buffer.append((db, db.collection('activity').document(), activity_data))
+            buffered = len(self._buffer)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='activity-sink', daemon=True)
+                self._thread.start()
+
+        if buffered >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Write every buffered entry now"""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+
+            for start in range(0, len(entries), self.batch_size):
+                self._commit(entries[start:start + self.batch_size])
+
+    def stop(self):
+        """Flush what is buffered and stop accepting entries"""
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing activity buffer: {str(e)}", exc_info=True)
+
+    def _commit(self, entries):
+        groups = {}
+        for db, activity_ref, activity_data in entries:
+            groups.setdefault(id(db), (db, []))[1].append((activity_ref, activity_data))
+
+        for db, group in groups.values():
+            self._commit_group(db, group)
+
+    def _commit_group(self, db, group):
+        """
+        Commit one batch of entries, retrying the batch as a whole.
+
+        A commit can fail after it was applied. Batches are atomic, so if the first entry's
+        document exists the earlier attempt landed and retrying would double the rollups.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                if attempt and group[0][0].get().exists:
+                    logger.info(f"Activity batch of {len(group)} entries was already committed")
+                    return True
+
+                batch = db.batch()
+                for activity_ref, activity_data in group:
+                    batch.set(activity_ref, activity_data)
+                add_rollup_increments(db, batch, [activity_data for _, activity_data in group])
+                batch.commit()
+                logger.info(f"Flushed {len(group)} activity entries")
+                return True
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Dropping {len(group)} activity entries after {attempt + 1} attempts: {str(e)}", exc_info=True)
+                    return False
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Retrying activity batch in {delay}s: {str(e)}")
+                time.sleep(delay)
+
+
+activity_sink = ActivitySink()
+atexit.register(activity_sink.stop)
+
+
+def _write_activity(db, activity_data):
+    try:
+        batch = db.batch()
+        batch.set(db.collection('activity').document(), activity_data)
+        add_rollup_increments(db, batch, [activity_data])
+        batch.commit()
+    except Exception as e:
+        logger.error(f"Error adding activity: {str(e)}", exc_info=True)
+
+
 def add_activity(db, description, user_id=None, user_email=None, board_id=None, board_name=None):
     """
     Add an activity log entry for the current user.
-    
+
     Args:
         db: Firestore database instance
         description: Activity description
@@ -33,7 +170,8 @@ def add_activity(db, description, user_id=None, user_email=None, board_id=None,
         if board_name:
             activity_data['boardName'] = board_name
 
-        db.collection('activity').add(activity_data)
+        if not (ACTIVITY_BUFFER_ENABLED and activity_sink.add(db, activity_data)):
+            _write_activity(db, activity_data)
         logger.info(f"Activity added: {description} for user {activity_data['userEmail']}")
     except Exception as e:
         logger.error(f"Error adding activity: {str(e)}", exc_info=True)
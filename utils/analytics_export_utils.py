@@ -0,0 +1,205 @@
+# utils/analytics_export_utils.py
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+import logging
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.activity_repository import ActivityRepository
+
+# pyarrow is only needed for analytics exports, so the app runs without it
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+ANALYTICS_EXPORT_DIR = os.getenv('ANALYTICS_EXPORT_DIR', 'exports/analytics')
+ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', '5000'))
+ANALYTICS_FORMATS = ('parquet', 'arrow')
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def _to_datetime(value):
+    """Normalize the timestamp formats found in stored documents to aware UTC datetimes"""
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'todate'):
+        value = value.todate()
+    elif isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc)
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _assignees(assigned_to):
+    if isinstance(assigned_to, dict):
+        assigned_to = [assigned_to]
+    return assigned_to or []
+
+def _schemas():
+    timestamp = pa.timestamp('us', tz='UTC')
+    return {
+        'boards': pa.schema([
+            ('id', pa.string()),
+            ('name', pa.string()),
+            ('description', pa.string()),
+            ('createdBy', pa.string()),
+            ('createdAt', timestamp),
+            ('taskCount', pa.int64()),
+            ('completedTaskCount', pa.int64()),
+            ('memberUids', pa.list_(pa.string())),
+            ('memberEmails', pa.list_(pa.string()))
+        ]),
+        'tasks': pa.schema([
+            ('id', pa.string()),
+            ('boardId', pa.string()),
+            ('title', pa.string()),
+            ('description', pa.string()),
+            ('completed', pa.bool_()),
+            ('priority', pa.string()),
+            ('dueDate', pa.date32()),
+            ('createdBy', pa.string()),
+            ('creatorName', pa.string()),
+            ('assigneeUids', pa.list_(pa.string())),
+            ('assigneeEmails', pa.list_(pa.string())),
+            ('commentCount', pa.int64()),
+            ('createdAt', timestamp),
+            ('updatedAt', timestamp)
+        ]),
+        'activity': pa.schema([
+            ('id', pa.string()),
+            ('userId', pa.string()),
+            ('userEmail', pa.string()),
+            ('description', pa.string()),
+            ('boardId', pa.string()),
+            ('boardName', pa.string()),
+            ('timestamp', timestamp)
+        ])
+    }
+
+# Per dataset: the repository generator and how one document maps to a row
+_DATASETS = {
+    'boards': (
+        lambda db: BoardRepository(db).iter_all_boards(),
+        lambda board: {
+            'id': board['id'],
+            'name': board.get('name'),
+            'description': board.get('description'),
+            'createdBy': board.get('createdBy'),
+            'createdAt': _to_datetime(board.get('createdAt')),
+            'taskCount': board.get('taskCount'),
+            'completedTaskCount': board.get('completedTaskCount'),
+            'memberUids': board.get('memberUids', []),
+            'memberEmails': board.get('memberEmails', [])
+        }
+    ),
+    'tasks': (
+        lambda db: TaskRepository(db).iter_all_tasks(),
+        lambda task: {
+            'id': task['id'],
+            'boardId': task['boardId'],
+            'title': task.get('title'),
+            'description': task.get('description'),
+            'completed': bool(task.get('completed', False)),
+            'priority': task.get('priority'),
+            # Parsed for the whole batch at once in _record_batch
+            'dueDate': task.get('dueDate') or None,
+            'createdBy': task.get('createdBy'),
+            'creatorName': task.get('creatorName'),
+            'assigneeUids': [u['uid'] for u in _assignees(task.get('assignedTo')) if u.get('uid')],
+            'assigneeEmails': [u['email'] for u in _assignees(task.get('assignedTo')) if u.get('email')],
+            'commentCount': task.get('commentCount'),
+            'createdAt': _to_datetime(task.get('createdAt')),
+            'updatedAt': _to_datetime(task.get('updatedAt'))
+        }
+    ),
+    'activity': (
+        lambda db: ActivityRepository(db).iter_all_activities(),
+        lambda activity: {
+            'id': activity['id'],
+            'userId': activity.get('userId'),
+            'userEmail': activity.get('userEmail'),
+            'description': activity.get('description'),
+            'boardId': activity.get('boardId'),
+            'boardName': activity.get('boardName'),
+            'timestamp': _to_datetime(activity.get('timestamp'))
+        }
+    )
+}
+
+def _record_batch(rows, schema):
+    """Convert a batch of row dicts to a typed RecordBatch, one column at a time"""
+    columns = []
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if field.name == 'dueDate':
+            # Due dates are stored as YYYY-MM-DD strings; unparseable ones become null
+            parsed = pc.strptime(pa.array(values, type=pa.string()), format='%Y-%m-%d', unit='s', error_is_null=True)
+            columns.append(pc.cast(parsed, pa.date32()))
+        else:
+            columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+def _open_writer(path, schema, file_format):
+    if file_format == 'parquet':
+        return pq.ParquetWriter(str(path), schema, compression='zstd')
+    return pa.ipc.new_file(str(path), schema)
+
+def export_analytics(db, output_dir=ANALYTICS_EXPORT_DIR, file_format='parquet', batch_size=ANALYTICS_BATCH_SIZE):
+    """
+    Write boards, tasks and activity as typed columnar files for offline analysis.
+
+    Documents are read page by page and converted to Arrow in record batches of
+    batch_size rows, so memory use stays bounded by one batch per dataset.
+
+    Args:
+        db: Firestore database instance
+        output_dir: Local directory receiving boards, tasks and activity files
+        file_format: 'parquet' or 'arrow' (Arrow IPC file)
+        batch_size: Rows per record batch
+
+    Returns:
+        Dict mapping each dataset to its file path and row count
+    """
+    if pa is None:
+        raise RuntimeError("Analytics export requires pyarrow; install it with `pip install pyarrow`")
+    if file_format not in ANALYTICS_FORMATS:
+        raise ValueError(f"Unsupported analytics format {file_format!r}, expected one of {ANALYTICS_FORMATS}")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    schemas = _schemas()
+    results = {}
+
+    for name, (read, to_row) in _DATASETS.items():
+        schema = schemas[name]
+        path = output_dir / f"{name}.{file_format}"
+        rows_written = 0
+
+        writer = _open_writer(path, schema, file_format)
+        try:
+            rows = []
+            for document in read(db):
+                rows.append(to_row(document))
+                if len(rows) >= batch_size:
+                    writer.write_batch(_record_batch(rows, schema))
+                    rows_written += len(rows)
+                    rows = []
+            if rows:
+                writer.write_batch(_record_batch(rows, schema))
+                rows_written += len(rows)
+        finally:
+            writer.close()
+
+        logger.info(f"Exported {rows_written} {name} rows to {path}")
+        results[name] = {'path': str(path), 'rows': rows_written}
+
+    return results
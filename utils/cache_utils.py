@@ -0,0 +1,127 @@
+# utils/cache_utils.py
+import threading
+import time
+from collections import OrderedDict
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Value of an entry that was invalidated but still holds its slot
+_STALE = object()
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and hit/miss/eviction counters.
+
+    Args:
+        maxsize: Maximum number of entries kept before the least recently used is evicted
+        ttl: Seconds an entry stays valid after it was stored
+        on_evict: Optional callback called with the key when an entry is evicted, expires or is
+            cleared; invalidate() only marks an entry stale, so it does not call it
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        expired = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                expired = True
+                entry = None
+
+            if entry is None or entry[0] is _STALE:
+                entry = None
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+
+        if expired:
+            self._notify_evicted(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entry if full"""
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            self._notify_evicted(evicted_key)
+
+    def replace(self, key, value):
+        """Update key only if it is currently cached, keeping its position and expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is _STALE:
+                return False
+            self._entries[key] = (value, entry[1])
+            return True
+
+    def invalidate(self, key):
+        """Make the next get of key miss; the entry keeps its slot and expiry until set again"""
+        with self._lock:
+            entry = self._entries.get(key)
+            removed = entry is not None and entry[0] is not _STALE
+            if removed:
+                self._entries[key] = (_STALE, entry[1])
+                self._invalidations += 1
+        return removed
+
+    def clear(self):
+        """Drop every entry from the cache"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+
+        for key in keys:
+            self._notify_evicted(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] is not _STALE and entry[1] >= time.monotonic()
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
+
+    def _notify_evicted(self, key):
+        if not self.on_evict:
+            return
+        try:
+            self.on_evict(key)
+        except Exception as e:
+            logger.error(f"Error in cache eviction callback for {key}: {str(e)}", exc_info=True)
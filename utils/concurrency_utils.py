@@ -0,0 +1,114 @@
+# utils/concurrency_utils.py
+import os
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import logging
+
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', '16'))
+FANOUT_BULK_WORKERS = int(os.getenv('FANOUT_BULK_WORKERS', '4'))
+FANOUT_MAX_CONCURRENCY = int(os.getenv('FANOUT_MAX_CONCURRENCY', '4'))
+FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', '10'))
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Shared pool for request-time reads; each fan-out uses at most max_concurrency of its threads
+_executor = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix='fanout')
+# Separate pool for exports, bulk admin actions and deletes so they never queue ahead of page loads
+_bulk_executor = ThreadPoolExecutor(max_workers=FANOUT_BULK_WORKERS, thread_name_prefix='fanout-bulk')
+atexit.register(_executor.shutdown, wait=False)
+atexit.register(_bulk_executor.shutdown, wait=False)
+
+class FanOutTimeoutError(TimeoutError):
+    """A call under fan_out did not finish within its timeout"""
+
+class FanOutError(Exception):
+    """
+    Raised by fan_out when any call failed or timed out.
+
+    Attributes:
+        errors: {index: exception} for every failed item
+        results: Results in input order, None where the call failed
+    """
+
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results = results
+        super().__init__(f"{len(errors)} of {len(results)} fan-out calls failed: "
+                         f"{next(iter(errors.values()))!r}")
+
+def fan_out(fn, items, timeout=FANOUT_TIMEOUT, max_concurrency=FANOUT_MAX_CONCURRENCY, bulk=False,
+            return_exceptions=False):
+    """
+    Run fn(item) for every item on a bounded pool.
+
+    Args:
+        fn: Callable applied to each item
+        items: Iterable of arguments
+        timeout: Seconds each call may take, counted from when it is submitted
+        max_concurrency: Calls of this fan-out in flight at once, so one caller cannot fill the pool
+        bulk: Run on the separate bulk pool; use it for work that is not serving a page
+        return_exceptions: Put the exception of a failed or timed-out call in its result slot
+            instead of raising FanOutError
+
+    Returns:
+        List of results in the same order as items
+
+    Do not call fan_out from inside a function that is itself running under fan_out,
+    the inner calls would queue behind the outer ones on the same pool.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    results = [None] * len(items)
+    errors = {}
+
+    if len(items) == 1:
+        try:
+            results[0] = fn(items[0])
+        except Exception as e:
+            logger.error(f"Error in fan-out call for {items[0]}: {str(e)}", exc_info=True)
+            errors[0] = e
+    else:
+        executor = _bulk_executor if bulk else _executor
+        pending = {}
+        next_index = 0
+
+        def submit_more():
+            nonlocal next_index
+            while next_index < len(items) and len(pending) < max(1, max_concurrency):
+                future = executor.submit(fn, items[next_index])
+                pending[future] = (next_index, time.monotonic() + timeout)
+                next_index += 1
+
+        submit_more()
+        while pending:
+            earliest = min(deadline for _, deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0, earliest - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index, _ = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Error in fan-out call for {items[index]}: {str(e)}", exc_info=True)
+                    errors[index] = e
+
+            now = time.monotonic()
+            for future, (index, deadline) in list(pending.items()):
+                if deadline <= now:
+                    # A call that already started keeps its thread until it returns; we just stop waiting
+                    future.cancel()
+                    del pending[future]
+                    logger.warning(f"Fan-out call for {items[index]} missed its {timeout}s deadline")
+                    errors[index] = FanOutTimeoutError(f"Call for {items[index]} timed out after {timeout}s")
+
+            submit_more()
+
+    if errors and not return_exceptions:
+        raise FanOutError(errors, results)
+    for index, error in errors.items():
+        results[index] = error
+    return results
@@ -1,6 +1,11 @@
 import os
+import time
+import queue
+import atexit
 import smtplib
+import threading
 import logging
+from html import escape
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -8,36 +13,226 @@ from pathlib import Path
 
 EMAIL_ADDRESS = os.getenv("SMTP_EMAIL")
 EMAIL_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+
+# Outbox settings
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "true").lower() == "true"
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "2"))
+EMAIL_OUTBOX_MAX_QUEUE = int(os.getenv("EMAIL_OUTBOX_MAX_QUEUE", "1000"))
+EMAIL_OUTBOX_MAX_RETRIES = int(os.getenv("EMAIL_OUTBOX_MAX_RETRIES", "3"))
+EMAIL_OUTBOX_IDLE_TIMEOUT = int(os.getenv("EMAIL_OUTBOX_IDLE_TIMEOUT", "60"))
+
 logger = logging.getLogger(__name__)
 
-def send_email(recipient, subject, message_body):
+def open_smtp_connection(host=None, port=None, use_ssl=None):
+    """Open and authenticate an SMTP connection; point it at a local stand-in with SMTP_SERVER/SMTP_PORT/SMTP_USE_SSL"""
+    host = host or SMTP_SERVER
+    port = port or SMTP_PORT
+    use_ssl = SMTP_USE_SSL if use_ssl is None else use_ssl
+
+    server = smtplib.SMTP_SSL(host, port, timeout=30) if use_ssl else smtplib.SMTP(host, port, timeout=30)
+    if EMAIL_ADDRESS and EMAIL_PASSWORD:
+        server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+    return server
+
+
+class EmailOutbox:
+    """
+    Background email sender. Messages are queued by request handlers and delivered by a
+    pool of worker threads, each reusing one long-lived authenticated SMTP connection.
+
+    Args:
+        connection_factory: Callable returning a connected SMTP client
+        workers: Number of worker threads (and SMTP connections)
+        max_queue: Maximum number of queued messages
+        max_retries: Delivery attempts after the first failure before a message is dropped
+        backoff: Base delay in seconds, doubled on every retry
+        idle_timeout: Seconds a connection may sit unused before it is closed
+    """
+
+    def __init__(self, connection_factory=open_smtp_connection, workers=EMAIL_OUTBOX_WORKERS,
+                 max_queue=EMAIL_OUTBOX_MAX_QUEUE, max_retries=EMAIL_OUTBOX_MAX_RETRIES,
+                 backoff=1.0, idle_timeout=EMAIL_OUTBOX_IDLE_TIMEOUT):
+        self.connection_factory = connection_factory
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+
+    def start(self):
+        """Start the worker threads if they are not running yet"""
+        with self._lock:
+            if self._threads or self._stopping:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Email outbox started with {self.workers} workers")
+
+    def enqueue(self, msg):
+        """Queue a message for delivery, returning False if the outbox is full or stopped"""
+        if self._stopping:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait(msg)
+            return True
+        except queue.Full:
+            logger.warning(f"Email outbox full, could not queue message to {msg['To']}")
+            return False
+
+    def flush(self, timeout=30):
+        """Wait until every queued message has been handled, returning False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout=30):
+        """Deliver what is queued within timeout, then shut the workers down without ever blocking"""
+        if not self._threads:
+            return
+        self.flush(timeout)
+        self._stopping = True
+        self._stop_event.set()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # Workers still busy with a full queue see the stop event after their current message
+                break
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        logger.info("Email outbox stopped")
+
+    def stats(self):
+        """Return delivery counters"""
+        return {
+            'queued': self._queue.qsize(),
+            'sent': self._sent,
+            'failed': self._failed,
+            'retries': self._retries
+        }
+
+    def _run(self):
+        connection = None
+        while True:
+            try:
+                msg = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                connection = self._close(connection)
+                continue
+
+            if msg is None:
+                self._close(connection)
+                self._queue.task_done()
+                return
+
+            try:
+                connection = self._deliver(connection, msg)
+            finally:
+                self._queue.task_done()
+
+            if self._stop_event.is_set():
+                self._close(connection)
+                return
+
+    def _deliver(self, connection, msg):
+        attempt = 0
+        while True:
+            try:
+                if connection is None:
+                    connection = self.connection_factory()
+                connection.send_message(msg)
+                with self._lock:
+                    self._sent += 1
+                logger.info(f"Email sent to {msg['To']} with subject: {msg['Subject']}")
+                return connection
+            except Exception as e:
+                connection = self._close(connection)
+                attempt += 1
+                if attempt > self.max_retries:
+                    with self._lock:
+                        self._failed += 1
+                    logger.error(f"Error sending email to {msg['To']} after {attempt} attempts: {str(e)}", exc_info=True)
+                    return connection
+                with self._lock:
+                    self._retries += 1
+                delay = self.backoff * (2 ** (attempt - 1))
+                logger.warning(f"Retrying email to {msg['To']} in {delay}s: {str(e)}")
+                time.sleep(delay)
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection.quit()
+            except Exception:
+                pass
+        return None
+
+
+email_outbox = EmailOutbox()
+atexit.register(email_outbox.stop)
+
+
+def _build_message(recipient, subject, message_body):
     msg = MIMEMultipart()
     msg['From'] = EMAIL_ADDRESS
     msg['To'] = recipient
     msg['Subject'] = subject
     msg['Reply-To'] = EMAIL_ADDRESS
-
     msg.attach(MIMEText(message_body, 'html'))
-    logger.info(f"Attempting to send email to {recipient} with subject: {subject}")
+    return msg
+
+
+def _send_now(msg):
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        with open_smtp_connection() as server:
             server.send_message(msg)
         return True
     except Exception as e:
-        logger.error(f"Error sending email to {recipient}: {str(e)}", exc_info=True)
+        logger.error(f"Error sending email to {msg['To']}: {str(e)}", exc_info=True)
         return False
 
 
+def dispatch_email(msg):
+    """
+    Hand a message to the outbox, sending inline if the outbox is disabled or full.
+
+    Returns True once the message is queued; queued messages are delivered later and
+    delivery failures are only logged.
+    """
+    if EMAIL_OUTBOX_ENABLED and email_outbox.enqueue(msg):
+        return True
+    return _send_now(msg)
+
+
+def send_email(recipient, subject, message_body):
+    """Queue an HTML email, returning True if it was accepted for delivery (see dispatch_email)"""
+    msg = _build_message(recipient, subject, message_body)
+    logger.info(f"Queueing email to {recipient} with subject: {subject}")
+    return dispatch_email(msg)
+
+
 def send_email_with_attachment(recipient, subject, message_body, attachment_path):
-    msg = MIMEMultipart()
-    msg['From'] = EMAIL_ADDRESS
-    msg['To'] = recipient
-    msg['Subject'] = subject
-    msg['Reply-To'] = EMAIL_ADDRESS
-    msg.attach(MIMEText(message_body, 'html'))
+    """Queue an HTML email with a file attached, returning True if it was accepted for delivery"""
+    msg = _build_message(recipient, subject, message_body)
 
-    # Attach file
+    # Attach file now, the export may be cleaned up before the outbox delivers
     try:
         with open(attachment_path, "rb") as f:
             part = MIMEApplication(f.read(), Name=Path(attachment_path).name)
@@ -47,15 +242,8 @@ def send_email_with_attachment(recipient, subject, message_body, attachment_path
         logger.error(f"Failed to attach file: {e}", exc_info=True)
         return False
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            server.send_message(msg)
-        logger.info(f"Email with attachment sent to {recipient}")
-        return True
-    except Exception as e:
-        logger.error(f"Error sending email with attachment to {recipient}: {str(e)}", exc_info=True)
-        return False
+    logger.info(f"Queueing email with attachment to {recipient}")
+    return dispatch_email(msg)
 
 
 def build_email_body(recipient_email: str, subject_type: str, link: str = "", context_name: str = "") -> str:
@@ -102,6 +290,46 @@ def build_email_body(recipient_email: str, subject_type: str, link: str = "", co
         </p>
     """ if link and action_text else ""
 
+    return _render_email(title, recipient_email, message, link_section)
+
+
+def build_digest_email_body(recipient_email: str, events: list) -> str:
+    """Build one email listing several task notifications for the same recipient"""
+    labels = {
+        "task": "Assigned to you",
+        "unassigned": "Unassigned from you",
+        "task-completed": "Completed",
+        "board": "Added you to board",
+        "removed": "Removed you from board",
+    }
+
+    rows = ""
+    for event in events:
+        task_cell = escape(event.get("task_title") or "-")
+        if event.get("link"):
+            task_cell = f'<a href="{escape(event["link"])}" style="color: #101210;">{task_cell}</a>'
+        rows += f"""
+            <tr>
+                <td style="padding: 6px; border-bottom: 1px solid #e9ecef;">{labels.get(event.get("event_type"), "Updated")}</td>
+                <td style="padding: 6px; border-bottom: 1px solid #e9ecef;">{task_cell}</td>
+                <td style="padding: 6px; border-bottom: 1px solid #e9ecef;">{escape(event.get("board_name") or "-")}</td>
+            </tr>"""
+
+    message = f"""There were {len(events)} updates to your tasks on the <strong>Task Management System</strong>:
+        </p>
+        <table style="width: 100%; border-collapse: collapse; font-size: 15px; color: #495057;">
+            <tr>
+                <th style="text-align: left; padding: 6px; border-bottom: 2px solid #dee2e6;">Update</th>
+                <th style="text-align: left; padding: 6px; border-bottom: 2px solid #dee2e6;">Task</th>
+                <th style="text-align: left; padding: 6px; border-bottom: 2px solid #dee2e6;">Board</th>
+            </tr>{rows}
+        </table>
+        <p style="font-size: 16px; color: #495057;">"""
+
+    return _render_email("Your Task Updates", recipient_email, message, "")
+
+
+def _render_email(title, recipient_email, message, link_section):
     return f"""
     <html>
     <body style="font-family: Times New Roman, Arial, sans-serif; padding: 10px;">
@@ -3,7 +3,6 @@ import os
 import csv
 import smtplib
 from datetime import datetime
-from pathlib import Path
 import zipfile
 import tempfile
 from email import encoders
@@ -12,85 +11,52 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
 import json
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.activity_repository import ActivityRepository
 
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+def _export_default(value):
+    """Serialize Firestore timestamps and anything else json cannot encode"""
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+def _write_json_array(zipf, arcname, items):
+    """Stream items into a zip member as a JSON array, one element at a time"""
+    count = 0
+    with zipf.open(arcname, "w") as member:
+        member.write(b"[")
+        for item in items:
+            member.write((",\n  " if count else "\n  ").encode("utf-8"))
+            member.write(json.dumps(item, default=_export_default).encode("utf-8"))
+            count += 1
+        member.write(b"\n]\n" if count else b"]\n")
+    return count
+
 def export_user_data(db, uid: str, email: str) -> str:
-    export_dir = Path("exports") / uid
-    export_dir.mkdir(parents=True, exist_ok=True)
-
-    # Export boards owned by user
-    boards_data = []
-    boards_ref = db.collection("boards").where("createdBy", "==", uid).stream()
-    for board in boards_ref:
-        board_dict = board.to_dict()
-        board_dict["id"] = board.id
-        
-        # Convert any DatetimeWithNanoseconds objects
-        for key, value in board_dict.items():
-            if hasattr(value, 'timestamp'):  # Check if it's a Firestore timestamp
-                board_dict[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-                
-        boards_data.append(board_dict)
-    with open(export_dir / "boards.json", "w") as f:
-        json.dump(boards_data, f, indent=2)
-
-    # Export tasks assigned or created by user
-    tasks_data = []
-    all_boards = db.collection("boards").stream()
-    for board in all_boards:
-        board_dict = board.to_dict()
-        board_id = board.id
-        task_ref = db.collection("boards").document(board_id).collection("tasks").stream()
-        for task in task_ref:
-            task_data = task.to_dict()
-            if (
-                task_data.get("createdBy") == uid or
-                any(u.get("uid") == uid for u in task_data.get("assignedTo", []))
-            ):
-                task_data["boardId"] = board_id
-                task_data["id"] = task.id
-                
-                # Convert any DatetimeWithNanoseconds objects
-                for key, value in task_data.items():
-                    if hasattr(value, 'timestamp'):  # Check if it's a Firestore timestamp
-                        task_data[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-                
-                tasks_data.append(task_data)
-    with open(export_dir / "tasks.json", "w") as f:
-        json.dump(tasks_data, f, indent=2)
-
-    # Export activity logs
-    activities_data = []
-    activities = db.collection("activity").where("userId", "==", uid).stream()
-    for activity in activities:
-        activity_data = activity.to_dict()
-        activity_data["id"] = activity.id
-        
-        # Convert any DatetimeWithNanoseconds objects
-        for key, value in activity_data.items():
-            if hasattr(value, 'timestamp'):  # Check if it's a Firestore timestamp
-                activity_data[key] = value.isoformat() if hasattr(value, 'isoformat') else str(value)
-        
-        activities_data.append(activity_data)
-    with open(export_dir / "activities.json", "w") as f:
-        json.dump(activities_data, f, indent=2)
-
-    # Create ZIP
-    zip_filename = f"{uid}_export_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.zip"
-    zip_path = Path("exports") / zip_filename
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file in export_dir.iterdir():
-            zipf.write(file, arcname=file.name)
-
-    # Clean up JSON files after zipping
-    for file in export_dir.iterdir():
-        file.unlink()
-    export_dir.rmdir()
-
-    return str(zip_path)
+    """
+    Export a user's boards, tasks and activity into a temporary ZIP file and return its path.
+
+    Documents are read page by page and streamed straight into the archive members,
+    so memory use does not grow with the amount of data exported. The file holds
+    personal data; the caller deletes it once it has been attached.
+    """
+    fd, zip_path = tempfile.mkstemp(prefix=f"{uid}_export_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_", suffix=".zip")
+    os.close(fd)
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+        # Boards owned by the user
+        boards = _write_json_array(zipf, "boards.json", BoardRepository(db).iter_user_boards(uid))
+
+        # Tasks created by or assigned to the user, found through the tasks indexes
+        tasks = _write_json_array(zipf, "tasks.json", TaskRepository(db).iter_user_tasks(uid))
+
+        # Activity logs
+        activities = _write_json_array(zipf, "activities.json", ActivityRepository(db).iter_user_activities(uid))
+
+    logger.info(f"Exported {boards} boards, {tasks} tasks and {activities} activities for {email}")
+    return zip_path
 
 
 def export_and_email_user_data(db, user_id, user_email):
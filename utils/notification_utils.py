@@ -0,0 +1,101 @@
+# utils/notification_utils.py
+import os
+import atexit
+import threading
+import logging
+from utils.email_utils import build_email_body, build_digest_email_body, send_email
+
+NOTIFY_DIGEST_WINDOW = int(os.getenv("NOTIFY_DIGEST_WINDOW", "120"))
+NOTIFY_IMMEDIATE_EVENTS = {
+    event.strip() for event in os.getenv("NOTIFY_IMMEDIATE_EVENTS", "board,removed").split(",") if event.strip()
+}
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+EVENT_SUBJECTS = {
+    "task": "You have been assigned a task",
+    "unassigned": "You have been unassigned from a task",
+    "task-completed": "A task was marked as completed",
+    "board": "You have been added to a board",
+    "removed": "You have been removed from the board {board_name}",
+}
+
+
+class NotificationDigest:
+    """
+    Coalesces task notifications per recipient. The first event for a recipient opens a
+    window; every event that arrives before it closes goes out in a single digest email.
+
+    Args:
+        window: Seconds to collect events for a recipient, 0 sends everything immediately
+        immediate_events: Event types that bypass the digest
+        send: Callable(recipient, subject, body) used to deliver the email
+    """
+
+    def __init__(self, window=NOTIFY_DIGEST_WINDOW, immediate_events=NOTIFY_IMMEDIATE_EVENTS, send=send_email):
+        self.window = window
+        self.immediate_events = set(immediate_events)
+        self.send = send
+        self._pending = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def notify(self, recipient, event_type, link="", board_name="", task_title=""):
+        """Record a notification for recipient, sending it now or adding it to their digest"""
+        if not recipient:
+            return
+
+        event = {"event_type": event_type, "link": link, "board_name": board_name, "task_title": task_title}
+        if self.window <= 0 or event_type in self.immediate_events:
+            self._send_single(recipient, event)
+            return
+
+        with self._lock:
+            self._pending.setdefault(recipient, []).append(event)
+            if recipient not in self._timers:
+                timer = threading.Timer(self.window, self.flush_recipient, args=(recipient,))
+                timer.daemon = True
+                self._timers[recipient] = timer
+                timer.start()
+
+    def flush_recipient(self, recipient):
+        """Send everything collected for recipient"""
+        with self._lock:
+            events = self._pending.pop(recipient, [])
+            timer = self._timers.pop(recipient, None)
+        if timer:
+            timer.cancel()
+        if not events:
+            return
+
+        if len(events) == 1:
+            self._send_single(recipient, events[0])
+        else:
+            self.send(recipient, f"You have {len(events)} task updates", build_digest_email_body(recipient, events))
+            logger.info(f"Sent digest of {len(events)} notifications to {recipient}")
+
+    def flush(self):
+        """Send every pending digest"""
+        with self._lock:
+            recipients = list(self._pending)
+        for recipient in recipients:
+            self.flush_recipient(recipient)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(events) for events in self._pending.values())
+
+    def _send_single(self, recipient, event):
+        subject = EVENT_SUBJECTS.get(event["event_type"], "Task Manager notification").format(board_name=event["board_name"])
+        body = build_email_body(recipient, event["event_type"], event["link"], context_name=event["board_name"])
+        self.send(recipient, subject, body)
+
+
+notification_digest = NotificationDigest()
+atexit.register(notification_digest.flush)
+
+
+def notify_user(recipient, event_type, link="", board_name="", task_title=""):
+    """Queue a notification email for recipient through the shared digest"""
+    notification_digest.notify(recipient, event_type, link=link, board_name=board_name, task_title=task_title)
@@ -0,0 +1,26 @@
+# utils/query_utils.py
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def iter_query_pages(query, page_size=500):
+    """
+    Yield the results of a query one page (list of snapshots) at a time.
+
+    Each page starts after the last document of the previous one, so the query's ordering
+    must end with __name__ for the cursor to be unique. Only one page is held in memory.
+    """
+    last = None
+    while True:
+        page = list((query.start_after(last) if last else query).limit(page_size).stream())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+def iter_query(query, page_size=500):
+    """Yield every snapshot of a query, fetched page by page with iter_query_pages"""
+    for page in iter_query_pages(query, page_size):
+        yield from page
@@ -0,0 +1,62 @@
+# utils/stats_utils.py
+import logging
+from repositories.board_repository import BoardRepository
+from repositories.task_repository import TaskRepository
+from repositories.activity_repository import ActivityRepository
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def get_task_totals(task_repo, boards):
+    """
+    Sum task and completed-task counts across boards without loading task documents.
+
+    Boards carrying taskCount/completedTaskCount are read from those counters; boards
+    without them are counted with aggregation queries through count_tasks_for_boards. A count
+    that fails or times out raises FanOutError rather than being shown as zero.
+
+    Returns:
+        (total_tasks, completed_tasks)
+    """
+    total_tasks = 0
+    completed_tasks = 0
+    uncounted = []
+
+    for board in boards:
+        if 'taskCount' in board and 'completedTaskCount' in board:
+            total_tasks += board.get('taskCount') or 0
+            completed_tasks += board.get('completedTaskCount') or 0
+        else:
+            uncounted.append(board['id'])
+
+    for task_count, completed_count in task_repo.count_tasks_for_boards(uncounted):
+        total_tasks += task_count
+        completed_tasks += completed_count
+
+    return total_tasks, completed_tasks
+
+def get_dashboard_context(db, user, activity_count=5, chart_days=7):
+    """Collect the boards, task stats, activity and chart data shown on index and dashboard"""
+    board_repo = BoardRepository(db)
+    task_repo = TaskRepository(db)
+    activity_repo = ActivityRepository(db)
+
+    user_boards = board_repo.get_user_boards(user['uid'])
+    shared_boards = board_repo.get_shared_boards(user['uid'], user['email'])
+    total_tasks, completed_tasks = get_task_totals(task_repo, user_boards + shared_boards)
+
+    activities = activity_repo.get_user_activities(user['uid'], limit=activity_count)
+    chart_labels, chart_data = activity_repo.get_activity_chart_data(user['uid'], days=chart_days)
+
+    return {
+        'user': user,
+        'user_boards': user_boards,
+        'shared_boards': shared_boards,
+        'total_boards': len(user_boards) + len(shared_boards),
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'activities': activities,
+        'chart_labels': chart_labels,
+        'chart_data': chart_data,
+        'chart_days': chart_days
+    }
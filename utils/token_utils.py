@@ -0,0 +1,127 @@
+# utils/token_utils.py
+import os
+import re
+import time
+import threading
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+import logging
+
+# Public certificates Firebase Auth signs ID tokens with, rotated by Google every few hours
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+TOKEN_CLOCK_SKEW = int(os.getenv('TOKEN_CLOCK_SKEW', '60'))
+# Minimum seconds between refreshes triggered by an unknown key ID
+TOKEN_KEYS_MIN_REFRESH = int(os.getenv('TOKEN_KEYS_MIN_REFRESH', '60'))
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class InvalidIdTokenError(ValueError):
+    """Raised when an ID token fails signature or claim checks"""
+
+def fetch_google_public_keys():
+    """
+    Download the Firebase Auth signing certificates.
+
+    Returns:
+        (certs, max_age): dict of key ID to PEM certificate, and the seconds they may be cached
+    """
+    response = requests.get(GOOGLE_CERTS_URL, timeout=10)
+    response.raise_for_status()
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return response.json(), int(match.group(1)) if match else 3600
+
+class FirebaseTokenVerifier:
+    """
+    Verifies Firebase Auth ID tokens locally against cached Google signing keys.
+
+    Keys are kept for as long as Google's Cache-Control allows and are refetched early
+    when a token names a key ID that is not cached yet, which is how rotations show up.
+
+    Args:
+        project_id: Firebase project the tokens must be issued for
+        key_fetcher: Callable returning (certs, max_age), see fetch_google_public_keys
+    """
+
+    def __init__(self, project_id, key_fetcher=fetch_google_public_keys,
+                 clock_skew=TOKEN_CLOCK_SKEW, min_refresh=TOKEN_KEYS_MIN_REFRESH):
+        self.project_id = project_id
+        self.issuer = f"https://securetoken.google.com/{project_id}"
+        self.key_fetcher = key_fetcher
+        self.clock_skew = clock_skew
+        self.min_refresh = min_refresh
+        self._keys = {}
+        self._expires_at = 0
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def verify(self, id_token):
+        """Return the token's claims, with the user ID under 'uid', or raise InvalidIdTokenError"""
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"Malformed ID token: {e}")
+
+        if header.get('alg') != 'RS256':
+            raise InvalidIdTokenError(f"Unexpected ID token algorithm {header.get('alg')!r}")
+
+        key = self._get_key(header.get('kid'))
+        try:
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=self.clock_skew,
+                options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']}
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"Invalid ID token: {e}")
+
+        if not claims['sub'] or len(claims['sub']) > 128:
+            raise InvalidIdTokenError("ID token has an invalid subject")
+        if claims.get('auth_time', 0) > time.time() + self.clock_skew:
+            raise InvalidIdTokenError("ID token auth_time is in the future")
+
+        claims['uid'] = claims['sub']
+        return claims
+
+    def _get_key(self, kid):
+        if not kid:
+            raise InvalidIdTokenError("ID token has no key ID")
+
+        with self._lock:
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            # An unknown key ID after the last refresh most likely means the keys rotated
+            rotated = kid not in self._keys and (
+                self._fetched_at is None or now - self._fetched_at >= self.min_refresh
+            )
+            if stale or rotated:
+                self._refresh(now)
+
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidIdTokenError(f"ID token signed with unknown key {kid}")
+        return key
+
+    def _refresh(self, now):
+        try:
+            certs, max_age = self.key_fetcher()
+        except Exception as e:
+            if not self._keys:
+                raise InvalidIdTokenError(f"Could not fetch token signing keys: {e}")
+            # Keep verifying with the keys we have and try again shortly
+            logger.error(f"Error refreshing token signing keys: {str(e)}", exc_info=True)
+            self._expires_at = now + self.min_refresh
+            return
+
+        self._keys = {
+            kid: load_pem_x509_certificate(cert.encode('utf-8')).public_key()
+            for kid, cert in certs.items()
+        }
+        self._fetched_at = now
+        self._expires_at = now + max_age
+        logger.info(f"Loaded {len(self._keys)} token signing keys, valid for {max_age}s")
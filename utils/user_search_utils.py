@@ -0,0 +1,137 @@
+# utils/user_search_utils.py
+import re
+import bisect
+import heapq
+import threading
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def _normalize(text):
+    return (text or '').strip().lower()
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _terms(email, display_name):
+    """Words a user can be found by: the full email, its parts, and each word of the name"""
+    email = _normalize(email)
+    name = _normalize(display_name)
+    terms = {email, name} | set(re.split(r'[@.\s_+-]+', email)) | set(name.split())
+    return {term for term in terms if term}
+
+class UserSearchIndex:
+    """
+    In-process search over user emails and display names.
+
+    Queries shorter than three characters are answered from a sorted list of terms by
+    prefix; longer queries intersect trigram postings and then confirm the substring.
+
+    Args:
+        max_results: Default number of results returned by search
+    """
+
+    def __init__(self, max_results=20):
+        self.max_results = max_results
+        self._users = {}
+        self._terms = []
+        self._trigrams = {}
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def rebuild(self, users):
+        """Replace the whole index with users, an iterable of dicts with uid, email, display_name, disabled"""
+        index = UserSearchIndex(self.max_results)
+        for user in users:
+            index._add(user, keep_sorted=False)
+        index._terms.sort()
+
+        with self._lock:
+            self._users, self._terms, self._trigrams = index._users, index._terms, index._trigrams
+            self.ready = True
+        logger.info(f"Built user search index with {len(self._users)} users")
+
+    def add(self, user):
+        """Add or refresh one user"""
+        with self._lock:
+            self._remove(user['uid'])
+            self._add(user)
+
+    def remove(self, uid):
+        """Drop one user from the index"""
+        with self._lock:
+            self._remove(uid)
+
+    def search(self, query, limit=None):
+        """Return users whose email or display name contains query, prefix matches first"""
+        query = _normalize(query)
+        limit = limit or self.max_results
+        if not query:
+            return []
+
+        with self._lock:
+            if len(query) < 3:
+                uids = set()
+                position = bisect.bisect_left(self._terms, (query,))
+                while position < len(self._terms) and self._terms[position][0].startswith(query):
+                    uids.add(self._terms[position][1])
+                    position += 1
+            else:
+                postings = [self._trigrams.get(gram, set()) for gram in _trigrams(query)]
+                candidates = set.intersection(*sorted(postings, key=len)) if postings else set()
+                uids = {uid for uid in candidates if query in self._users[uid]['_haystack']}
+
+            users = [self._users[uid] for uid in uids]
+
+        def rank(user):
+            prefix_match = any(term.startswith(query) for term in user['_terms'])
+            return (not prefix_match, _normalize(user.get('email')))
+
+        return [
+            {key: value for key, value in user.items() if not key.startswith('_')}
+            for user in heapq.nsmallest(limit, users, key=rank)
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._users)
+
+    def _add(self, user, keep_sorted=True):
+        entry = {
+            'uid': user['uid'],
+            'email': user.get('email'),
+            'display_name': user.get('display_name'),
+            'disabled': bool(user.get('disabled', False)),
+            '_haystack': f"{_normalize(user.get('email'))}\n{_normalize(user.get('display_name'))}"
+        }
+        entry['_terms'] = _terms(entry['email'], entry['display_name'])
+        self._users[entry['uid']] = entry
+
+        for term in entry['_terms']:
+            if keep_sorted:
+                bisect.insort(self._terms, (term, entry['uid']))
+            else:
+                self._terms.append((term, entry['uid']))
+        for gram in _trigrams(entry['_haystack']):
+            self._trigrams.setdefault(gram, set()).add(entry['uid'])
+
+    def _remove(self, uid):
+        entry = self._users.pop(uid, None)
+        if entry is None:
+            return
+
+        for term in entry['_terms']:
+            position = bisect.bisect_left(self._terms, (term, uid))
+            if position < len(self._terms) and self._terms[position] == (term, uid):
+                del self._terms[position]
+        for gram in _trigrams(entry['_haystack']):
+            postings = self._trigrams.get(gram)
+            if postings is not None:
+                postings.discard(uid)
+                if not postings:
+                    del self._trigrams[gram]
+
+
+# Process-wide index shared by the admin routes and UserRepository
+user_search_index = UserSearchIndex()